@@ -0,0 +1,48 @@
+"""Autoincrement post comment and like ids
+
+Revision ID: 013014e488e5
+Revises: bba3d706555f
+Create Date: 2026-10-19 17:43:41.950972
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '013014e488e5'
+down_revision: Union[str, Sequence[str], None] = 'bba3d706555f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# SQLite only adds AUTOINCREMENT when a table is created, so each table is
+# rebuilt, and its sequence starts above every id it or its archive table
+# (same id column) has used
+TABLES = [
+    ("posts", "post_id", "archived_posts"),
+    ("comments", "id", "archived_comments"),
+    ("likes", "id", "archived_likes"),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for name, id_column, archive in TABLES:
+        with op.batch_alter_table(name, recreate="always", table_kwargs={"sqlite_autoincrement": True}):
+            pass
+        op.execute(f"DELETE FROM sqlite_sequence WHERE name = '{name}'")
+        op.execute(
+            f"INSERT INTO sqlite_sequence (name, seq) SELECT '{name}', max("
+            f"coalesce((SELECT max({id_column}) FROM {name}), 0), "
+            f"coalesce((SELECT max({id_column}) FROM {archive}), 0))"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name, _, _ in reversed(TABLES):
+        with op.batch_alter_table(name, recreate="always", table_kwargs={"sqlite_autoincrement": False}):
+            pass
@@ -0,0 +1,43 @@
+"""Add search index
+
+Revision ID: e1e32623f7cf
+Revises: fcc2805a8a7f
+Create Date: 2026-10-19 16:08:36.744349
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e1e32623f7cf'
+down_revision: Union[str, Sequence[str], None] = 'fcc2805a8a7f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(
+        "CREATE VIRTUAL TABLE search_index USING fts5("
+        "content, circle_id UNINDEXED, post_id UNINDEXED, "
+        "tokenize='porter unicode61')"
+    )
+    # same rowid layout as app.search: posts even, comments odd
+    op.execute(
+        "INSERT INTO search_index(rowid, content, circle_id, post_id) "
+        "SELECT post_id * 2, content, circle_id, post_id FROM posts "
+        "WHERE content IS NOT NULL"
+    )
+    op.execute(
+        "INSERT INTO search_index(rowid, content, circle_id, post_id) "
+        "SELECT comments.id * 2 + 1, comments.content, posts.circle_id, comments.post_id "
+        "FROM comments JOIN posts ON posts.post_id = comments.post_id"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TABLE search_index")
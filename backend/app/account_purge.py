@@ -0,0 +1,261 @@
+from datetime import datetime, timedelta, timezone
+from decouple import config
+from sqlalchemy import delete, or_, select, update
+from sqlalchemy.orm import Session
+from .database import SessionLocal
+from .models import User, Circle, CircleMember, CircleReadMark, CircleInvitation, Post, Comment, Like, ArchivedPost, ArchivedComment, ArchivedLike, AccountPurge, DigestDelivery
+from .deletion import delete_circle, delete_posts, delete_archived_posts, purge_photos
+from .search import unindex
+from .cache import invalidate_on_commit
+from .notifications import delete_inbox
+from .sharding import MAIN, session_factories
+
+# Deleting an account is two phases. The request only stamps
+# users.deleted_at (get_current_user then rejects the account) and records
+# an account_purges row. The purge runs here afterwards, one step at a time
+# and in batches of BATCH_SIZE, each batch its own short transaction so
+# SQLite never holds the write lock for long. The current step and a
+# running count are committed with every batch: after a restart the purge
+# picks up at the step it was in, and since every step just deletes
+# "whatever of this user is left", repeating a batch is harmless. Steps
+# over posts, comments and likes run on every shard in turn, and again over
+# the archive tables.
+#
+# Every worker resumes unfinished purges at startup, so a purge is claimed
+# before it runs: a conditional UPDATE of claimed_at that only one worker
+# wins. The claim is renewed with every batch, and a worker whose renewal
+# fails (another one took over a claim gone stale) stops.
+
+BATCH_SIZE = 500
+PURGE_CLAIM_STALE_SECONDS = int(config("PURGE_CLAIM_STALE_SECONDS", default="300"))
+
+
+def _bulk(statement):
+    return statement.execution_options(synchronize_session=False)
+
+
+def _circle_posts(db: Session, user_id: int, limit: int) -> int:
+    # everything posted in the circles this user created, by anyone
+    post_ids = db.scalars(
+        select(Post.post_id)
+        .where(Post.circle_id.in_(select(Circle.id).where(Circle.creator_id == user_id)))
+        .limit(limit)
+    ).all()
+    return delete_posts(db, Post.post_id.in_(post_ids)) if post_ids else 0
+
+
+def _archived_circle_posts(db: Session, user_id: int, limit: int) -> int:
+    post_ids = db.scalars(
+        select(ArchivedPost.post_id)
+        .where(ArchivedPost.circle_id.in_(select(Circle.id).where(Circle.creator_id == user_id)))
+        .limit(limit)
+    ).all()
+    return delete_archived_posts(db, ArchivedPost.post_id.in_(post_ids)) if post_ids else 0
+
+
+def _circles(db: Session, user_id: int, limit: int) -> int:
+    circle_ids = db.scalars(select(Circle.id).where(Circle.creator_id == user_id).limit(limit)).all()
+    for circle_id in circle_ids:
+        delete_circle(db, circle_id)
+    return len(circle_ids)
+
+
+def _posts(db: Session, user_id: int, limit: int) -> int:
+    post_ids = db.scalars(select(Post.post_id).where(Post.author_id == user_id).limit(limit)).all()
+    return delete_posts(db, Post.post_id.in_(post_ids)) if post_ids else 0
+
+
+def _archived_posts(db: Session, user_id: int, limit: int) -> int:
+    post_ids = db.scalars(select(ArchivedPost.post_id).where(ArchivedPost.author_id == user_id).limit(limit)).all()
+    return delete_archived_posts(db, ArchivedPost.post_id.in_(post_ids)) if post_ids else 0
+
+
+def _comments(db: Session, user_id: int, limit: int) -> int:
+    rows = db.execute(select(Comment.id, Comment.post_id).where(Comment.user_id == user_id).limit(limit)).all()
+    comment_ids = [row.id for row in rows]
+    invalidate_on_commit(db, *{f"post:{row.post_id}" for row in rows})
+    unindex(db, comment_ids=comment_ids)
+    return db.execute(_bulk(delete(Comment).where(Comment.id.in_(comment_ids)))).rowcount
+
+
+def _likes(db: Session, user_id: int, limit: int) -> int:
+    rows = db.execute(
+        select(Like.id, Like.post_id, Post.circle_id)
+        .join(Post, Post.post_id == Like.post_id)
+        .where(Like.user_id == user_id)
+        .limit(limit)
+    ).all()
+    invalidate_on_commit(db, *{f"post:{row.post_id}" for row in rows}, *{f"circle:{row.circle_id}" for row in rows})
+    return db.execute(_bulk(delete(Like).where(Like.id.in_([row.id for row in rows])))).rowcount
+
+
+def _archived_comments(db: Session, user_id: int, limit: int) -> int:
+    rows = db.execute(
+        select(ArchivedComment.id, ArchivedComment.post_id).where(ArchivedComment.user_id == user_id).limit(limit)
+    ).all()
+    comment_ids = [row.id for row in rows]
+    invalidate_on_commit(db, *{f"post:{row.post_id}" for row in rows})
+    unindex(db, comment_ids=comment_ids)
+    return db.execute(_bulk(delete(ArchivedComment).where(ArchivedComment.id.in_(comment_ids)))).rowcount
+
+
+def _archived_likes(db: Session, user_id: int, limit: int) -> int:
+    rows = db.execute(
+        select(ArchivedLike.post_id, ArchivedPost.circle_id)
+        .join(ArchivedPost, ArchivedPost.post_id == ArchivedLike.post_id)
+        .where(ArchivedLike.user_id == user_id)
+        .limit(limit)
+    ).all()
+    invalidate_on_commit(db, *{f"post:{row.post_id}" for row in rows}, *{f"circle:{row.circle_id}" for row in rows})
+    # the frozen counts lose this user's like, counted from the rows actually
+    # deleted so no like is ever subtracted twice
+    deleted = db.scalars(
+        delete(ArchivedLike)
+        .where(ArchivedLike.user_id == user_id, ArchivedLike.post_id.in_([row.post_id for row in rows]))
+        .returning(ArchivedLike.post_id)
+        .execution_options(synchronize_session=False)
+    ).all()
+    if deleted:
+        db.execute(_bulk(
+            update(ArchivedPost).where(ArchivedPost.post_id.in_(deleted)).values(like_count=ArchivedPost.like_count - 1)
+        ))
+    return len(deleted)
+
+
+def _invitations(db: Session, user_id: int, limit: int) -> int:
+    rows = db.execute(select(CircleInvitation.id, CircleInvitation.to_user_id).where(or_(
+        CircleInvitation.from_user_id == user_id,
+        CircleInvitation.to_user_id == user_id
+    )).limit(limit)).all()
+    invalidate_on_commit(db, *{f"invites:{row.to_user_id}" for row in rows})
+    return db.execute(_bulk(delete(CircleInvitation).where(CircleInvitation.id.in_([row.id for row in rows])))).rowcount
+
+
+def _memberships(db: Session, user_id: int, limit: int) -> int:
+    # one row per circle the user had joined, never many
+    invalidate_on_commit(db, f"member:{user_id}")
+    db.execute(_bulk(delete(CircleReadMark).where(CircleReadMark.user_id == user_id)))
+    db.execute(_bulk(delete(DigestDelivery).where(DigestDelivery.user_id == user_id)))
+    return db.execute(_bulk(delete(CircleMember).where(CircleMember.user_id == user_id))).rowcount
+
+
+def _notifications(db: Session, user_id: int, limit: int) -> int:
+    # after memberships, so no new ones arrive; ones this user sent stay with their recipients
+    return delete_inbox(db, user_id, limit)
+
+
+def _account(db: Session, user_id: int, limit: int) -> int:
+    return db.execute(_bulk(delete(User).where(User.id == user_id))).rowcount
+
+
+# in dependency order: children before the rows they point at
+STEPS = [
+    ("circle_posts", _circle_posts),
+    ("archived_circle_posts", _archived_circle_posts),
+    ("circles", _circles),
+    ("posts", _posts),
+    ("archived_posts", _archived_posts),
+    ("comments", _comments),
+    ("archived_comments", _archived_comments),
+    ("likes", _likes),
+    ("archived_likes", _archived_likes),
+    ("invitations", _invitations),
+    ("memberships", _memberships),
+    ("notifications", _notifications),
+    ("account", _account),
+]
+STEP_NAMES = [name for name, _ in STEPS]
+SHARDED_STEPS = {
+    "circle_posts", "archived_circle_posts", "posts", "archived_posts",
+    "comments", "archived_comments", "likes", "archived_likes",
+}
+
+
+def _step_sessions(name: str, db: Session):
+    yield db
+    if name in SHARDED_STEPS:
+        for shard, factory in session_factories.items():
+            if shard != MAIN:
+                with factory() as shard_db:
+                    yield shard_db
+
+
+def schedule_purge(db: Session, user: User):
+    """
+    Mark the account deleted and queue its purge. Does not commit.
+    """
+    user.deleted_at = datetime.now(timezone.utc)
+    db.add(AccountPurge(user_id=user.id, step=STEP_NAMES[0], deleted=0))
+
+
+def _claim(db: Session, user_id: int, held: datetime | None = None) -> datetime | None:
+    # take the purge if nobody holds it or their claim has gone stale, or
+    # renew our own (`held`); returns the new claim, None if it was lost
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    if held is None:
+        free = or_(
+            AccountPurge.claimed_at.is_(None),
+            AccountPurge.claimed_at < now - timedelta(seconds=PURGE_CLAIM_STALE_SECONDS)
+        )
+    else:
+        free = AccountPurge.claimed_at == held
+    claimed = db.execute(_bulk(
+        update(AccountPurge)
+        .where(AccountPurge.user_id == user_id, AccountPurge.finished_at.is_(None), free)
+        .values(claimed_at=now)
+    )).rowcount
+    return now if claimed else None
+
+
+def purge_account(user_id: int, batch_size: int = BATCH_SIZE, session_factory=SessionLocal, progress=None):
+    """
+    Run (or resume) the purge of one deleted account until it is finished.
+    Does nothing if another worker is running it. `progress`, if given, is
+    called with the AccountPurge row after every batch.
+    """
+    with session_factory() as db:
+        claim = _claim(db, user_id)
+        db.commit()
+        if claim is None:
+            return
+        job = db.get(AccountPurge, user_id)
+
+        for name, step in STEPS[STEP_NAMES.index(job.step):]:
+            job.step = name
+            for step_db in _step_sessions(name, db):
+                while True:
+                    removed = step(step_db, user_id, batch_size)
+                    step_db.commit()
+                    job.deleted += removed
+                    db.flush()
+                    claim = _claim(db, user_id, claim)
+                    if claim is None:
+                        db.rollback()
+                        return
+                    db.commit()
+                    if progress:
+                        progress(job)
+                    if removed < batch_size:
+                        break
+
+        job.finished_at = datetime.now(timezone.utc)
+        db.commit()
+
+    # photos of the purged posts were queued by delete_posts
+    purge_photos(session_factory)
+
+
+def resume_purges(batch_size: int = BATCH_SIZE, session_factory=SessionLocal, progress=None) -> int:
+    """
+    Finish every purge left unfinished, e.g. by a restart. Returns how many
+    were resumed.
+    """
+    with session_factory() as db:
+        user_ids = db.scalars(
+            select(AccountPurge.user_id)
+            .where(AccountPurge.finished_at.is_(None))
+            .order_by(AccountPurge.requested_at)
+        ).all()
+    for user_id in user_ids:
+        purge_account(user_id, batch_size, session_factory, progress)
+    return len(user_ids)
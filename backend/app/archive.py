@@ -0,0 +1,144 @@
+from datetime import datetime, timedelta, timezone
+from decouple import config
+from sqlalchemy import DateTime, delete, func, insert, literal, select, update
+from sqlalchemy.dialects.sqlite import insert as upsert
+from sqlalchemy.orm import Session
+from .database import SessionLocal
+from .models import Post, Comment, Like, ArchivedPost, ArchivedComment, ArchivedLike
+
+# Hot and cold tiers for posts. Posts older than ARCHIVE_AFTER_DAYS are moved,
+# with their comments and likes, from posts/comments/likes into the
+# archived_* tables of the same database file (so they follow their circle
+# to another shard). Archived posts keep their ids and search entries and
+# carry their like count frozen, so the hot tables and their indexes only
+# hold recent activity while feeds, listings, search and exports read both
+# tiers (see archived_post_rows and friends in app.queries).
+#
+# posts, comments and likes are AUTOINCREMENT tables, so an id moved to the
+# archive is never handed out again to a new hot row (or its search entry).
+#
+# The archive is read-only: writing to an archived post (a comment, a like,
+# a delete) thaws it back into the hot tables first, and the next run
+# archives it again once it's quiet. Unread counts and digests only look
+# at recent posts and read the hot tier alone.
+#
+# Run it from cron with `python -m app.cli archive`; every batch is its own
+# short transaction, so the app stays writable while it runs.
+
+ARCHIVE_AFTER_DAYS = int(config("ARCHIVE_AFTER_DAYS", default="90"))
+BATCH_SIZE = 500
+
+POST_COLUMNS = ["post_id", "circle_id", "author_id", "content", "photo_url", "created_at"]
+COMMENT_COLUMNS = ["id", "post_id", "user_id", "content", "created_at"]
+LIKE_COLUMNS = ["id", "post_id", "user_id", "created_at"]
+
+
+def _bulk(statement):
+    return statement.execution_options(synchronize_session=False)
+
+
+def _columns(model, names):
+    return [getattr(model, name) for name in names]
+
+
+def _archive(db: Session, post_ids: list[int], now: datetime):
+    batch = Post.post_id.in_(post_ids)
+    like_count = select(func.count(Like.id)).where(Like.post_id == Post.post_id).correlate(Post).scalar_subquery()
+    db.execute(insert(ArchivedPost).from_select(
+        POST_COLUMNS + ["like_count", "archived_at"],
+        select(*_columns(Post, POST_COLUMNS), like_count, literal(now, DateTime)).where(batch)
+    ))
+    db.execute(insert(ArchivedComment).from_select(
+        COMMENT_COLUMNS, select(*_columns(Comment, COMMENT_COLUMNS)).where(Comment.post_id.in_(post_ids))
+    ))
+    db.execute(insert(ArchivedLike).from_select(
+        LIKE_COLUMNS, select(*_columns(Like, LIKE_COLUMNS)).where(Like.post_id.in_(post_ids))
+    ))
+    db.execute(_bulk(delete(Like).where(Like.post_id.in_(post_ids))))
+    db.execute(_bulk(delete(Comment).where(Comment.post_id.in_(post_ids))))
+    db.execute(_bulk(delete(Post).where(batch)))
+
+
+def _sweep(db: Session, now: datetime) -> int:
+    # comments and likes that landed in the hot tables after their post was
+    # archived (the request checked the post just before the batch moved it)
+    archived = select(ArchivedPost.post_id)
+    stray_comments = Comment.post_id.in_(archived)
+    stray_likes = Like.post_id.in_(archived)
+    liked = db.scalars(select(Like.post_id).where(stray_likes).distinct()).all()
+
+    swept = db.execute(insert(ArchivedComment).from_select(
+        COMMENT_COLUMNS, select(*_columns(Comment, COMMENT_COLUMNS)).where(stray_comments)
+    )).rowcount
+    swept += db.execute(upsert(ArchivedLike).from_select(
+        LIKE_COLUMNS, select(*_columns(Like, LIKE_COLUMNS)).where(stray_likes)
+    ).on_conflict_do_nothing()).rowcount
+    if liked:
+        like_count = select(func.count()).where(ArchivedLike.post_id == ArchivedPost.post_id).correlate(ArchivedPost).scalar_subquery()
+        db.execute(_bulk(
+            update(ArchivedPost).where(ArchivedPost.post_id.in_(liked)).values(like_count=like_count, archived_at=now)
+        ))
+    db.execute(_bulk(delete(Like).where(stray_likes)))
+    db.execute(_bulk(delete(Comment).where(stray_comments)))
+    return swept
+
+
+def archive_posts(older_than_days: int = ARCHIVE_AFTER_DAYS, batch_size: int = BATCH_SIZE, session_factory=SessionLocal) -> int:
+    """
+    Move posts created more than `older_than_days` ago, with their comments
+    and likes, to the archive tables of one database, a batch per
+    transaction. Returns how many posts were archived.
+    """
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    cutoff = now - timedelta(days=older_than_days)
+    archived = 0
+    last = 0
+    with session_factory() as db:
+        while True:
+            post_ids = db.scalars(
+                select(Post.post_id)
+                .where(Post.post_id > last, Post.created_at < cutoff)
+                .order_by(Post.post_id)
+                .limit(batch_size)
+            ).all()
+            if not post_ids:
+                break
+            _archive(db, post_ids, now)
+            db.commit()
+            archived += len(post_ids)
+            last = post_ids[-1]
+        _sweep(db, now)
+        db.commit()
+    return archived
+
+
+def thaw_post(db: Session, post_id: int) -> bool:
+    """
+    Move an archived post, its comments and likes back to the hot tables so
+    they can be written to. Returns False if the post isn't archived. Does
+    not commit.
+    """
+    thawed = db.execute(insert(Post).from_select(
+        POST_COLUMNS, select(*_columns(ArchivedPost, POST_COLUMNS)).where(ArchivedPost.post_id == post_id)
+    )).rowcount
+    if not thawed:
+        return False
+    db.execute(insert(Comment).from_select(
+        COMMENT_COLUMNS, select(*_columns(ArchivedComment, COMMENT_COLUMNS)).where(ArchivedComment.post_id == post_id)
+    ))
+    # a like that reached the hot table after archiving is the same like
+    db.execute(upsert(Like).from_select(
+        LIKE_COLUMNS, select(*_columns(ArchivedLike, LIKE_COLUMNS)).where(ArchivedLike.post_id == post_id)
+    ).on_conflict_do_nothing(index_elements=["post_id", "user_id"]))
+    db.execute(_bulk(delete(ArchivedLike).where(ArchivedLike.post_id == post_id)))
+    db.execute(_bulk(delete(ArchivedComment).where(ArchivedComment.post_id == post_id)))
+    db.execute(_bulk(delete(ArchivedPost).where(ArchivedPost.post_id == post_id)))
+    return True
+
+
+def archive_status(session_factory=SessionLocal) -> dict:
+    with session_factory() as db:
+        return {
+            "hot_posts": db.scalar(select(func.count()).select_from(Post)),
+            "archived_posts": db.scalar(select(func.count()).select_from(ArchivedPost)),
+        }
@@ -4,7 +4,7 @@ from typing import Annotated
 from decouple import config
 from jose import JWTError, jwt
 from fastapi.security import OAuth2PasswordBearer, HTTPBearer
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from ..database import get_db, SessionLocal
 from sqlalchemy.orm import Session
 from ..models import User
@@ -17,11 +17,17 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 SECRET_KEY = config("SECRET_KEY")
 ALGORITHM = config("ALGORITHM", default="HS256")
 ACCESS_TOKEN_MINUTES = int(config("ACCESS_TOKEN_MINUTES", default="480"))
+SET_PASSWORD_TOKEN_DAYS = int(config("SET_PASSWORD_TOKEN_DAYS", default="14"))
+
+# stored for imported users who haven't chosen a password yet; never matches
+UNUSABLE_PASSWORD = "!"
 
 def hash_password(password: str) -> str:
     return pwd_context.hash(password)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
+    if hashed_password == UNUSABLE_PASSWORD:
+        return False
     return pwd_context.verify(plain_password, hashed_password)
 
 def create_user_token(data: dict, expires_delta: timedelta):
@@ -36,7 +42,29 @@ def create_user_token(data: dict, expires_delta: timedelta):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)], db: Session = Depends(get_db)):
+def create_set_password_token(email: str) -> str:
+    return create_user_token(
+        {"sub": email, "purpose": "set_password"},
+        timedelta(days=SET_PASSWORD_TOKEN_DAYS)
+    )
+
+def read_set_password_token(token: str) -> str | None:
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+    if payload.get("purpose") != "set_password":
+        return None
+    return payload.get("sub")
+
+async def get_current_user(request: Request, token: Annotated[str, Depends(oauth2_scheme)], db: Session = Depends(get_db)):
+    # sub-requests of a /batch call reuse the user the batch resolved
+    batch_user = request.scope.get("batch", {}).get("user")
+    if batch_user is not None:
+        user = batch_user if batch_user in db else db.merge(batch_user, load=False)
+        db.info["user_id"] = user.id
+        return user
+    
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -46,7 +74,8 @@ async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)], db: Se
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email = payload.get("sub")
-        if email is None:
+        # set-password tokens only work on /set-password
+        if email is None or payload.get("purpose"):
             raise credentials_exception
     except JWTError:
         raise credentials_exception
@@ -56,9 +85,12 @@ async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)], db: Se
     user = db.query(User).filter(User.email == email).first()
     # db.close()
     
-    if user is None:
+    # deleted accounts stop working at once, before their data is purged
+    if user is None or user.deleted_at is not None:
         raise credentials_exception
     
+    # lets app.routing pin this user to the primary after they write
+    db.info["user_id"] = user.id
     return user
         
     
\ No newline at end of file
@@ -0,0 +1,128 @@
+import asyncio
+import orjson
+from decouple import config
+from sqlalchemy.orm import Session
+from .models import User
+
+# POST /batch: many API calls in one round trip. Each sub-request (method,
+# path, body) is dispatched in-process through the app itself, so it gets
+# the same routing, validation, rate limits and error responses as if it
+# had been sent on its own; only the network hop is saved.
+#
+# The batch resolves the user once. Sub-requests carry that user and the
+# batch's session in scope["batch"]: get_current_user hands the user back
+# without decoding the token or querying it again, and get_db and
+# get_read_db yield the shared session instead of opening one (so reads
+# see the batch's earlier writes, replicas or not). They run in order, each
+# committing its own work; a failed one is rolled back without touching
+# the rest.
+#
+# With parallel=true, each run of consecutive GETs between writes is read
+# concurrently on worker threads (at most BATCH_PARALLEL_READS at once).
+# Those reads get a session of their own, since a session can't be shared
+# across threads, and a copy of the user merged into it without a query.
+
+BATCH_PARALLEL_READS = int(config("BATCH_PARALLEL_READS", default="4"))
+
+BATCH_PATH = "/batch"
+READ_METHODS = {"GET", "HEAD"}
+
+
+def _sub_scope(scope, item, body: bytes, context: dict) -> dict:
+    path, _, query = item.path.partition("?")
+    # the caller's token so rate limits and auth see the same user
+    headers = [(name, value) for name, value in scope["headers"] if name == b"authorization"]
+    headers += [(b"accept", b"application/json"), (b"content-length", str(len(body)).encode())]
+    if body:
+        headers.append((b"content-type", b"application/json"))
+    return {
+        "type": "http",
+        "asgi": scope.get("asgi", {"version": "3.0"}),
+        "http_version": scope.get("http_version", "1.1"),
+        "scheme": scope.get("scheme", "http"),
+        "server": scope.get("server"),
+        "client": scope.get("client"),
+        "root_path": scope.get("root_path", ""),
+        "method": item.method,
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "headers": headers,
+        "state": dict(scope.get("state", {})),
+        "batch": context,
+    }
+
+
+async def dispatch(app, scope, item, context: dict) -> dict:
+    """
+    Run one sub-request through `app` and return its id, status, headers
+    and decoded body.
+    """
+    if not item.path.startswith("/") or item.path.partition("?")[0] == BATCH_PATH:
+        return {"id": item.id, "status": 400, "headers": {}, "body": {"detail": "Invalid batch path"}}
+
+    body = b"" if item.body is None else orjson.dumps(item.body)
+    sent = False
+    response = {"status": 500, "headers": {}, "chunks": []}
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        # never disconnects; the wait is cancelled once the response is done
+        await asyncio.Event().wait()
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+            response["headers"] = {
+                name.decode(): value.decode() for name, value in message.get("headers", [])
+                if name != b"content-length"
+            }
+        elif message["type"] == "http.response.body":
+            response["chunks"].append(message.get("body", b""))
+
+    sub_scope = _sub_scope(scope, item, body, context)
+    try:
+        await app(sub_scope, receive, send)
+    except Exception:
+        # ServerErrorMiddleware has already sent the 500 and re-raises
+        response["status"] = 500
+
+    content = b"".join(response["chunks"])
+    if response["headers"].get("content-type", "").startswith("application/json") and content:
+        decoded = orjson.loads(content)
+    else:
+        decoded = content.decode(errors="replace") or None
+    return {"id": item.id, "status": response["status"], "headers": response["headers"], "body": decoded}
+
+
+async def _isolated(app, scope, item, user: User, limit: asyncio.Semaphore) -> dict:
+    # a read on its own thread, event loop and session
+    async with limit:
+        return await asyncio.to_thread(asyncio.run, dispatch(app, scope, item, {"user": user}))
+
+
+async def run_batch(app, scope, items, user: User, db: Session, parallel: bool = False) -> list[dict]:
+    """
+    Dispatch `items` in order and return their results in the same order.
+    """
+    results = []
+    limit = asyncio.Semaphore(BATCH_PARALLEL_READS)
+    i = 0
+    while i < len(items):
+        if parallel and items[i].method in READ_METHODS:
+            j = i
+            while j < len(items) and items[j].method in READ_METHODS:
+                j += 1
+            results += await asyncio.gather(*(_isolated(app, scope, item, user, limit) for item in items[i:j]))
+            i = j
+            continue
+
+        results.append(await dispatch(app, scope, items[i], {"user": user, "session": db}))
+        # whatever a failed sub-request left uncommitted is not the next one's
+        if db.in_transaction():
+            db.rollback()
+        i += 1
+    return results
@@ -0,0 +1,177 @@
+import csv
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from .database import SessionLocal
+from .models import User, Circle
+from .schemas import UserImport
+from .memberships import add_memberships, own_circle_ids
+from .sharding import place_circles
+from .auth.custom_auth import hash_password, create_set_password_token, UNUSABLE_PASSWORD
+
+# Bulk onboarding: read users from CSV or JSONL, hash passwords in a process
+# pool, and insert users, their own circles and circle_members rows with
+# executemany batches, committing once per batch. Bad rows are reported and
+# skipped; they never abort the rest of the file.
+
+DEFAULT_BATCH_SIZE = 500
+
+
+@dataclass
+class ImportReport:
+    imported: int = 0
+    errors: list[tuple[int, str]] = field(default_factory=list)
+    tokens: list[tuple[str, str]] = field(default_factory=list)
+    seconds: float = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.imported / self.seconds if self.seconds else 0.0
+
+
+def read_rows(path: str):
+    """
+    Yield (line_number, dict) from a .csv or .jsonl file.
+    """
+    if path.endswith(".jsonl") or path.endswith(".ndjson"):
+        with open(path, encoding="utf-8") as f:
+            for line_no, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    yield line_no, json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield line_no, e
+    else:
+        with open(path, newline="", encoding="utf-8") as f:
+            # header is line 1
+            for line_no, row in enumerate(csv.DictReader(f), start=2):
+                yield line_no, row
+
+
+def _validate(rows, report: ImportReport):
+    seen = set()
+    for line_no, raw in rows:
+        if isinstance(raw, Exception):
+            report.errors.append((line_no, f"invalid JSON: {raw}"))
+            continue
+        try:
+            row = UserImport.model_validate(raw)
+        except ValidationError as e:
+            report.errors.append((line_no, "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())))
+            continue
+        email = row.email.lower()
+        if email in seen:
+            report.errors.append((line_no, f"duplicate email {row.email} in file"))
+            continue
+        seen.add(email)
+        yield line_no, row
+
+
+def _batches(rows, size: int):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _hash_all(pool: ProcessPoolExecutor | None, passwords: list[str]) -> list[str]:
+    if pool is None:
+        return [hash_password(p) for p in passwords]
+    return list(pool.map(hash_password, passwords, chunksize=max(1, len(passwords) // 32)))
+
+
+def _import_batch(db, batch, pool, report: ImportReport):
+    emails = [row.email for _, row in batch]
+    existing = set(db.scalars(select(User.email).where(User.email.in_(emails))))
+    fresh = []
+    for line_no, row in batch:
+        if row.email in existing:
+            report.errors.append((line_no, f"{row.email} is already registered"))
+        else:
+            fresh.append((line_no, row))
+    if not fresh:
+        return
+
+    with_password = [row.password for _, row in fresh if row.password]
+    hashes = iter(_hash_all(pool, with_password))
+
+    user_ids = db.execute(
+        insert(User).returning(User.id, sort_by_parameter_order=True),
+        [
+            {
+                "name": row.name,
+                "email": row.email,
+                "hashed_password": next(hashes) if row.password else UNUSABLE_PASSWORD,
+            }
+            for _, row in fresh
+        ]
+    ).scalars().all()
+
+    circle_ids = db.execute(
+        insert(Circle).returning(Circle.id, sort_by_parameter_order=True),
+        [{"name": f"{row.name}'s Circle", "creator_id": user_id} for (_, row), user_id in zip(fresh, user_ids)]
+    ).scalars().all()
+
+    place_circles(db, circle_ids)
+    pairs = list(zip(user_ids, circle_ids))
+
+    # joining an owner's circle works like an accepted invitation: both ways
+    owner_emails = {row.circle_owner for _, row in fresh if row.circle_owner}
+    if owner_emails:
+        owner_ids = dict(db.execute(select(User.email, User.id).where(User.email.in_(owner_emails))).all())
+        owner_circles = own_circle_ids(db, owner_ids.values())
+        for (line_no, row), user_id, circle_id in zip(fresh, user_ids, circle_ids):
+            if not row.circle_owner:
+                continue
+            owner_id = owner_ids.get(row.circle_owner)
+            if owner_id is None or owner_id not in owner_circles:
+                report.errors.append((line_no, f"imported, but circle owner {row.circle_owner} was not found"))
+                continue
+            pairs.append((user_id, owner_circles[owner_id]))
+            pairs.append((owner_id, circle_id))
+
+    add_memberships(db, pairs)
+    db.commit()
+
+    report.imported += len(fresh)
+    report.tokens.extend(
+        (row.email, create_set_password_token(row.email))
+        for _, row in fresh if not row.password
+    )
+
+
+def import_users(path: str, workers: int | None = None, batch_size: int = DEFAULT_BATCH_SIZE, session_factory=SessionLocal) -> ImportReport:
+    """
+    Import every valid row of `path`. Owners referenced by circle_owner must
+    already be registered or appear in the same file (no later than the
+    batch that references them).
+    """
+    report = ImportReport()
+    start = time.perf_counter()
+    workers = os.cpu_count() if workers is None else workers
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+
+    try:
+        with session_factory() as db:
+            for batch in _batches(_validate(read_rows(path), report), batch_size):
+                try:
+                    _import_batch(db, batch, pool, report)
+                except Exception as e:
+                    db.rollback()
+                    report.errors.extend((line_no, f"batch failed: {e}") for line_no, _ in batch)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    report.seconds = time.perf_counter() - start
+    report.errors.sort()
+    return report
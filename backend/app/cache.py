@@ -0,0 +1,281 @@
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from decouple import config
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+# Response cache shared by every worker.
+#
+# Values are JSON bytes, stored under a key plus the tags whose changes make
+# them stale ("circle:3", "post:17", "member:5"). Each tag has a generation
+# number and the generations are part of the stored key, so invalidating a
+# tag is just bumping its generation: old entries become unreachable and
+# age out with their TTL. Reads try a per-process LRU first, then the
+# optional shared tier.
+#
+# The shared tier is also the invalidation bus. Generations live in its
+# SQLite file; every worker polls for bumps at most every
+# CACHE_BUS_POLL_SECONDS, so another worker's write is seen within that
+# window (a worker's own writes are seen immediately). Without a shared
+# tier each worker only sees its own invalidations and CACHE_TTL_SECONDS
+# bounds how stale a page can get, which is fine for a single worker.
+#
+# Mutations call invalidate_on_commit(db, *tags); the bumps are fired after
+# the transaction commits, so a reader can't re-cache the old rows in
+# between, and are dropped if it rolls back.
+
+CACHE_ENABLED = config("CACHE_ENABLED", default="true").lower() == "true"
+CACHE_TTL_SECONDS = float(config("CACHE_TTL_SECONDS", default="30"))
+CACHE_LOCAL_ENTRIES = int(config("CACHE_LOCAL_ENTRIES", default="10000"))
+CACHE_SHARED = config("CACHE_SHARED", default="")
+CACHE_BUS_POLL_SECONDS = float(config("CACHE_BUS_POLL_SECONDS", default="0.5"))
+
+
+class LocalLRU:
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+
+    def get(self, key: str, now: float) -> bytes | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires = entry
+        if expires < now:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: bytes, expires: float):
+        self._entries[key] = (value, expires)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteSharedStore:
+    """
+    Shared tier in an SQLite file every worker on the host opens: cached
+    values plus tag generations. The same methods could be backed by Redis
+    for multi-host setups.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL NOT NULL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS generations (tag TEXT PRIMARY KEY, gen INTEGER NOT NULL, seq INTEGER NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_generations_seq ON generations (seq)")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str, now: float) -> bytes | None:
+        row = self._connection().execute(
+            "SELECT value FROM entries WHERE key = ? AND expires >= ?", (key, now)
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: bytes, expires: float):
+        conn = self._connection()
+        conn.execute("INSERT OR REPLACE INTO entries (key, value, expires) VALUES (?, ?, ?)", (key, value, expires))
+
+    def prune(self, now: float):
+        self._connection().execute("DELETE FROM entries WHERE expires < ?", (now,))
+
+    def generations(self, tags) -> dict[str, int]:
+        tags = list(tags)
+        placeholders = ",".join("?" * len(tags))
+        found = dict(self._connection().execute(
+            f"SELECT tag, gen FROM generations WHERE tag IN ({placeholders})", tags
+        ).fetchall())
+        return {tag: found.get(tag, 0) for tag in tags}
+
+    def bump(self, tags) -> dict[str, int]:
+        conn = self._connection()
+        bumped = {}
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            seq = conn.execute("SELECT coalesce(max(seq), 0) FROM generations").fetchone()[0]
+            for tag in tags:
+                seq += 1
+                bumped[tag] = conn.execute(
+                    "INSERT INTO generations (tag, gen, seq) VALUES (?, 1, ?) "
+                    "ON CONFLICT(tag) DO UPDATE SET gen = gen + 1, seq = excluded.seq "
+                    "RETURNING gen", (tag, seq)
+                ).fetchone()[0]
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return bumped
+
+    def last_seq(self) -> int:
+        return self._connection().execute("SELECT coalesce(max(seq), 0) FROM generations").fetchone()[0]
+
+    def changes_since(self, seq: int) -> list[tuple[str, int, int]]:
+        return self._connection().execute(
+            "SELECT tag, gen, seq FROM generations WHERE seq > ? ORDER BY seq", (seq,)
+        ).fetchall()
+
+
+class Cache:
+    def __init__(self, shared=None, ttl: float = CACHE_TTL_SECONDS, local_entries: int = CACHE_LOCAL_ENTRIES,
+                 poll_interval: float = CACHE_BUS_POLL_SECONDS, enabled: bool = CACHE_ENABLED):
+        self.enabled = enabled
+        self.ttl = ttl
+        self.shared = shared
+        self.poll_interval = poll_interval
+        self.local = LocalLRU(local_entries)
+        self._generations = {}
+        self._lock = threading.Lock()
+        self._last_poll = 0.0
+        self._last_seq = shared.last_seq() if shared else 0
+        self.counters = dict.fromkeys(("local_hits", "shared_hits", "misses", "sets", "invalidations"), 0)
+
+    def _poll_bus(self, now: float):
+        # learn about other workers' invalidations, at most once per interval
+        if self.shared is None or now - self._last_poll < self.poll_interval:
+            return
+        self._last_poll = now
+        for tag, gen, seq in self.shared.changes_since(self._last_seq):
+            if tag in self._generations:
+                self._generations[tag] = gen
+            self._last_seq = seq
+
+    def _versioned(self, key: str, tags) -> str:
+        tags = sorted(tags)
+        unknown = [tag for tag in tags if tag not in self._generations]
+        if unknown:
+            if len(self._generations) > self.local.max_entries * 4:
+                # forget generations of tags not seen lately and re-read them
+                # on demand; without a shared tier to re-read from, entries
+                # stored under the forgotten ones must go too
+                self._generations.clear()
+                if self.shared is None:
+                    self.local = LocalLRU(self.local.max_entries)
+            self._generations.update(self.shared.generations(unknown) if self.shared else dict.fromkeys(unknown, 0))
+        return key + "#" + ",".join(f"{tag}={self._generations[tag]}" for tag in tags)
+
+    def _lookup(self, key: str, tags) -> tuple[str, bytes | None]:
+        now = time.time()
+        with self._lock:
+            self._poll_bus(now)
+            versioned = self._versioned(key, tags)
+            value = self.local.get(versioned, now)
+            if value is not None:
+                self.counters["local_hits"] += 1
+                return versioned, value
+            if self.shared is not None:
+                value = self.shared.get(versioned, now)
+                if value is not None:
+                    self.local.set(versioned, value, now + self.ttl)
+                    self.counters["shared_hits"] += 1
+                    return versioned, value
+            self.counters["misses"] += 1
+            return versioned, None
+
+    def _store(self, versioned: str, value: bytes, ttl: float | None):
+        expires = time.time() + (ttl or self.ttl)
+        with self._lock:
+            self.local.set(versioned, value, expires)
+            if self.shared is not None:
+                self.shared.set(versioned, value, expires)
+                if self.counters["sets"] % 1000 == 0:
+                    self.shared.prune(time.time())
+            self.counters["sets"] += 1
+
+    def get(self, key: str, tags=()) -> bytes | None:
+        if not self.enabled:
+            return None
+        return self._lookup(key, tags)[1]
+
+    def set(self, key: str, value: bytes, tags=(), ttl: float | None = None):
+        if not self.enabled:
+            return
+        with self._lock:
+            versioned = self._versioned(key, tags)
+        self._store(versioned, value, ttl)
+
+    def get_or_set(self, key: str, tags, produce, ttl: float | None = None, db: Session | None = None) -> bytes:
+        """
+        Cached bytes for key, or the result of produce() (which must return
+        bytes), stored for next time. The value is stored under the
+        generations seen before produce() ran, so if a tag is invalidated
+        while it runs the possibly stale result is never served. `db` is the
+        session produce() reads; a replica's result (see app.routing) is
+        returned but not stored, since it may predate a write the current
+        generations already account for.
+        """
+        if not self.enabled:
+            return produce()
+        versioned, value = self._lookup(key, tags)
+        if value is None:
+            value = produce()
+            if db is None or not db.info.get("replica"):
+                self._store(versioned, value, ttl)
+        return value
+
+    def invalidate(self, *tags):
+        if not tags:
+            return
+        with self._lock:
+            if self.shared is not None:
+                self._generations.update(self.shared.bump(tags))
+            else:
+                for tag in tags:
+                    self._generations[tag] = self._generations.get(tag, 0) + 1
+            self.counters["invalidations"] += len(tags)
+
+    def stats(self) -> dict:
+        lookups = self.counters["local_hits"] + self.counters["shared_hits"] + self.counters["misses"]
+        hits = lookups - self.counters["misses"]
+        return {
+            **self.counters,
+            "hit_ratio": round(hits / lookups, 4) if lookups else None,
+            "local_entries": len(self.local),
+            "shared": self.shared is not None,
+        }
+
+
+def make_shared(spec: str = CACHE_SHARED):
+    if not spec:
+        return None
+    if spec.startswith("sqlite:///"):
+        return SQLiteSharedStore(spec.removeprefix("sqlite:///"))
+    raise ValueError(f"Unknown CACHE_SHARED {spec!r}")
+
+
+cache = Cache(shared=make_shared())
+
+
+def invalidate_on_commit(db: Session, *tags):
+    db.info.setdefault("cache_tags", set()).update(tags)
+
+
+@event.listens_for(Session, "after_commit")
+def _fire_invalidations(session):
+    tags = session.info.pop("cache_tags", None)
+    if tags:
+        try:
+            cache.invalidate(*tags)
+        except sqlite3.Error as e:
+            # the write is committed either way; entries still expire by TTL
+            print(f"Cache invalidation failed for {sorted(tags)}: {e}")
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_invalidations(session):
+    session.info.pop("cache_tags", None)
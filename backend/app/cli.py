@@ -0,0 +1,199 @@
+"""
+Maintenance commands for the CircleShare backend.
+
+Run from the backend directory:
+    python -m app.cli search-rebuild
+    python -m app.cli export 3 -o circle-3.zip --format zip --photos
+    python -m app.cli import-users family.csv --tokens-out tokens.csv
+    python -m app.cli purge-photos
+    python -m app.cli purge-accounts
+    python -m app.cli digest --send
+    python -m app.cli shards rebalance
+    python -m app.cli archive --days 90
+"""
+import argparse
+import csv
+import time
+from .database import SessionLocal
+
+
+def search_rebuild(args):
+    from .search import rebuild_index
+    from .sharding import session_factories
+
+    start = time.perf_counter()
+    count = 0
+    # every shard has its own index
+    for factory in session_factories.values():
+        with factory() as db:
+            count += rebuild_index(db)
+    print(f"Indexed {count} posts and comments in {time.perf_counter() - start:.1f}s")
+
+
+def export(args):
+    from .export import parse_resume, stream_ndjson, stream_zip
+    from .sharding import session_factories, shard_of
+
+    with SessionLocal() as db:
+        session_factory = session_factories[shard_of(db, args.circle_id)]
+    if args.format == "zip":
+        chunks = stream_zip(args.circle_id, include_photos=args.photos, session_factory=session_factory)
+    else:
+        chunks = stream_ndjson(args.circle_id, parse_resume(args.resume_after), session_factory)
+
+    # appending lets an interrupted NDJSON export continue in the same file
+    mode = "ab" if args.resume_after else "wb"
+    written = 0
+    with open(args.output, mode) as out:
+        for chunk in chunks:
+            out.write(chunk)
+            written += len(chunk)
+    print(f"Wrote {written} bytes to {args.output}")
+
+
+def import_users(args):
+    from .bulk_import import import_users as run_import
+
+    report = run_import(args.path, workers=args.workers, batch_size=args.batch_size)
+
+    for line_no, message in report.errors:
+        print(f"line {line_no}: {message}")
+    print(f"Imported {report.imported} users in {report.seconds:.1f}s ({report.rows_per_second:.0f} rows/sec), {len(report.errors)} errors")
+
+    if report.tokens:
+        with open(args.tokens_out, "w", newline="") as out:
+            writer = csv.writer(out)
+            writer.writerow(["email", "set_password_token"])
+            writer.writerows(report.tokens)
+        print(f"Wrote {len(report.tokens)} set-password tokens to {args.tokens_out}")
+
+
+def purge_photos(args):
+    from .deletion import purge_photos as run_purge
+
+    purged = run_purge()
+    print(f"Removed {purged} photos of deleted posts from storage")
+
+
+def purge_accounts(args):
+    from .account_purge import resume_purges
+
+    def report(job):
+        print(f"user {job.user_id}: {job.step}, {job.deleted} rows deleted", end="\r")
+
+    resumed = resume_purges(batch_size=args.batch_size, progress=report)
+    print(f"\nFinished {resumed} pending account purges" if resumed else "No pending account purges")
+
+
+def digest(args):
+    from datetime import date
+    from .digest import compute_digests, send_digests, last_full_week
+
+    week = date.fromisoformat(args.week) if args.week else last_full_week()
+    start = time.perf_counter()
+    stored = compute_digests(week, batch_size=args.batch_size)
+    print(f"Computed {stored} circle digests for the week of {week} in {time.perf_counter() - start:.1f}s")
+    if args.send:
+        sent = send_digests(week, batch_size=args.batch_size)
+        print(f"Sent {sent} digest emails")
+
+
+def shards(args):
+    from . import sharding
+
+    if args.action == "init":
+        created = sharding.init_shards()
+        print(f"Shard tables ready in {', '.join(created)}" if created else "CIRCLE_SHARDS lists no shard files")
+    elif args.action == "status":
+        print(f"{'shard':<12} {'ring':<5} {'circles':>8} {'posts':>9} {'to move':>8}")
+        for row in sharding.shard_status():
+            print(f"{row['shard']:<12} {'yes' if row['on_ring'] else 'no':<5} {row['circles']:>8} {row['posts']:>9} {row['to_move']:>8}")
+    elif args.action == "move":
+        copied = sharding.move_circle(args.circle_id, args.target, batch_size=args.batch_size)
+        print(f"Moved circle {args.circle_id} to {args.target} ({copied} rows copied)")
+    else:
+        with SessionLocal() as db:
+            moves = sharding.misplaced(db)[:args.limit]
+        for circle_id, source, target in moves:
+            if args.dry_run:
+                print(f"circle {circle_id}: {source} -> {target}")
+                continue
+            start = time.perf_counter()
+            copied = sharding.move_circle(circle_id, target, batch_size=args.batch_size)
+            print(f"circle {circle_id}: {source} -> {target}, {copied} rows in {time.perf_counter() - start:.1f}s")
+        print(f"{len(moves)} circles {'to move' if args.dry_run else 'moved'}")
+
+
+def archive(args):
+    from .archive import ARCHIVE_AFTER_DAYS, archive_posts, archive_status
+    from .sharding import session_factories
+
+    days = ARCHIVE_AFTER_DAYS if args.days is None else args.days
+    # every shard archives its own circles' posts
+    for name, factory in session_factories.items():
+        start = time.perf_counter()
+        archived = archive_posts(days, batch_size=args.batch_size, session_factory=factory)
+        status = archive_status(factory)
+        print(
+            f"{name}: archived {archived} posts in {time.perf_counter() - start:.1f}s, "
+            f"{status['hot_posts']} hot, {status['archived_posts']} archived"
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="CircleShare maintenance commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    rebuild = commands.add_parser("search-rebuild", help="rebuild the full-text search index from posts and comments")
+    rebuild.set_defaults(func=search_rebuild)
+
+    export_parser = commands.add_parser("export", help="stream a circle's posts, comments and likes to a file")
+    export_parser.add_argument("circle_id", type=int)
+    export_parser.add_argument("-o", "--output", required=True)
+    export_parser.add_argument("--format", choices=["ndjson", "zip"], default="ndjson")
+    export_parser.add_argument("--photos", action="store_true", help="bundle post photos (zip only)")
+    export_parser.add_argument("--resume-after", help="cursor of the last record already written (ndjson only)")
+    export_parser.set_defaults(func=export)
+
+    import_parser = commands.add_parser("import-users", help="bulk import users from CSV or JSONL (name, email, password, circle_owner)")
+    import_parser.add_argument("path")
+    import_parser.add_argument("--workers", type=int, default=None, help="password hashing processes (default: CPU count)")
+    import_parser.add_argument("--batch-size", type=int, default=500)
+    import_parser.add_argument("--tokens-out", default="set_password_tokens.csv", help="where to write tokens for rows without a password")
+    import_parser.set_defaults(func=import_users)
+
+    purge_parser = commands.add_parser("purge-photos", help="delete queued photos of deleted posts and circles from storage")
+    purge_parser.set_defaults(func=purge_photos)
+
+    accounts_parser = commands.add_parser("purge-accounts", help="finish purging deleted accounts, resuming where each one stopped")
+    accounts_parser.add_argument("--batch-size", type=int, default=500)
+    accounts_parser.set_defaults(func=purge_accounts)
+
+    digest_parser = commands.add_parser("digest", help="compute the weekly circle digests (run weekly, e.g. Monday 06:00 from cron)")
+    digest_parser.add_argument("--week", help="Monday the week starts on, YYYY-MM-DD (default: last full week)")
+    digest_parser.add_argument("--send", action="store_true", help="also email them through DIGEST_SENDER")
+    digest_parser.add_argument("--batch-size", type=int, default=500)
+    digest_parser.set_defaults(func=digest)
+
+    shards_parser = commands.add_parser("shards", help="set up CIRCLE_SHARDS and move circles to the shard the ring assigns them")
+    shards_parser.add_argument("action", choices=["init", "status", "rebalance", "move"])
+    shards_parser.add_argument("circle_id", type=int, nargs="?", help="circle to move (move only)")
+    shards_parser.add_argument("target", nargs="?", help="shard to move it to (move only)")
+    shards_parser.add_argument("--dry-run", action="store_true", help="list the moves a rebalance would make")
+    shards_parser.add_argument("--limit", type=int, default=None, help="move at most this many circles")
+    shards_parser.add_argument("--batch-size", type=int, default=500)
+    shards_parser.set_defaults(func=shards)
+
+    archive_parser = commands.add_parser("archive", help="move old posts with their comments and likes to the archive tables (run daily from cron)")
+    archive_parser.add_argument("--days", type=int, default=None, help="archive posts older than this (default: ARCHIVE_AFTER_DAYS)")
+    archive_parser.add_argument("--batch-size", type=int, default=500)
+    archive_parser.set_defaults(func=archive)
+
+    args = parser.parse_args(argv)
+    if args.func is shards and args.action == "move" and (args.circle_id is None or args.target is None):
+        parser.error("shards move needs a circle id and a target shard")
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,31 @@
-import cloudinary
-import cloudinary.uploader
-import cloudinary.api
 from fastapi import HTTPException
+from functools import cache
 import os
-from dotenv import load_dotenv
+import urllib.request
+from urllib.parse import urlparse
 
-# Load environment variables from .env file
-load_dotenv()
+@cache
+def cloudinary_client():
+    """
+    Import and configure the Cloudinary SDK on first use rather than at app
+    import, so workers and tests that never touch photos don't pay for it
+    """
+    import cloudinary
+    import cloudinary.uploader
+    import cloudinary.api
+    from dotenv import load_dotenv
 
-# Cloudinary configuration
-# You'll need to set these environment variables or replace with your actual credentials
-CLOUDINARY_CLOUD_NAME = os.getenv("CLOUDINARY_CLOUD_NAME", "your_cloud_name")
-CLOUDINARY_API_KEY = os.getenv("CLOUDINARY_API_KEY", "your_api_key") 
-CLOUDINARY_API_SECRET = os.getenv("CLOUDINARY_API_SECRET", "your_api_secret")
+    # Load environment variables from .env file
+    load_dotenv()
 
-cloudinary.config(
-    cloud_name=CLOUDINARY_CLOUD_NAME,
-    api_key=CLOUDINARY_API_KEY,
-    api_secret=CLOUDINARY_API_SECRET
-)
+    # Cloudinary configuration
+    # You'll need to set these environment variables or replace with your actual credentials
+    cloudinary.config(
+        cloud_name=os.getenv("CLOUDINARY_CLOUD_NAME", "your_cloud_name"),
+        api_key=os.getenv("CLOUDINARY_API_KEY", "your_api_key"),
+        api_secret=os.getenv("CLOUDINARY_API_SECRET", "your_api_secret")
+    )
+    return cloudinary
 
 async def upload_image(file_data: bytes, filename: str) -> str:
     """
@@ -26,7 +33,7 @@ async def upload_image(file_data: bytes, filename: str) -> str:
     """
     try:
         # Upload the image to Cloudinary
-        result = cloudinary.uploader.upload(
+        result = cloudinary_client().uploader.upload(
             file_data,
             folder="family_journal",  # Organize uploads in a folder
             public_id=filename,       # Use original filename as public_id
@@ -45,8 +52,38 @@ async def delete_image(public_id: str) -> bool:
     Delete image from Cloudinary
     """
     try:
-        result = cloudinary.uploader.destroy(public_id)
+        result = cloudinary_client().uploader.destroy(public_id)
         return result.get("result") == "ok"
     except Exception as e:
         print(f"Failed to delete image: {str(e)}")
-        return False
\ No newline at end of file
+        return False
+
+def open_image(url: str):
+    """
+    Open a stored image for streaming reads (file-like, use as a context manager)
+    """
+    return urllib.request.urlopen(url, timeout=30)
+
+def public_id_from_url(url: str) -> str | None:
+    """
+    Recover the public_id from a delivery URL
+    (.../image/upload/v123/family_journal/name.jpg -> family_journal/name)
+    """
+    path = urlparse(url).path
+    if "/upload/" not in path:
+        return None
+    parts = path.split("/upload/", 1)[1].split("/")
+    if parts[0].startswith("v") and parts[0][1:].isdigit():
+        parts = parts[1:]
+    return os.path.splitext("/".join(parts))[0] or None
+
+def delete_images(public_ids: list[str]) -> bool:
+    """
+    Delete up to 100 images from Cloudinary in one Admin API call
+    """
+    try:
+        cloudinary_client().api.delete_resources(public_ids)
+        return True
+    except Exception as e:
+        print(f"Failed to delete images: {str(e)}")
+        return False
@@ -1,4 +1,6 @@
-from sqlalchemy import create_engine
+from decouple import config
+from fastapi import Request
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
@@ -8,10 +10,46 @@ engine = create_engine('sqlite:///circle_share.db')
 
 SessionLocal = sessionmaker(bind=engine)
 
-def get_db():
+# engines for read-only requests (see app.routing): a comma-separated list of
+# database URLs, or "readonly" for read-only connections to the primary's file
+DATABASE_REPLICAS = config("DATABASE_REPLICAS", default="")
+
+
+def replica_url(spec: str) -> str:
+    if spec == "readonly":
+        return f"sqlite:///file:{engine.url.database}?mode=ro&uri=true"
+    return spec
+
+
+read_engines = [create_engine(replica_url(spec.strip())) for spec in DATABASE_REPLICAS.split(",") if spec.strip()]
+ReadSessionLocals = [sessionmaker(bind=read_engine) for read_engine in read_engines]
+
+def get_db(request: Request):
+    # sub-requests of a /batch call run on the batch's session (see app.batch)
+    shared = request.scope.get("batch", {}).get("session")
+    if shared is not None:
+        yield shared
+        return
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
 
+
+def warm_pool(size: int = 5):
+    """
+    Open `size` pooled connections up front so the first requests don't pay
+    for connecting.
+    """
+    pool_size = engine.pool.size() if hasattr(engine.pool, "size") else 1
+    connections = [engine.connect() for _ in range(min(size, pool_size))]
+    for conn in connections:
+        conn.execute(text("SELECT 1"))
+        conn.close()
+
+
+def has_alembic_schema() -> bool:
+    # the schema is owned by Alembic; the app only checks it has been applied
+    with engine.connect() as conn:
+        return inspect(conn).has_table("alembic_version")
@@ -0,0 +1,109 @@
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import Session
+from .database import SessionLocal
+from .models import Circle, CircleMember, CircleReadMark, CircleDigest, CirclePlacement, Post, Comment, Like, PhotoCleanup, ArchivedPost, ArchivedComment, ArchivedLike
+from .search import unindex_posts
+from .cloudinary_config import public_id_from_url, delete_images
+from .cache import invalidate_on_commit
+
+# Set-based deletes for posts and whole circles. Each table is cleared with a
+# single DELETE ... WHERE post_id IN (subquery), children before parents, so
+# removing a circle costs a handful of statements however many posts it has
+# and never pulls rows into the session. Photo URLs are copied into
+# photo_cleanup in the same transaction and removed from storage afterwards.
+
+# Admin API limit for one delete_resources call
+PHOTO_BATCH = 100
+
+
+def _bulk(statement):
+    # no identity-map sync: it would fetch every deleted id back into Python
+    return statement.execution_options(synchronize_session=False)
+
+
+def delete_posts(db: Session, *criteria, queue_photos: bool = True) -> int:
+    """
+    Delete the posts matching `criteria` along with their likes, comments and
+    search entries. Returns how many posts were deleted. Does not commit.
+    """
+    post_ids = select(Post.post_id).where(*criteria)
+    circle_ids = db.scalars(select(Post.circle_id).where(*criteria).distinct()).all()
+    invalidate_on_commit(db, *(f"circle:{circle_id}" for circle_id in circle_ids))
+
+    unindex_posts(db, post_ids)
+    if queue_photos:
+        db.execute(
+            insert(PhotoCleanup).from_select(
+                ["photo_url"],
+                select(Post.photo_url).where(*criteria, Post.photo_url.is_not(None))
+            )
+        )
+    db.execute(_bulk(delete(Like).where(Like.post_id.in_(post_ids))))
+    db.execute(_bulk(delete(Comment).where(Comment.post_id.in_(post_ids))))
+    return db.execute(_bulk(delete(Post).where(*criteria))).rowcount
+
+
+def delete_archived_posts(db: Session, *criteria, queue_photos: bool = True) -> int:
+    """
+    delete_posts for the archive tier: `criteria` are on ArchivedPost.
+    Does not commit.
+    """
+    post_ids = select(ArchivedPost.post_id).where(*criteria)
+    circle_ids = db.scalars(select(ArchivedPost.circle_id).where(*criteria).distinct()).all()
+    invalidate_on_commit(db, *(f"circle:{circle_id}" for circle_id in circle_ids))
+
+    unindex_posts(db, post_ids)
+    if queue_photos:
+        db.execute(
+            insert(PhotoCleanup).from_select(
+                ["photo_url"],
+                select(ArchivedPost.photo_url).where(*criteria, ArchivedPost.photo_url.is_not(None))
+            )
+        )
+    db.execute(_bulk(delete(ArchivedLike).where(ArchivedLike.post_id.in_(post_ids))))
+    db.execute(_bulk(delete(ArchivedComment).where(ArchivedComment.post_id.in_(post_ids))))
+    return db.execute(_bulk(delete(ArchivedPost).where(*criteria))).rowcount
+
+
+def delete_circle(db: Session, circle_id: int, queue_photos: bool = True) -> int:
+    """
+    Delete a circle, its memberships and everything posted in it. Returns
+    the number of posts removed. Does not commit.
+    """
+    deleted = delete_posts(db, Post.circle_id == circle_id, queue_photos=queue_photos)
+    deleted += delete_archived_posts(db, ArchivedPost.circle_id == circle_id, queue_photos=queue_photos)
+    member_ids = db.scalars(select(CircleMember.user_id).where(CircleMember.circle_id == circle_id)).all()
+    invalidate_on_commit(db, f"circle:{circle_id}", *(f"member:{user_id}" for user_id in member_ids))
+    db.execute(_bulk(delete(CircleReadMark).where(CircleReadMark.circle_id == circle_id)))
+    db.execute(_bulk(delete(CircleDigest).where(CircleDigest.circle_id == circle_id)))
+    db.execute(_bulk(delete(CircleMember).where(CircleMember.circle_id == circle_id)))
+    db.execute(_bulk(delete(CirclePlacement).where(CirclePlacement.circle_id == circle_id)))
+    db.execute(_bulk(delete(Circle).where(Circle.id == circle_id)))
+    return deleted
+
+
+def purge_photos(session_factory=SessionLocal) -> int:
+    """
+    Drain photo_cleanup, deleting from storage 100 photos per call. Stops
+    early (leaving the rest queued) if storage is unavailable. Safe to run
+    as a background task or from the CLI; returns how many were purged.
+    """
+    purged = 0
+    with session_factory() as db:
+        while True:
+            rows = db.execute(
+                select(PhotoCleanup.id, PhotoCleanup.photo_url)
+                .order_by(PhotoCleanup.id)
+                .limit(PHOTO_BATCH)
+            ).all()
+            if not rows:
+                break
+
+            public_ids = [pid for pid in (public_id_from_url(row.photo_url) for row in rows) if pid]
+            if public_ids and not delete_images(public_ids):
+                break
+
+            db.execute(_bulk(delete(PhotoCleanup).where(PhotoCleanup.id.in_([row.id for row in rows]))))
+            db.commit()
+            purged += len(rows)
+    return purged
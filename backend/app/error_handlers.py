@@ -1,6 +1,6 @@
 from fastapi import Request
 from fastapi.responses import JSONResponse
-from .exceptions import AccessDenied, CircleNotFound, InviteAlreadyResponded, InviteAlreadySent, InviteNotFound, PostNotFound, UserAlreadyJoined, UserNotFound, EmailAlreadyExists, InvalidCredentials, UserNotInCircle
+from .exceptions import AccessDenied, CircleNotFound, InviteAlreadyResponded, InviteAlreadySent, InviteNotFound, PostNotFound, UserAlreadyJoined, UserNotFound, EmailAlreadyExists, InvalidCredentials, UserNotInCircle, InvalidCursor, InvalidFields, IdempotencyKeyReused, CircleMoving
 from .schemas import ErrorDetail
 from datetime import datetime
 
@@ -109,4 +109,52 @@ async def invite_already_responded_handler(requests: Request, exc: InviteAlready
     error_detail = ErrorDetail(
         type="invite_already_reponded",
         message=exc.detail
-    )
\ No newline at end of file
+    )
+
+
+async def invalid_cursor_handler(request: Request, exc: InvalidCursor):
+    error_detail = ErrorDetail(
+        type="invalid_cursor",
+        message=exc.detail
+    )
+    
+    return JSONResponse(
+        status_code=exc.status_code,
+        content=error_detail.model_dump(mode='json')
+    )
+
+async def invalid_fields_handler(request: Request, exc: InvalidFields):
+    error_detail = ErrorDetail(
+        type="invalid_fields",
+        message=exc.detail
+    )
+    
+    return JSONResponse(
+        status_code=exc.status_code,
+        content=error_detail.model_dump(mode='json')
+    )
+
+
+async def idempotency_key_reused_handler(request: Request, exc: IdempotencyKeyReused):
+    error_detail = ErrorDetail(
+        type="idempotency_key_reused",
+        message=exc.detail
+    )
+    
+    return JSONResponse(
+        status_code=exc.status_code,
+        content=error_detail.model_dump(mode='json')
+    )
+
+
+async def circle_moving_handler(request: Request, exc: CircleMoving):
+    error_detail = ErrorDetail(
+        type="circle_moving",
+        message=exc.detail
+    )
+    
+    return JSONResponse(
+        status_code=exc.status_code,
+        content=error_detail.model_dump(mode='json'),
+        headers=exc.headers
+    )
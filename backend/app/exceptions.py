@@ -66,4 +66,24 @@ class InviteNotFound(HTTPException):
 
 class InviteAlreadyResponded(HTTPException):
     def __init__(self):
-        super().__init__(status_code=400, detail="Invitation already responded")
\ No newline at end of file
+        super().__init__(status_code=400, detail="Invitation already responded")
+
+
+class InvalidCursor(HTTPException):
+    def __init__(self):
+        super().__init__(status_code=400, detail="Invalid pagination cursor")
+
+
+class InvalidFields(HTTPException):
+    def __init__(self):
+        super().__init__(status_code=400, detail="Unknown field requested")
+
+
+class IdempotencyKeyReused(HTTPException):
+    def __init__(self):
+        super().__init__(status_code=422, detail="Idempotency-Key was already used for a different request")
+
+
+class CircleMoving(HTTPException):
+    def __init__(self):
+        super().__init__(status_code=503, detail="This circle is being moved, please retry shortly", headers={"Retry-After": "5"})
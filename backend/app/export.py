@@ -0,0 +1,165 @@
+import heapq
+import io
+import os
+import zipfile
+from urllib.parse import urlparse
+import orjson
+from sqlalchemy import select
+from .database import SessionLocal
+from .models import User, Post, Comment, Like, ArchivedPost, ArchivedComment, ArchivedLike
+from .cloudinary_config import open_image
+from .exceptions import InvalidCursor
+
+# Streaming circle archives. Records are read with yield_per so only one
+# batch of rows is in memory at a time, and written as NDJSON in a fixed
+# order (posts, then comments, then likes, each by id across the hot and
+# archive tables). Every line carries a "cursor" ("<type>:<id>"); passing
+# the last one received as resume_after restarts the export right after
+# it, so interrupted downloads can resume.
+
+BATCH_SIZE = 500
+CHUNK_SIZE = 64 * 1024
+SECTIONS = ("post", "comment", "like")
+
+
+def parse_resume(token: str | None) -> tuple[str, int] | None:
+    if not token:
+        return None
+    kind, _, last_id = token.partition(":")
+    if kind not in SECTIONS or not last_id.isdigit():
+        raise InvalidCursor()
+    return kind, int(last_id)
+
+
+def _section_queries(circle_id: int):
+    # per section, the hot and the archive query with their id columns
+    circle_posts = select(Post.post_id).where(Post.circle_id == circle_id)
+    archived_posts = select(ArchivedPost.post_id).where(ArchivedPost.circle_id == circle_id)
+    return {
+        "post": [(posts.post_id, select(
+            posts.post_id.label("id"), posts.circle_id, posts.author_id, User.name.label("author_name"),
+            posts.content, posts.photo_url, posts.created_at
+        ).join(User, User.id == posts.author_id).where(posts.circle_id == circle_id)) for posts in (Post, ArchivedPost)],
+        "comment": [(comments.id, select(
+            comments.id, comments.post_id, comments.user_id, User.name.label("author_name"),
+            comments.content, comments.created_at
+        ).join(User, User.id == comments.user_id).where(comments.post_id.in_(scope))) for comments, scope in (
+            (Comment, circle_posts), (ArchivedComment, archived_posts)
+        )],
+        "like": [(likes.id, select(
+            likes.id, likes.post_id, likes.user_id, User.name.label("user_name"), likes.created_at
+        ).join(User, User.id == likes.user_id).where(likes.post_id.in_(scope))) for likes, scope in (
+            (Like, circle_posts), (ArchivedLike, archived_posts)
+        )],
+    }
+
+
+def iter_records(circle_id: int, resume: tuple[str, int] | None = None, session_factory=SessionLocal):
+    """
+    Yield every post, comment and like of a circle as a dict. Opens its own
+    session because it outlives the request's dependency-scoped one. The
+    hot and archive tables are read side by side and merged by id.
+    """
+    queries = _section_queries(circle_id)
+    skip = SECTIONS.index(resume[0]) if resume else 0
+
+    with session_factory() as db:
+        for kind in SECTIONS[skip:]:
+            tiers = []
+            for key, query in queries[kind]:
+                if resume and kind == resume[0]:
+                    query = query.where(key > resume[1])
+                tiers.append(db.execute(query.order_by(key).execution_options(yield_per=BATCH_SIZE)).mappings())
+            for row in heapq.merge(*tiers, key=lambda row: row["id"]):
+                record = {"type": kind, **row}
+                record["cursor"] = f"{kind}:{row['id']}"
+                yield record
+
+
+def _buffered(lines):
+    buffer = bytearray()
+    for line in lines:
+        buffer += line
+        if len(buffer) >= CHUNK_SIZE:
+            yield bytes(buffer)
+            buffer.clear()
+    if buffer:
+        yield bytes(buffer)
+
+
+def stream_ndjson(circle_id: int, resume: tuple[str, int] | None = None, session_factory=SessionLocal):
+    return _buffered(
+        orjson.dumps(record) + b"\n"
+        for record in iter_records(circle_id, resume, session_factory)
+    )
+
+
+class _ChunkSink(io.RawIOBase):
+    # write-only, unseekable target for ZipFile; zipfile falls back to data
+    # descriptors so entries never need to be rewound or held in memory
+    def __init__(self):
+        self.chunks = []
+        self.size = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        self.size = 0
+        return data
+
+
+def _photo_name(post_id: int, url: str) -> str:
+    basename = os.path.basename(urlparse(url).path) or "photo"
+    return f"photos/{post_id}-{basename}"
+
+
+def _iter_photos(circle_id: int, session_factory):
+    with session_factory() as db:
+        tiers = [
+            db.execute(
+                select(posts.post_id, posts.photo_url)
+                .where(posts.circle_id == circle_id, posts.photo_url.is_not(None))
+                .order_by(posts.post_id)
+                .execution_options(yield_per=BATCH_SIZE)
+            )
+            for posts in (Post, ArchivedPost)
+        ]
+        for post_id, url in heapq.merge(*tiers):
+            yield post_id, url
+
+
+def stream_zip(circle_id: int, include_photos: bool = False, session_factory=SessionLocal):
+    """
+    A ZIP with circle.ndjson and, optionally, each post's photo fetched
+    through the storage layer, produced incrementally.
+    """
+    sink = _ChunkSink()
+
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_DEFLATED) as archive:
+        with archive.open("circle.ndjson", mode="w", force_zip64=True) as entry:
+            for record in iter_records(circle_id, session_factory=session_factory):
+                entry.write(orjson.dumps(record) + b"\n")
+                if sink.size >= CHUNK_SIZE:
+                    yield sink.drain()
+
+        if include_photos:
+            for post_id, url in _iter_photos(circle_id, session_factory):
+                try:
+                    image = open_image(url)
+                except OSError as e:
+                    print(f"Skipping photo for post {post_id}: {e}")
+                    continue
+                with image, archive.open(_photo_name(post_id, url), mode="w", force_zip64=True) as entry:
+                    while chunk := image.read(CHUNK_SIZE):
+                        entry.write(chunk)
+                        if sink.size >= CHUNK_SIZE:
+                            yield sink.drain()
+    yield sink.drain()
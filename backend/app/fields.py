@@ -0,0 +1,66 @@
+from fastapi import Query
+from .exceptions import InvalidFields
+
+# Sparse fieldsets for the list endpoints (feeds, comments, likes).
+#
+# ?fields=post_id,content picks the fields each row carries, ?expand= adds
+# the costly ones on top: the author's name (a join on users) and, for
+# posts, like_count and user_liked (a count and a probe of likes per post).
+# Without either parameter a row carries every field, as before; with only
+# expand it carries the base fields plus the expansions. The query builders
+# in app.queries take the selection and leave out the columns, joins and
+# subqueries nobody asked for.
+#
+# Handlers may need a column the client didn't ask for, to sort or merge
+# shards and tiers on; with_keys adds it to the query and trim drops it from
+# the rows again. Each selection is cached as a page of its own.
+
+
+def _names(value: str | None) -> list[str]:
+    return [name.strip() for name in (value or "").split(",") if name.strip()]
+
+
+class FieldSet:
+    def __init__(self, base: tuple[str, ...], expandable: tuple[str, ...]):
+        self.base = base
+        self.expandable = expandable
+        self.all = base + expandable
+
+    def __call__(
+        self,
+        fields: str | None = Query(default=None, description="Comma-separated fields to return"),
+        expand: str | None = Query(default=None, description="Comma-separated costly fields to add")
+    ) -> tuple[str, ...] | None:
+        if fields is None and expand is None:
+            return None
+        requested = set(_names(fields)) if fields is not None else set(self.base)
+        expanded = set(_names(expand))
+        if not requested or not requested <= set(self.all) or not expanded <= set(self.expandable):
+            raise InvalidFields()
+        chosen = requested | expanded
+        # always in schema order, so equal selections share a cache entry
+        return tuple(name for name in self.all if name in chosen)
+
+
+POST_FIELDS = FieldSet(
+    ("post_id", "circle_id", "author_id", "content", "photo_url", "created_at"),
+    ("author_name", "like_count", "user_liked")
+)
+COMMENT_FIELDS = FieldSet(("id", "post_id", "user_id", "content", "created_at"), ("author_name",))
+LIKE_FIELDS = FieldSet(("id", "post_id", "user_id", "created_at"), ("user_name",))
+
+
+def with_keys(fields: tuple[str, ...] | None, *keys: str) -> tuple[str, ...] | None:
+    if fields is None:
+        return None
+    return fields + tuple(key for key in keys if key not in fields)
+
+
+def trim(rows: list[dict], fields: tuple[str, ...] | None) -> list[dict]:
+    if fields is None:
+        return rows
+    return [{name: row[name] for name in fields} for row in rows]
+
+
+def cache_suffix(fields: tuple[str, ...] | None) -> str:
+    return "" if fields is None else ":" + ",".join(fields)
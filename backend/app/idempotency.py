@@ -0,0 +1,126 @@
+import hashlib
+from datetime import datetime, timedelta, timezone
+import orjson
+from decouple import config
+from fastapi import Header, Response
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import delete, select, tuple_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from .models import IdempotencyKey
+from .exceptions import IdempotencyKeyReused
+
+# Idempotency-Key support for mutations that mobile clients retry. The
+# response is stored in the same transaction as the write it describes, so
+# either both commit or neither does; a retry with the same key then gets
+# the stored bytes back without touching anything else. A concurrent retry
+# that loses the race hits the primary key on commit and replays too.
+
+IDEMPOTENCY_TTL_HOURS = int(config("IDEMPOTENCY_TTL_HOURS", default="24"))
+REPLAY_HEADER = "Idempotent-Replayed"
+
+# expired rows are evicted a few at a time by the writes that add new ones
+EVICT_BATCH = 100
+
+
+def idempotency_key_header(
+    idempotency_key: str | None = Header(default=None, alias="Idempotency-Key", max_length=255)
+) -> str | None:
+    return idempotency_key
+
+
+def fingerprint(*parts) -> bytes:
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else str(part).encode())
+        digest.update(b"\0")
+    return digest.digest()[:16]
+
+
+class Idempotency:
+    """
+    Per-request handle. Without a key every method is a no-op, so handlers
+    follow one code path:
+
+        idem = Idempotency(db, user.id, key, "POST /x", payload)
+        if replayed := idem.replay():
+            return replayed
+        ... writes ...
+        response = idem.save(body)
+        if replayed := idem.commit():
+            return replayed
+        return response
+    """
+
+    def __init__(self, db: Session, user_id: int, key: str | None, *request_parts):
+        self.db = db
+        self.user_id = user_id
+        self.key = key
+        self.fingerprint = fingerprint(*request_parts) if key else None
+
+    def _cutoff(self) -> datetime:
+        return datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(hours=IDEMPOTENCY_TTL_HOURS)
+
+    def replay(self) -> Response | None:
+        if not self.key:
+            return None
+        stored = self.db.get(IdempotencyKey, (self.user_id, self.key))
+        if stored is None:
+            return None
+        if stored.created_at < self._cutoff():
+            self.db.delete(stored)
+            self.db.flush()
+            return None
+        if stored.fingerprint != self.fingerprint:
+            raise IdempotencyKeyReused()
+        return Response(
+            content=stored.body,
+            status_code=stored.status_code,
+            media_type="application/json",
+            headers={REPLAY_HEADER: "true"}
+        )
+
+    def save(self, body, status_code: int = 200):
+        """
+        Record the response in the current transaction (no commit). Returns
+        what the handler should send: the body itself without a key, or the
+        exact bytes a replay will send with one.
+        """
+        if not self.key:
+            return body
+        content = orjson.dumps(jsonable_encoder(body))
+        cutoff = self._cutoff()
+        expired = (
+            select(IdempotencyKey.user_id, IdempotencyKey.key)
+            .where(IdempotencyKey.created_at < cutoff)
+            .limit(EVICT_BATCH)
+        )
+        self.db.execute(
+            delete(IdempotencyKey)
+            .where(tuple_(IdempotencyKey.user_id, IdempotencyKey.key).in_(expired))
+            .execution_options(synchronize_session=False)
+        )
+        self.db.add(IdempotencyKey(
+            user_id=self.user_id,
+            key=self.key,
+            fingerprint=self.fingerprint,
+            status_code=status_code,
+            body=content,
+            created_at=datetime.now(timezone.utc).replace(tzinfo=None),
+        ))
+        return Response(content=content, status_code=status_code, media_type="application/json")
+
+    def commit(self) -> Response | None:
+        """
+        Commit the write and its stored response. If a concurrent request
+        with the same key committed first, roll back and return its response.
+        """
+        try:
+            self.db.commit()
+        except IntegrityError:
+            self.db.rollback()
+            replayed = self.replay()
+            if replayed is None:
+                raise
+            return replayed
+        return None
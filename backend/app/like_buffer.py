@@ -0,0 +1,234 @@
+import asyncio
+import threading
+import time
+from collections.abc import Callable
+from collections import defaultdict
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from decouple import config
+from sqlalchemy import select
+from . import notifications
+from .archive import thaw_post
+from .cache import invalidate_on_commit
+from .exceptions import CircleMoving
+from .likes import set_likes, unset_likes
+from .models import Post, User
+from .sharding import MAIN, new_id, session_factories, shard_of
+
+# Write-behind buffer for likes. A viral post gets a burst of likes from
+# across its circle, and written one request at a time each takes SQLite's
+# single write lock for an insert and a commit. With LIKE_BUFFER_MS set, the
+# like endpoints record the intent (like or unlike) here instead; repeats
+# for the same (post_id, user_id) collapse into the latest one, and a
+# background thread writes everything gathered in the window as one
+# transaction per shard: one insert for the likes, one delete for the
+# unlikes, and one for the notifications of the likes that are new.
+#
+# With LIKE_BUFFER_WAIT off, a like is acknowledged as soon as it is
+# buffered, so a crash loses at most the last LIKE_BUFFER_MS of likes (the
+# rest are flushed on shutdown), and a reader may not see a like until its
+# flush. With it on, the request waits for the flush and an acknowledged
+# like is committed; bursts still share one transaction. A full buffer
+# (LIKE_BUFFER_MAX intents) is flushed without waiting out the window.
+#
+# A batch that can't be written (the database is busy or locked, a circle
+# is being moved) goes back into the buffer and is retried, backing off up
+# to MAX_BACKOFF_SECONDS; setting or clearing a like twice is harmless, so
+# retrying never needs to know how far a failed flush got. Toggles with an
+# Idempotency-Key are written directly.
+
+LIKE_BUFFER_MS = int(config("LIKE_BUFFER_MS", default="0"))
+LIKE_BUFFER_MAX = int(config("LIKE_BUFFER_MAX", default="1000"))
+LIKE_BUFFER_WAIT = config("LIKE_BUFFER_WAIT", default="false").lower() == "true"
+MAX_BACKOFF_SECONDS = 1.0
+
+
+@dataclass
+class Intent:
+    circle_id: int
+    liked: bool
+    at: datetime
+    waiters: list[Future] = field(default_factory=list)
+
+
+class LikeBuffer:
+    def __init__(self, window_ms: int = LIKE_BUFFER_MS, max_pending: int = LIKE_BUFFER_MAX, wait: bool = LIKE_BUFFER_WAIT,
+                 factories: dict = session_factories):
+        # factories: a session factory per shard, MAIN's doubling as the catalog
+        self.factories = factories
+        self.window = window_ms / 1000
+        self.max_pending = max_pending
+        self.wait = wait
+        self._pending: dict[tuple[int, int], Intent] = {}
+        # the batch being written, still the latest word on its likes
+        self._flushing: dict[tuple[int, int], Intent] = {}
+        self._cond = threading.Condition()
+        self._thread = None
+        self._closed = False
+
+    @property
+    def enabled(self) -> bool:
+        return self.window > 0
+
+    async def set(self, post_id: int, user_id: int, circle_id: int, liked: bool):
+        await self._settled(self._record(post_id, user_id, circle_id, liked=liked)[1])
+
+    async def toggle(self, post_id: int, user_id: int, circle_id: int, stored: Callable[[], bool]) -> bool:
+        # a buffered intent wins over `stored`, which reads whether the
+        # database has the like; it is only called under the lock, so no
+        # flush can commit between the read and the toggle
+        liked, future = self._record(post_id, user_id, circle_id, stored=stored)
+        await self._settled(future)
+        return liked
+
+    async def _settled(self, future: Future | None):
+        if future is not None:
+            await asyncio.wrap_future(future)
+
+    def _record(self, post_id: int, user_id: int, circle_id: int, liked: bool | None = None, stored: Callable[[], bool] | None = None):
+        with self._cond:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="like-buffer", daemon=True)
+                self._thread.start()
+            intent = self._pending.get((post_id, user_id))
+            if liked is None:
+                latest = intent or self._flushing.get((post_id, user_id))
+                liked = not (latest.liked if latest else stored())
+            if intent:
+                intent.liked = liked
+                intent.at = datetime.now(timezone.utc)
+            else:
+                intent = self._pending[(post_id, user_id)] = Intent(circle_id, liked, datetime.now(timezone.utc))
+            future = None
+            if self.wait:
+                future = Future()
+                intent.waiters.append(future)
+            if len(self._pending) == 1 or len(self._pending) >= self.max_pending:
+                self._cond.notify()
+            return liked, future
+
+    def _run(self):
+        backoff = self.window
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                # let the burst gather, unless the buffer fills up first
+                deadline = time.monotonic() + self.window
+                while not self._closed and len(self._pending) < self.max_pending:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch, self._pending = self._pending, {}
+                self._flushing = batch
+            try:
+                requeued = self.flush(batch)
+            except Exception as e:
+                # never let the thread die with likes in the buffer
+                print(f"Like buffer flush failed, retrying {len(batch)} likes: {e}")
+                for key, intent in batch.items():
+                    self._requeue(key, intent)
+                requeued = len(batch)
+            finally:
+                with self._cond:
+                    self._flushing = {}
+            if requeued:
+                time.sleep(backoff)
+                backoff = min(backoff * 2, MAX_BACKOFF_SECONDS)
+            else:
+                backoff = self.window
+
+    def flush(self, batch: dict[tuple[int, int], Intent]) -> int:
+        """
+        Write `batch` with one transaction per shard and settle its waiters.
+        Intents that couldn't be written go back into the buffer; returns
+        how many.
+        """
+        requeued = 0
+        by_shard = defaultdict(dict)
+        with self.factories[MAIN]() as db:
+            for key, intent in batch.items():
+                try:
+                    by_shard[shard_of(db, intent.circle_id, writing=True)][key] = intent
+                except CircleMoving:
+                    self._requeue(key, intent)
+                    requeued += 1
+
+        for name, intents in by_shard.items():
+            try:
+                self._write(name, intents)
+            except Exception as e:
+                print(f"Like buffer flush failed on shard {name}, retrying {len(intents)} likes: {e}")
+                for key, intent in intents.items():
+                    self._requeue(key, intent)
+                requeued += len(intents)
+                continue
+            for intent in intents.values():
+                for future in intent.waiters:
+                    if not future.done():
+                        future.set_result(intent.liked)
+        return requeued
+
+    def _requeue(self, key: tuple[int, int], intent: Intent):
+        with self._cond:
+            newer = self._pending.get(key)
+            if newer is intent:
+                return
+            if newer:
+                # a later intent replaces this one; whoever waited on it waits on that
+                newer.waiters += intent.waiters
+            else:
+                self._pending[key] = intent
+
+    def _write(self, name: str, intents: dict[tuple[int, int], Intent]):
+        likes = [key for key, intent in intents.items() if intent.liked]
+        unlikes = [key for key, intent in intents.items() if not intent.liked]
+        # ids are reserved before the shard's write lock is taken
+        ids = {key: new_id("likes") for key in likes}
+
+        with self.factories[name]() as db:
+            hot = set(db.scalars(select(Post.post_id).where(Post.post_id.in_({post_id for post_id, _ in intents}))))
+            for post_id in {post_id for post_id, _ in intents} - hot:
+                # archived since the request checked it, or deleted
+                if thaw_post(db, post_id):
+                    hot.add(post_id)
+            likes = [key for key in likes if key[0] in hot]
+            unlikes = [key for key in unlikes if key[0] in hot]
+
+            added = set_likes(db, [
+                {"id": ids[key], "post_id": key[0], "user_id": key[1], "created_at": intents[key].at}
+                for key in likes
+            ])
+            unset_likes(db, unlikes)
+            # the authors of the liked posts, unless they deleted their account
+            authors = dict(db.execute(
+                select(Post.post_id, Post.author_id)
+                .join(User, User.id == Post.author_id)
+                .where(Post.post_id.in_({post_id for post_id, _ in added}), User.deleted_at.is_(None))
+            ).all()) if added else {}
+            notifications.notify_each(db, [
+                {"user_id": authors[post_id], "actor_id": user_id, "kind": notifications.LIKE,
+                 "post_id": post_id, "circle_id": intents[(post_id, user_id)].circle_id}
+                for post_id, user_id in added
+                if post_id in authors and authors[post_id] != user_id
+            ])
+            invalidate_on_commit(db, *(
+                tag for (post_id, _), intent in intents.items() for tag in (f"post:{post_id}", f"circle:{intent.circle_id}")
+            ))
+            db.commit()
+
+    def close(self, timeout: float = 10):
+        # flush whatever is buffered and stop the thread
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+
+like_buffer = LikeBuffer()
@@ -0,0 +1,53 @@
+from datetime import datetime, timezone
+from sqlalchemy import delete, tuple_
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+from .models import Like
+
+# Explicit like state for clients that retry: setting a like twice or
+# clearing it twice ends in the same place, unlike the toggle. Each is one
+# statement against the unique (post_id, user_id) index. Neither commits.
+# set_likes and unset_likes do the same for many likes at once (the like
+# buffer's flush, see app.like_buffer).
+
+CHUNK_SIZE = 500
+
+
+def set_like(db: Session, post_id: int, user_id: int, like_id: int | None = None) -> bool:
+    # True if the like is new; like_id is only given when ids come from the shard allocator
+    return db.execute(
+        insert(Like)
+        .values(id=like_id, post_id=post_id, user_id=user_id, created_at=datetime.now(timezone.utc))
+        .on_conflict_do_nothing(index_elements=["post_id", "user_id"])
+    ).rowcount == 1
+
+
+def unset_like(db: Session, post_id: int, user_id: int):
+    db.execute(
+        delete(Like)
+        .where(Like.post_id == post_id, Like.user_id == user_id)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def set_likes(db: Session, likes: list[dict]) -> list[tuple[int, int]]:
+    # rows with id, post_id, user_id and created_at; returns the
+    # (post_id, user_id) of the likes that are new
+    added = []
+    for start in range(0, len(likes), CHUNK_SIZE):
+        added += db.execute(
+            insert(Like)
+            .values(likes[start:start + CHUNK_SIZE])
+            .on_conflict_do_nothing(index_elements=["post_id", "user_id"])
+            .returning(Like.post_id, Like.user_id)
+        ).all()
+    return [tuple(row) for row in added]
+
+
+def unset_likes(db: Session, keys: list[tuple[int, int]]):
+    for start in range(0, len(keys), CHUNK_SIZE):
+        db.execute(
+            delete(Like)
+            .where(tuple_(Like.post_id, Like.user_id).in_(keys[start:start + CHUNK_SIZE]))
+            .execution_options(synchronize_session=False)
+        )
@@ -1,21 +1,58 @@
-from fastapi import FastAPI, Depends, HTTPException, Request, status, File, UploadFile, Form
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, Depends, HTTPException, Request, status, File, UploadFile, Form, Query, BackgroundTasks
+from fastapi.responses import JSONResponse, ORJSONResponse, StreamingResponse, Response
 from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy import select, insert, delete, exists, func, union_all
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session, joinedload
-from .database import get_db, engine, Base
-from .schemas import CirclesJoinedResponse, InvitationAction, InvitationResponse, MemberToRemove, PostBase, PostResponse, UserCreate, UserLogin, CircleCreate, CircleResponse, MyCircleResponse, Invitee, UserResponse, CommentCreate, CommentResponse, LikeResponse
-from .models import CircleInvitation, Post, User, Circle, CircleMember, Comment, Like
-from .auth.custom_auth import hash_password, verify_password, create_user_token, get_current_user, SECRET_KEY, ACCESS_TOKEN_MINUTES
-from datetime import datetime, timedelta, timezone
-from .exceptions import CircleNotFound, PostNotFound, UserAlreadyJoined, UserNotFound, InvalidCredentials, EmailAlreadyExists, AccessDenied, UserNotInCircle, InviteAlreadyResponded, InviteNotFound, InviteAlreadySent
-from .error_handlers import access_denied_handler, circle_not_found_handler, post_not_found_handler, user_already_joined_handler, user_not_found_handler, email_already_registered_handler, invalid_credentials_handler, user_not_in_circle_handler, invite_already_responded_handler, invite_not_found_handler, invite_already_sent_handler
+from .database import get_db, warm_pool, has_alembic_schema
+from .schemas import CirclesJoinedResponse, InvitationAction, InvitationResponse, ReceivedInvitationsResponse, InvitationCount, BulkInvite, BulkInviteResult, BulkInvitationAction, BulkInvitationResult, MemberToRemove, PostBase, PostResponse, UserCreate, UserLogin, SetPassword, AccountDeletion, CircleCreate, CircleResponse, MyCircleResponse, Invitee, UserResponse, UserDirectoryResponse, CommentCreate, CommentResponse, LikeResponse, SearchResponse, NotificationsResponse, NotificationCount, MarkNotificationsRead, CircleUnreadResponse, CircleSeen, DigestResponse, BatchRequest, BatchResponse
+from .models import CircleInvitation, Post, User, Circle, CircleMember, Comment, Like, Notification, ArchivedPost
+from .auth.custom_auth import hash_password, verify_password, create_user_token, get_current_user, read_set_password_token, UNUSABLE_PASSWORD, SECRET_KEY, ACCESS_TOKEN_MINUTES
+from datetime import date, datetime, timedelta, timezone
+from .exceptions import CircleNotFound, PostNotFound, UserAlreadyJoined, UserNotFound, InvalidCredentials, EmailAlreadyExists, AccessDenied, UserNotInCircle, InviteAlreadyResponded, InviteNotFound, InviteAlreadySent, InvalidCursor, InvalidFields, IdempotencyKeyReused, CircleMoving
+from .error_handlers import access_denied_handler, circle_not_found_handler, post_not_found_handler, user_already_joined_handler, user_not_found_handler, email_already_registered_handler, invalid_credentials_handler, user_not_in_circle_handler, invite_already_responded_handler, invite_not_found_handler, invite_already_sent_handler, invalid_cursor_handler, invalid_fields_handler, idempotency_key_reused_handler, circle_moving_handler
 from .auth.oso_patterns.policy_engine import policy_engine
 from .cloudinary_config import upload_image
+from .queries import post_rows, comment_rows, like_rows, archived_post_rows, archived_comment_rows, archived_like_rows, both_tiers, received_invitation_rows, notification_rows, circle_unread_rows, user_directory_rows, as_dicts
+from .pagination import encode_cursor, decode_cursor
+from .search import index_post, index_comment, unindex, to_match_query, ranked_matches, paginate
+from .export import parse_resume, stream_ndjson, stream_zip
+from .memberships import add_memberships, own_circle_ids, remove_membership, cached_circle_ids, mark_circle_seen
+from .cache import cache, invalidate_on_commit
+from .wire import cached_list_response
+from .fields import POST_FIELDS, COMMENT_FIELDS, LIKE_FIELDS, with_keys, trim, cache_suffix
+from .deletion import delete_circle, delete_posts, purge_photos
+from .account_purge import schedule_purge, purge_account, resume_purges
+from .idempotency import Idempotency, idempotency_key_header
+from .likes import set_like, unset_like
+from .digest import digest_for
+from . import notifications
+from .rate_limit import RateLimitMiddleware, ConcurrencyLimitMiddleware
+from .routing import get_read_db
+from .batch import run_batch
+from .like_buffer import like_buffer
+from .sharding import ShardSessions, get_shards, get_read_shards, place_circles, new_id, scatter, session_factories, shard_of
 from fastapi.middleware.cors import CORSMiddleware
+import heapq
+import threading
+from contextlib import asynccontextmanager
+import orjson
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # schema comes from `alembic upgrade head`, never from the app
+    warm_pool()
+    if has_alembic_schema():
+        # purges interrupted by a restart carry on in the background
+        threading.Thread(target=resume_purges, name="account-purge", daemon=True).start()
+    else:
+        print("Database has no Alembic version, run `alembic upgrade head` from the backend directory")
+    yield
+    # buffered likes are written before the process exits
+    like_buffer.close()
 
-Base.metadata.create_all(bind=engine)
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
@@ -24,6 +61,10 @@ async def http_exception_handler(request: Request, exc: HTTPException):
         content={"detail": exc.detail}
     )
     
+# added before CORS so CORS stays outermost and 429/503 responses carry its headers
+app.add_middleware(ConcurrencyLimitMiddleware)
+app.add_middleware(RateLimitMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:5173", "http://localhost:5175", "http://127.0.0.1:5173", "http://127.0.0.1:5175"],
@@ -43,10 +84,12 @@ app.add_exception_handler(PostNotFound, post_not_found_handler)
 app.add_exception_handler(InviteNotFound, invite_not_found_handler)
 app.add_exception_handler(InviteAlreadyResponded, invite_already_responded_handler)
 app.add_exception_handler(InviteAlreadySent, invite_already_sent_handler)
+app.add_exception_handler(InvalidCursor, invalid_cursor_handler)
+app.add_exception_handler(InvalidFields, invalid_fields_handler)
+app.add_exception_handler(IdempotencyKeyReused, idempotency_key_reused_handler)
+app.add_exception_handler(CircleMoving, circle_moving_handler)
 
 
-session = Session()
-
 
 @app.get("/")
 async def root():
@@ -59,30 +102,59 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
     if db.query(User).filter(User.email == user_data.email).first():
         raise EmailAlreadyExists
         
-    new_user = User(
-        name=user_data.name,
-        email = user_data.email,
-        hashed_password = hash_password(user_data.password),
-        first_access=datetime.now()
-    )
+    hashed_password = hash_password(user_data.password)
     
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    # user, own circle and membership are created in one transaction (one commit)
+    try:
+        new_user = User(
+            name=user_data.name,
+            email = user_data.email,
+            hashed_password = hashed_password,
+            first_access=datetime.now()
+        )
+        db.add(new_user)
+        db.flush()
+        
+        new_circle = Circle(
+            name = f"{new_user.name}'s Circle",
+            creator_id = new_user.id,        
+        )
+        db.add(new_circle)
+        db.flush()
+        
+        add_memberships(db, [(new_user.id, new_circle.id)])
+        place_circles(db, [new_circle.id])
+        db.commit()
+    except IntegrityError:
+        # lost a race with another registration for the same email
+        db.rollback()
+        raise EmailAlreadyExists()
+    except Exception:
+        db.rollback()
+        raise
+
+    return {"message": "Account created successfully!", "user_id":new_user.id, "circle_id": new_circle.id}
+
+
+# imported users choose their password with the token they were issued
+@app.post("/set-password")
+async def set_password(data: SetPassword, db: Session = Depends(get_db)):
+    email = read_set_password_token(data.token)
+    if email is None:
+        raise HTTPException(status_code=400, detail="Invalid or expired set-password token")
     
-    new_circle = Circle(
-        name = f"{new_user.name}'s Circle",
-        creator_id = new_user.id,        
-    )
+    user = db.query(User).filter(User.email == email, User.deleted_at.is_(None)).first()
+    if not user:
+        raise UserNotFound()
     
-    db.add(new_circle)
-    db.commit()
-    db.refresh(new_circle)
+    # tokens are single use: once a password exists they stop working
+    if user.hashed_password != UNUSABLE_PASSWORD:
+        raise HTTPException(status_code=400, detail="Invalid or expired set-password token")
     
-    new_circle.members.append(new_user)
+    user.hashed_password = hash_password(data.password)
     db.commit()
-
-    return {"message": "Account created successfully!", "user_id":new_user.id, "circle_id": new_circle.id}
+    
+    return {"message": "Password set, you can log in now"}
 
 
 # user authentication and authorization
@@ -90,7 +162,7 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
 async def login_user(credentials: UserLogin, db: Session = Depends(get_db)):
     print(f"Login attempt for {credentials.email}")
     
-    user_info = db.query(User).filter(User.email == credentials.email).first()
+    user_info = db.query(User).filter(User.email == credentials.email, User.deleted_at.is_(None)).first()
     print(f"User found: {user_info is not None}")  # Debug line
 
     if not user_info:
@@ -123,7 +195,7 @@ async def token_for_docs(
     db: Session = Depends(get_db)
 ):
     # Reuse your existing login logic, but with OAuth2 form format
-    user_info = db.query(User).filter(User.email == form_data.username).first()
+    user_info = db.query(User).filter(User.email == form_data.username, User.deleted_at.is_(None)).first()
     
     if not user_info:
         raise UserNotFound()
@@ -155,6 +227,24 @@ async def get_user_profile(current_user: User = Depends(get_current_user)):
         "member_since": current_user.first_access
     }
 
+# delete my account: it stops working now, its data is purged in the background
+@app.delete("/account", status_code=status.HTTP_202_ACCEPTED)
+async def delete_account(
+    confirmation: AccountDeletion,
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    if not verify_password(confirmation.password, current_user.hashed_password):
+        raise InvalidCredentials()
+    
+    schedule_purge(db, current_user)
+    db.commit()
+    background_tasks.add_task(purge_account, current_user.id)
+    
+    return {"message": "Your account has been deleted. Your posts, comments and circles will be removed shortly."}
+
+
 @app.post("/circles", response_model=CircleResponse)
 async def create_circle(
     circle: CircleCreate, 
@@ -168,18 +258,16 @@ async def create_circle(
     )
     
     db.add(new_circle)
-    db.commit()
-    db.refresh(new_circle)
-    print(f"New circle ID after refresh: {new_circle.id}")  # Debug
-
-    new_circle.members.append(creator)
+    db.flush()
+    add_memberships(db, [(creator.id, new_circle.id)])
+    place_circles(db, [new_circle.id])
     db.commit()
     
     response = CircleResponse(
         id=new_circle.id,
         name=new_circle.name,
         creator_id=new_circle.creator_id,
-        member_count=len(new_circle.members)
+        member_count=1
     )
     print(f"Response object: {response}")
     return response
@@ -222,7 +310,7 @@ async def invite_user_to_circle(
     # except AccessDenied:
     #     print(" Disagreement: Current = ALLOW, Oso = DENY")
     
-    invitee_user = db.query(User).filter(User.email == invitee_data.email).first()
+    invitee_user = db.query(User).filter(User.email == invitee_data.email, User.deleted_at.is_(None)).first()
     if not invitee_user:
         raise UserNotFound()
     
@@ -245,6 +333,8 @@ async def invite_user_to_circle(
     )
     
     db.add(new_invite)
+    notifications.notify_users(db, [invitee_user.id], notifications.INVITE, current_user.id, circle_id=curr_circle.id)
+    invalidate_on_commit(db, f"invites:{invitee_user.id}")
     db.commit()
     db.refresh(new_invite)
     
@@ -257,29 +347,44 @@ async def invite_user_to_circle(
     )
 
 
-@app.get("/invitations/received", response_model=list[InvitationResponse])
+@app.get("/invitations/received", response_model=ReceivedInvitationsResponse, response_class=ORJSONResponse)
 async def get_pending_invites(
+    limit: int = Query(default=20, ge=1, le=100),
+    cursor: str | None = None,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    circle_invitations = db.query(CircleInvitation).filter(
-        CircleInvitation.to_user_id == current_user.id, 
-        CircleInvitation.status=='pending'
-        ).all()
-    
-    res = []
+    query = received_invitation_rows(current_user.id)
+    if cursor:
+        (last_id,) = decode_cursor(cursor, 1)
+        query = query.where(CircleInvitation.id < last_id)
     
-    for invite in circle_invitations:
-        new_invite = InvitationResponse (
-            id=invite.id,
-            from_user_name=invite.from_user.name,
-            from_user_email=invite.from_user.email,
-            status='pending',
-            created_at=invite.created_at
-        )
-        res.append(new_invite)
+    # sender joined in the same query; one extra row tells us about a next page
+    invitations = as_dicts(db.execute(query.limit(limit + 1)))
+    next_cursor = None
+    if len(invitations) > limit:
+        invitations = invitations[:limit]
+        next_cursor = encode_cursor(invitations[-1]["id"])
     
-    return res
+    return ORJSONResponse({"invitations": invitations, "next_cursor": next_cursor})
+
+
+# nav badge: counted straight off the (to_user_id, status) index, and cached
+@app.get("/invitations/count", response_model=InvitationCount)
+async def count_pending_invites(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    body = cache.get_or_set(
+        f"invites:{current_user.id}", [f"invites:{current_user.id}"],
+        lambda: orjson.dumps({"pending": db.scalar(
+            select(func.count()).select_from(CircleInvitation).where(
+                CircleInvitation.to_user_id == current_user.id,
+                CircleInvitation.status == "pending"
+            )
+        )})
+    )
+    return Response(content=body, media_type="application/json")
     
 
 @app.post("/invitations/{invitation_id}/respond")
@@ -302,53 +407,232 @@ async def respond_to_invites(
     
     if action.action == 'accept':
         
-        from_user_circle = db.query(Circle).filter(Circle.creator_id == invite.from_user_id).first()
-        to_user_circle=db.query(Circle).filter(Circle.creator_id == current_user.id).first()
+        # both users join each other's circle: one lookup, one insert, one commit
+        circles = own_circle_ids(db, [invite.from_user_id, current_user.id])
+        if invite.from_user_id not in circles or current_user.id not in circles:
+            raise CircleNotFound()
         
-        from_user_circle.members.append(current_user)
-        to_user_circle.members.append(invite.from_user)
-
-        db.delete(invite)
-        db.commit()
+        try:
+            add_memberships(db, [
+                (current_user.id, circles[invite.from_user_id]),
+                (invite.from_user_id, circles[current_user.id]),
+            ])
+            # the inviter has joined the accepting user's circle too
+            notifications.notify_users(db, [invite.from_user_id], notifications.INVITE_ACCEPTED, current_user.id, circle_id=circles[current_user.id])
+            db.delete(invite)
+            invalidate_on_commit(db, f"invites:{current_user.id}")
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
         return {"message": "You've accepted the invitation"}
     
     elif action.action == 'decline':
         db.delete(invite)
+        invalidate_on_commit(db, f"invites:{current_user.id}")
         db.commit()
         return {"message": "You've declined the invitation"}
 
-# get all the posts in the circles you joined
-@app.get("/their-days", response_model=list[PostResponse])
-async def get_their_days(
+
+# invite many people at once: every check is one set-based query, one insert, one commit
+@app.post("/my-circle/invite/batch", response_model=list[BulkInviteResult])
+async def invite_users_to_circle(
+    invitees: BulkInvite,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    # user_circles = current_user.circles
-    user_circle_ids = [circle.id for circle in current_user.circles]
+    circles = own_circle_ids(db, [current_user.id])
+    if current_user.id not in circles:
+        raise CircleNotFound()
+    circle_id = circles[current_user.id]
     
-    posts = db.query(Post).filter(
-        Post.circle_id.in_(user_circle_ids),
-        Post.author_id != current_user.id
-    ).options(
-        joinedload(Post.author)
-    ).order_by(Post.created_at.desc()).all()
+    emails = list(dict.fromkeys(invitees.emails))
+    users = dict(db.execute(select(User.email, User.id).where(User.email.in_(emails), User.deleted_at.is_(None))).all())
+    user_ids = list(users.values())
+    
+    members = set(db.scalars(
+        select(CircleMember.user_id).where(
+            CircleMember.circle_id == circle_id,
+            CircleMember.user_id.in_(user_ids)
+        )
+    ))
+    pending = set(db.scalars(
+        select(CircleInvitation.to_user_id).where(
+            CircleInvitation.from_user_id == current_user.id,
+            CircleInvitation.to_user_id.in_(user_ids),
+            CircleInvitation.status == "pending"
+        )
+    ))
+    
+    results = {}
+    to_invite = []
+    for email in emails:
+        user_id = users.get(email)
+        if user_id is None:
+            results[email] = "not_found"
+        elif user_id == current_user.id:
+            results[email] = "self"
+        elif user_id in members:
+            results[email] = "already_joined"
+        elif user_id in pending:
+            results[email] = "already_invited"
+        else:
+            results[email] = "invited"
+            to_invite.append(email)
+    
+    invitation_ids = {}
+    if to_invite:
+        new_ids = db.execute(
+            insert(CircleInvitation).returning(CircleInvitation.id, sort_by_parameter_order=True),
+            [
+                {"from_user_id": current_user.id, "to_user_id": users[email], "status": "pending"}
+                for email in to_invite
+            ]
+        ).scalars().all()
+        invitation_ids = dict(zip(to_invite, new_ids))
+        notifications.notify_users(db, [users[email] for email in to_invite], notifications.INVITE, current_user.id, circle_id=circle_id)
+        invalidate_on_commit(db, *(f"invites:{users[email]}" for email in to_invite))
+        db.commit()
     
     return [
-        add_like_data_to_post(p, current_user, db)
-        for p in posts
+        BulkInviteResult(email=email, status=results[email], invitation_id=invitation_ids.get(email))
+        for email in emails
     ]
+
+
+# accept or decline many invitations at once, committed together
+@app.post("/invitations/respond/batch", response_model=list[BulkInvitationResult])
+async def respond_to_invites_batch(
+    actions: BulkInvitationAction,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    requested = [reply.invitation_id for reply in actions.responses]
+    invites = {
+        invite.id: invite
+        for invite in db.execute(
+            select(CircleInvitation.id, CircleInvitation.from_user_id, CircleInvitation.status).where(
+                CircleInvitation.id.in_(requested),
+                CircleInvitation.to_user_id == current_user.id
+            )
+        )
+    }
+    
+    results = []
+    accepted_from = []
+    responded = set()
+    for reply in actions.responses:
+        invite = invites.get(reply.invitation_id)
+        if invite is None:
+            status = "not_found"
+        elif invite.status != "pending" or invite.id in responded:
+            status = "already_responded"
+        elif reply.action == "accept":
+            status = "accepted"
+            accepted_from.append(invite.from_user_id)
+            responded.add(invite.id)
+        elif reply.action == "decline":
+            status = "declined"
+            responded.add(invite.id)
+        else:
+            status = "invalid_action"
+        results.append(BulkInvitationResult(invitation_id=reply.invitation_id, status=status))
+    
+    if responded:
+        try:
+            if accepted_from:
+                circles = own_circle_ids(db, accepted_from + [current_user.id])
+                if current_user.id not in circles:
+                    raise CircleNotFound()
+                pairs = []
+                for from_user_id in accepted_from:
+                    if from_user_id in circles:
+                        pairs.append((current_user.id, circles[from_user_id]))
+                        pairs.append((from_user_id, circles[current_user.id]))
+                add_memberships(db, pairs)
+                notifications.notify_users(
+                    db, [user_id for user_id in accepted_from if user_id in circles],
+                    notifications.INVITE_ACCEPTED, current_user.id, circle_id=circles[current_user.id]
+                )
+            
+            db.execute(delete(CircleInvitation).where(CircleInvitation.id.in_(responded)))
+            invalidate_on_commit(db, f"invites:{current_user.id}")
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+    
+    return results
+
+# get all the posts in the circles you joined
+def feed_tags(db: Session, user_id: int) -> list[str]:
+    # a viewer's feed changes with their memberships and with any post or like in their circles
+    return [f"member:{user_id}", *(f"circle:{circle_id}" for circle_id in cached_circle_ids(db, user_id))]
+
+
+@app.get("/their-days", response_model=list[PostResponse], response_class=ORJSONResponse)
+async def get_their_days(
+    request: Request,
+    fields: tuple[str, ...] | None = Depends(POST_FIELDS),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
+):
+    # rows are already shaped like PostResponse, so skip response_model re-validation;
+    # the serialized page is cached until a post, like or membership changes.
+    # Each shard holding some of the circles returns its posts, hot and
+    # archived, newest first and the pages are merged. Only the requested
+    # fields are queried (see app.fields), plus created_at to merge on.
+    selected = with_keys(fields, "created_at")
+
+    def shard_posts(session, circle_ids):
+        return as_dicts(session.execute(both_tiers(
+            post_rows(current_user.id, selected).where(
+                Post.circle_id.in_(circle_ids),
+                Post.author_id != current_user.id
+            ),
+            archived_post_rows(current_user.id, selected).where(
+                ArchivedPost.circle_id.in_(circle_ids),
+                ArchivedPost.author_id != current_user.id
+            ),
+            "created_at", descending=True
+        )))
+    
+    return cached_list_response(
+        request, f"their-days:{current_user.id}{cache_suffix(fields)}", feed_tags(db, current_user.id),
+        lambda: trim(list(heapq.merge(
+            *scatter(db, cached_circle_ids(db, current_user.id), shard_posts),
+            key=lambda post: post["created_at"], reverse=True
+        )), fields),
+        db
+    )
          
 
 # get all my own posts
-@app.get("/my-circle/posts", response_model=list[PostResponse])
+@app.get("/my-circle/posts", response_model=list[PostResponse], response_class=ORJSONResponse)
 async def get_my_circle_posts(
+    request: Request,
+    fields: tuple[str, ...] | None = Depends(POST_FIELDS),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
-    return [
-        add_like_data_to_post(post, current_user, db)
-        for post in current_user.posts
-    ]
+    # users only post in circles they belong to, so their shards cover them
+    selected = with_keys(fields, "post_id")
+
+    def shard_posts(session, circle_ids):
+        return as_dicts(session.execute(both_tiers(
+            post_rows(current_user.id, selected).where(Post.author_id == current_user.id),
+            archived_post_rows(current_user.id, selected).where(ArchivedPost.author_id == current_user.id),
+            "post_id"
+        )))
+    
+    return cached_list_response(
+        request, f"my-circle-posts:{current_user.id}{cache_suffix(fields)}", feed_tags(db, current_user.id),
+        lambda: trim(list(heapq.merge(
+            *scatter(db, cached_circle_ids(db, current_user.id), shard_posts),
+            key=lambda post: post["post_id"]
+        )), fields),
+        db
+    )
 
 # get all the circle members
 @app.get("/my-circle/members", response_model=list[UserResponse])
@@ -385,13 +669,13 @@ async def remove_member(
     if not member_to_remove:
         raise UserNotFound()
     
-    if member_to_remove not in circle.members:
+    if not db.get(CircleMember, (member_to_remove.id, circle.id)):
         raise UserNotInCircle()
     
     member_to_remove_name = member_to_remove.name
 
     try:
-        circle.members.remove(member_to_remove)
+        remove_membership(db, member_to_remove.id, circle.id)
         db.commit()
     except Exception as e:
         db.rollback()
@@ -401,14 +685,54 @@ async def remove_member(
 
 
 
+# unread post counts for every circle the user is in, in one grouped query;
+# cached until one of those circles changes, a read mark moves or a membership changes
+@app.get("/circles/unread", response_model=CircleUnreadResponse)
+async def get_unread_counts(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
+):
+    def shard_counts(session, circle_ids):
+        return as_dicts(session.execute(
+            circle_unread_rows(current_user.id).where(CircleMember.circle_id.in_(circle_ids))
+        ))
+    
+    body = cache.get_or_set(
+        f"unread:{current_user.id}", [f"seen:{current_user.id}", *feed_tags(db, current_user.id)],
+        lambda: orjson.dumps({"circles": sorted(
+            (row for rows in scatter(db, cached_circle_ids(db, current_user.id), shard_counts) for row in rows),
+            key=lambda row: row["circle_id"]
+        )}),
+        db=db
+    )
+    return Response(content=body, media_type="application/json")
+
+
+@app.put("/circles/{circle_id}/seen")
+async def mark_circle_read(
+    circle_id: int,
+    data: CircleSeen,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    if not db.get(CircleMember, (current_user.id, circle_id)):
+        raise AccessDenied()
+    last_seen_at = mark_circle_seen(db, current_user.id, circle_id, data.seen_at)
+    db.commit()
+    return {"circle_id": circle_id, "last_seen_at": last_seen_at}
+
+
 @app.get("/circles/joined", response_model=CirclesJoinedResponse)
 async def get_joined_circles(
     current_user: User = Depends(get_current_user), 
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
     ):
-    members_circles = [circle for circle in current_user.circles if circle.creator_id != current_user.id]
+    circles = db.scalars(
+        select(Circle).join(CircleMember, CircleMember.circle_id == Circle.id).where(CircleMember.user_id == current_user.id)
+    ).all()
     return CirclesJoinedResponse(
-        member_circles=members_circles
+        created_circles=[circle for circle in circles if circle.creator_id == current_user.id],
+        member_circles=[circle for circle in circles if circle.creator_id != current_user.id]
     )
 
 
@@ -453,8 +777,11 @@ async def get_joined_circles(
 @app.delete("/circles/{circle_id}/leave")
 async def leave_circle(
     circle_id: int,
+    background_tasks: BackgroundTasks,
+    delete_photos: bool = True,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    shards: ShardSessions = Depends(get_shards)
 ):
 \
     
@@ -482,8 +809,16 @@ async def leave_circle(
             print(" Disagreement: Current = ALLOW, Oso = DENY")
             
         circle_name = circle.name
-        db.delete(circle)
-        db.commit()
+        # on the circle's shard, which reaches the catalog rows too
+        circle_db = shards.for_circle(circle_id, writing=True)
+        try:
+            delete_circle(circle_db, circle_id, queue_photos=delete_photos)
+            circle_db.commit()
+        except Exception:
+            circle_db.rollback()
+            raise
+        if delete_photos:
+            background_tasks.add_task(purge_photos)
         return {"message": f'{circle_name} has been deleted'}
     
     else:
@@ -493,12 +828,13 @@ async def leave_circle(
         except AccessDenied:
             print(" Disagreement: Current = ALLOW, Oso = DENY")
         
-        if current_user not in circle.members:
+        if not db.get(CircleMember, (current_user.id, circle_id)):
             raise AccessDenied()
 
-        circle.members.remove(current_user)
+        circle_name = circle.name
+        remove_membership(db, current_user.id, circle_id)
         db.commit()
-        return {"message": f"You have left '{circle.name}'"}
+        return {"message": f"You have left '{circle_name}'"}
 
 
 @app.delete("/circles/{circle_id}/remove")
@@ -519,7 +855,7 @@ async def remove_member(
     if not member_to_delete:
         raise UserNotFound()
     
-    if member_to_delete not in circle.members:
+    if not db.get(CircleMember, (member_to_delete.id, circle.id)):
         raise UserNotInCircle()
     
     if member_to_delete.id == current_user.id:
@@ -528,7 +864,7 @@ async def remove_member(
     member_to_delete_name = member_to_delete.name
 
     try:
-        circle.members.remove(member_to_delete)
+        remove_membership(db, member_to_delete.id, circle.id)
         db.commit()
     except Exception as e:
         db.rollback()
@@ -541,8 +877,10 @@ async def remove_member(
 async def create_post(
     content: str = Form(...),
     photo: UploadFile = File(None),
+    idempotency_key: str | None = Depends(idempotency_key_header),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    shards: ShardSessions = Depends(get_shards)
 ):
     
     circle = db.query(Circle).filter(Circle.creator_id == current_user.id).first()
@@ -552,20 +890,30 @@ async def create_post(
     if circle.creator_id != current_user.id:
         raise AccessDenied()
     
-    # Handle photo upload if provided
-    photo_url = None
+    # Read the photo if provided
+    file_data = None
     if photo and photo.filename:
         # Validate file type
         if not photo.content_type.startswith('image/'):
             raise HTTPException(status_code=400, detail="File must be an image")
         
-        # Read file data
         file_data = await photo.read()
-        
-        # Upload to Cloudinary
+    
+    # everything below runs on the circle's shard
+    db = shards.for_circle(circle.id, writing=True)
+    
+    # a retried request gets the stored response: no second post, no second upload
+    idem = Idempotency(db, current_user.id, idempotency_key, "POST /posts/", content, file_data or b"")
+    if replayed := idem.replay():
+        return replayed
+    
+    # Upload to Cloudinary
+    photo_url = None
+    if file_data is not None:
         photo_url = await upload_image(file_data, photo.filename)
     
     new_post = Post(
+        post_id=new_id("posts"),
         circle_id=circle.id,
         author_id=current_user.id,
         content=content,
@@ -573,10 +921,16 @@ async def create_post(
         created_at=datetime.now(timezone.utc)
     )
     db.add(new_post)
-    db.commit()
+    db.flush()
+    index_post(db, new_post)
+    notifications.notify_members(db, circle.id, notifications.POST, current_user.id, post_id=new_post.post_id)
+    invalidate_on_commit(db, f"circle:{circle.id}")
     db.refresh(new_post)
     
-    return add_like_data_to_post(new_post, current_user, db)
+    response = idem.save(add_like_data_to_post(new_post, current_user, db))
+    if replayed := idem.commit():
+        return replayed
+    return response
     
     
 
@@ -585,7 +939,8 @@ async def create_post(
 async def get_circle_posts(
     circle_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    shards: ShardSessions = Depends(get_shards)
 ):
     circle = db.query(Circle).filter(Circle.id == circle_id).first()
     if not circle:
@@ -594,19 +949,50 @@ async def get_circle_posts(
     if current_user not in circle.members:
         raise AccessDenied()
     
-    res = []
-    for post in circle.posts:
-        post_response = PostResponse(
-            post_id=post.post_id,
-            circle_id=post.circle_id,
-            author_id=post.author.id,
-            content=post.content,
-            created_at=post.created_at,
-            author_name=post.author.name,
+    # hot and archived posts alike
+    rows = shards.for_circle(circle_id).execute(union_all(*(
+        select(
+            model.post_id, model.circle_id, model.author_id, model.content, model.created_at,
+            User.name.label("author_name")
+        ).join(User, User.id == model.author_id).where(model.circle_id == circle_id)
+        for model in (Post, ArchivedPost)
+    )))
+    return [PostResponse(**row) for row in rows.mappings()]
+
+
+# download everything in a circle: NDJSON (resumable) or a ZIP that can include photos
+@app.get("/circles/{circle_id}/export")
+async def export_circle(
+    circle_id: int,
+    format: str = Query(default="ndjson", pattern="^(ndjson|zip)$"),
+    photos: bool = False,
+    resume_after: str | None = None,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    circle = db.get(Circle, circle_id)
+    if not circle:
+        raise CircleNotFound()
+    
+    if not db.get(CircleMember, (current_user.id, circle_id)):
+        raise AccessDenied()
+    
+    # the stream outlives this request's sessions and opens its own on the circle's shard
+    session_factory = session_factories[shard_of(db, circle_id)]
+    if format == "zip":
+        if resume_after:
+            raise HTTPException(status_code=400, detail="ZIP exports can't be resumed, use format=ndjson")
+        return StreamingResponse(
+            stream_zip(circle_id, include_photos=photos, session_factory=session_factory),
+            media_type="application/zip",
+            headers={"Content-Disposition": f'attachment; filename="circle-{circle_id}.zip"'}
         )
-        res.append(post_response)
-                
-    return res
+    
+    return StreamingResponse(
+        stream_ndjson(circle_id, parse_resume(resume_after), session_factory),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="circle-{circle_id}.ndjson"'}
+    )
 
 
 # CORS preflight for posts
@@ -618,9 +1004,11 @@ async def posts_preflight(post_id: int):
 @app.delete("/posts/{post_id}")
 async def delete_post(
     post_id: int,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db) 
+    shards: ShardSessions = Depends(get_shards)
 ):
+    db, _ = shards.for_post(post_id, writing=True)
     post_to_delete = db.query(Post).filter(Post.post_id == post_id).first()
     if not post_to_delete:
         raise PostNotFound()
@@ -633,17 +1021,45 @@ async def delete_post(
     if not can_delete:
         raise AccessDenied()
     
-    db.delete(post_to_delete)
+    created_at = post_to_delete.created_at
+    has_photo = post_to_delete.photo_url is not None
+    delete_posts(db, Post.post_id == post_id)
     db.commit()
+    if has_photo:
+        background_tasks.add_task(purge_photos)
     
-    return {"message": f"Your post created at {post_to_delete.created_at} was deleted"}
+    return {"message": f"Your post created at {created_at} was deleted"}
 
 
 
-@app.get("/users")
-async def get_all_users(db: Session = Depends(get_db)):
-    users = db.query(User).all()
-    return {"users": users, "count": len(users)}
+# user directory for invite autocomplete: name/email prefix search, one page at a time
+@app.get("/users", response_model=UserDirectoryResponse, response_class=ORJSONResponse)
+async def get_all_users(
+    q: str | None = Query(default=None, max_length=100),
+    limit: int = Query(default=20, ge=1, le=50),
+    cursor: str | None = None,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
+):
+    query = user_directory_rows(q)
+    if cursor:
+        name_key, user_id = decode_cursor(cursor, 2)
+        query = query.where(
+            (User.name_key > name_key) |
+            ((User.name_key == name_key) & (User.id > user_id))
+        )
+    
+    # fetch one extra row to learn whether there is a next page
+    users = as_dicts(db.execute(query.limit(limit + 1)))
+    next_cursor = None
+    if len(users) > limit:
+        users = users[:limit]
+        next_cursor = encode_cursor(users[-1]["name_key"], users[-1]["id"])
+    
+    for user in users:
+        del user["name_key"]
+    
+    return ORJSONResponse({"users": users, "count": len(users), "next_cursor": next_cursor})
 
 
 # Helper function to add like data to posts
@@ -671,21 +1087,23 @@ def add_like_data_to_post(post: Post, current_user: User, db: Session) -> dict:
 async def create_comment(
     post_id: int,
     comment_data: CommentCreate,
+    idempotency_key: str | None = Depends(idempotency_key_header),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    shards: ShardSessions = Depends(get_shards)
 ):
-    # Check if post exists
-    post = db.query(Post).filter(Post.post_id == post_id).first()
-    if not post:
-        raise PostNotFound()
+    # the id is reserved before the access check, which may thaw an archived post
+    comment_id = new_id("comments")
+    # post exists and the user is in its circle; the rest runs on the post's shard
+    db, circle_id = check_post_access(shards, post_id, current_user.id, writing=True)
+    post = db.get(Post, post_id)
     
-    # Check if user has access to this post (member of the circle)
-    circle = post.circle
-    if current_user not in circle.members:
-        raise AccessDenied()
+    idem = Idempotency(db, current_user.id, idempotency_key, f"POST /posts/{post_id}/comments", comment_data.content)
+    if replayed := idem.replay():
+        return replayed
     
     # Create comment
     new_comment = Comment(
+        id=comment_id,
         post_id=post_id,
         user_id=current_user.id,
         content=comment_data.content,
@@ -693,60 +1111,54 @@ async def create_comment(
     )
     
     db.add(new_comment)
-    db.commit()
+    db.flush()
+    index_comment(db, new_comment, circle_id)
+    notifications.notify_users(db, [post.author_id], notifications.COMMENT, current_user.id, post_id=post_id, circle_id=circle_id)
+    invalidate_on_commit(db, f"post:{post_id}")
     db.refresh(new_comment)
     
-    return CommentResponse(
+    response = idem.save(CommentResponse(
         id=new_comment.id,
         post_id=new_comment.post_id,
         user_id=new_comment.user_id,
         content=new_comment.content,
         created_at=new_comment.created_at,
         author_name=current_user.name
-    )
+    ))
+    if replayed := idem.commit():
+        return replayed
+    return response
 
-@app.get("/posts/{post_id}/comments", response_model=list[CommentResponse])
+@app.get("/posts/{post_id}/comments", response_model=list[CommentResponse], response_class=ORJSONResponse)
 async def get_post_comments(
     post_id: int,
+    request: Request,
+    fields: tuple[str, ...] | None = Depends(COMMENT_FIELDS),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    shards: ShardSessions = Depends(get_read_shards)
 ):
-    # Check if post exists
-    post = db.query(Post).filter(Post.post_id == post_id).first()
-    if not post:
-        raise PostNotFound()
-    
-    # Check if user has access to this post (member of the circle)
-    circle = post.circle
-    if current_user not in circle.members:
-        raise AccessDenied()
+    # the post exists and the user is in its circle; current_user belongs to
+    # the primary's session, so this is checked with plain queries
+    db, _ = check_post_access(shards, post_id, current_user.id)
     
     # Get comments
-    comments = db.query(Comment).filter(
-        Comment.post_id == post_id
-    ).options(
-        joinedload(Comment.author)
-    ).order_by(Comment.created_at.asc()).all()
-    
-    return [
-        CommentResponse(
-            id=comment.id,
-            post_id=comment.post_id,
-            user_id=comment.user_id,
-            content=comment.content,
-            created_at=comment.created_at,
-            author_name=comment.author.name
-        )
-        for comment in comments
-    ]
+    selected = with_keys(fields, "created_at")
+    return cached_list_response(
+        request, f"comments:{post_id}{cache_suffix(fields)}", [f"post:{post_id}"],
+        lambda: trim(as_dicts(db.execute(
+            both_tiers(comment_rows(post_id, selected), archived_comment_rows(post_id, selected), "created_at")
+        )), fields),
+        db
+    )
 
 @app.delete("/comments/{comment_id}")
 async def delete_comment(
     comment_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    shards: ShardSessions = Depends(get_shards)
 ):
-    comment = db.query(Comment).filter(Comment.id == comment_id).first()
+    db = shards.for_comment(comment_id, writing=True)
+    comment = db.query(Comment).filter(Comment.id == comment_id).first() if db else None
     if not comment:
         raise HTTPException(status_code=404, detail="Comment not found")
     
@@ -761,6 +1173,8 @@ async def delete_comment(
     if not can_delete:
         raise AccessDenied()
     
+    unindex(db, comment_ids=[comment.id])
+    invalidate_on_commit(db, f"post:{comment.post_id}")
     db.delete(comment)
     db.commit()
     
@@ -770,18 +1184,36 @@ async def delete_comment(
 @app.post("/posts/{post_id}/like")
 async def toggle_like(
     post_id: int,
+    idempotency_key: str | None = Depends(idempotency_key_header),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    shards: ShardSessions = Depends(get_shards)
 ):
-    # Check if post exists
-    post = db.query(Post).filter(Post.post_id == post_id).first()
-    if not post:
-        raise PostNotFound()
+    if like_buffer.enabled and idempotency_key is None:
+        # the toggle flips whatever is buffered, else what is stored. Nothing
+        # holds a connection while the buffer works: the user id is read
+        # before the commit expires current_user, and each read commits
+        user_id = current_user.id
+        db, circle_id = check_post_access(shards, post_id, user_id, writing=True)
+        db.commit()
+
+        def stored() -> bool:
+            liked = db.scalar(select(exists().where(Like.post_id == post_id, Like.user_id == user_id)))
+            db.commit()
+            return liked
+
+        liked = await like_buffer.toggle(post_id, user_id, circle_id, stored)
+        return {"message": "Post liked" if liked else "Post unliked", "liked": liked}
+
+    like_id = new_id("likes")
+    # post exists and the user is in its circle; the rest runs on the post's shard
+    db, _ = check_post_access(shards, post_id, current_user.id, writing=True)
+    post = db.get(Post, post_id)
     
-    # Check if user has access to this post (member of the circle)
-    circle = post.circle
-    if current_user not in circle.members:
-        raise AccessDenied()
+    # a retried toggle must not flip the like back
+    idem = Idempotency(db, current_user.id, idempotency_key, f"POST /posts/{post_id}/like")
+    if replayed := idem.replay():
+        return replayed
+    invalidate_on_commit(db, f"post:{post_id}", f"circle:{post.circle_id}")
     
     # Check if user already liked this post
     existing_like = db.query(Like).filter(
@@ -792,52 +1224,196 @@ async def toggle_like(
     if existing_like:
         # Unlike the post
         db.delete(existing_like)
-        db.commit()
-        return {"message": "Post unliked", "liked": False}
+        response = idem.save({"message": "Post unliked", "liked": False})
     else:
         # Like the post
         new_like = Like(
+            id=like_id,
             post_id=post_id,
             user_id=current_user.id,
             created_at=datetime.now(timezone.utc)
         )
         db.add(new_like)
+        notifications.notify_users(db, [post.author_id], notifications.LIKE, current_user.id, post_id=post_id, circle_id=post.circle_id)
+        response = idem.save({"message": "Post liked", "liked": True})
+    
+    if replayed := idem.commit():
+        return replayed
+    return response
+
+
+def check_post_access(shards: ShardSessions, post_id: int, user_id: int, writing: bool = False) -> tuple[Session, int]:
+    # post exists and the user is in its circle, without loading the member list;
+    # returns the session of the post's shard and its circle
+    db, circle_id = shards.for_post(post_id, writing)
+    if not db.get(CircleMember, (user_id, circle_id)):
+        raise AccessDenied()
+    return db, circle_id
+
+
+# explicit like state: safe to retry, no idempotency key needed
+@app.put("/posts/{post_id}/like")
+async def like_post(
+    post_id: int,
+    current_user: User = Depends(get_current_user),
+    shards: ShardSessions = Depends(get_shards)
+):
+    if like_buffer.enabled:
+        # check_post_access may thaw an archived post; that much is written now
+        user_id = current_user.id
+        db, circle_id = check_post_access(shards, post_id, user_id, writing=True)
         db.commit()
+        await like_buffer.set(post_id, user_id, circle_id, True)
         return {"message": "Post liked", "liked": True}
 
-@app.get("/posts/{post_id}/likes", response_model=list[LikeResponse])
+    like_id = new_id("likes")
+    db, circle_id = check_post_access(shards, post_id, current_user.id, writing=True)
+    if set_like(db, post_id, current_user.id, like_id):
+        author_id = select(Post.author_id).where(Post.post_id == post_id)
+        notifications.notify_users(db, author_id, notifications.LIKE, current_user.id, post_id=post_id, circle_id=circle_id)
+    invalidate_on_commit(db, f"post:{post_id}", f"circle:{circle_id}")
+    db.commit()
+    return {"message": "Post liked", "liked": True}
+
+
+@app.delete("/posts/{post_id}/like")
+async def unlike_post(
+    post_id: int,
+    current_user: User = Depends(get_current_user),
+    shards: ShardSessions = Depends(get_shards)
+):
+    user_id = current_user.id
+    db, circle_id = check_post_access(shards, post_id, user_id, writing=True)
+    if like_buffer.enabled:
+        db.commit()
+        await like_buffer.set(post_id, user_id, circle_id, False)
+        return {"message": "Post unliked", "liked": False}
+    unset_like(db, post_id, current_user.id)
+    invalidate_on_commit(db, f"post:{post_id}", f"circle:{circle_id}")
+    db.commit()
+    return {"message": "Post unliked", "liked": False}
+
+@app.get("/posts/{post_id}/likes", response_model=list[LikeResponse], response_class=ORJSONResponse)
 async def get_post_likes(
     post_id: int,
+    request: Request,
+    fields: tuple[str, ...] | None = Depends(LIKE_FIELDS),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    shards: ShardSessions = Depends(get_read_shards)
 ):
-    # Check if post exists
-    post = db.query(Post).filter(Post.post_id == post_id).first()
-    if not post:
-        raise PostNotFound()
-    
-    # Check if user has access to this post (member of the circle)
-    circle = post.circle
-    if current_user not in circle.members:
-        raise AccessDenied()
+    # the post exists and the user is in its circle; current_user belongs to
+    # the primary's session, so this is checked with plain queries
+    db, _ = check_post_access(shards, post_id, current_user.id)
     
     # Get likes
-    likes = db.query(Like).filter(
-        Like.post_id == post_id
-    ).options(
-        joinedload(Like.user)
-    ).order_by(Like.created_at.desc()).all()
-    
-    return [
-        LikeResponse(
-            id=like.id,
-            post_id=like.post_id,
-            user_id=like.user_id,
-            created_at=like.created_at,
-            user_name=like.user.name
-        )
-        for like in likes
-    ]
+    selected = with_keys(fields, "created_at")
+    return cached_list_response(
+        request, f"likes:{post_id}{cache_suffix(fields)}", [f"post:{post_id}"],
+        lambda: trim(as_dicts(db.execute(
+            both_tiers(like_rows(post_id, selected), archived_like_rows(post_id, selected), "created_at", descending=True)
+        )), fields),
+        db
+    )
+
+# full-text search over posts and comments in the circles you belong to
+@app.get("/search", response_model=SearchResponse, response_class=ORJSONResponse)
+async def search_posts(
+    q: str = Query(min_length=1, max_length=200),
+    limit: int = Query(default=20, ge=1, le=50),
+    cursor: str | None = None,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
+):
+    match = to_match_query(q)
+    if match is None:
+        return ORJSONResponse({"results": [], "next_cursor": None})
+    
+    after = tuple(decode_cursor(cursor, 2)) if cursor else None
+    # each shard ranks its own matches; the best of every shard's page make this one
+    pages = scatter(
+        db, cached_circle_ids(db, current_user.id),
+        lambda session, circle_ids: ranked_matches(session, current_user.id, match, limit + 1, after)
+    )
+    results, next_after = paginate(list(heapq.merge(*pages, key=lambda found: found[0])), limit)
+    
+    return ORJSONResponse({
+        "results": results,
+        "next_cursor": encode_cursor(*next_after) if next_after else None
+    })
+
+# newest first, keyset-paginated by id; `read` is relative to the watermark
+@app.get("/notifications", response_model=NotificationsResponse, response_class=ORJSONResponse)
+async def get_notifications(
+    limit: int = Query(default=20, ge=1, le=100),
+    cursor: str | None = None,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
+):
+    query = notification_rows(current_user.id)
+    if cursor:
+        (last_id,) = decode_cursor(cursor, 1)
+        query = query.where(Notification.id < last_id)
+    
+    rows = as_dicts(db.execute(query.limit(limit + 1)))
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["id"])
+    
+    unread, read_up_to = notifications.inbox_state(db, current_user.id)
+    for row in rows:
+        row["read"] = row["id"] <= read_up_to
+    return ORJSONResponse({"notifications": rows, "unread": unread, "next_cursor": next_cursor})
+
+
+# nav badge: one primary-key read of the counter kept by the fan-out
+@app.get("/notifications/unread", response_model=NotificationCount)
+async def count_unread_notifications(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    unread, _ = notifications.inbox_state(db, current_user.id)
+    return NotificationCount(unread=unread)
+
+
+@app.post("/notifications/read", response_model=NotificationCount)
+async def mark_notifications_read(
+    data: MarkNotificationsRead,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    unread = notifications.mark_read(db, current_user.id, data.up_to)
+    db.commit()
+    return NotificationCount(unread=unread)
+
+
+# weekly digest of the user's circles, precomputed by `python -m app.cli digest`
+@app.get("/digest", response_model=DigestResponse)
+async def get_digest(
+    week: date | None = None,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
+):
+    return Response(content=digest_for(db, current_user.id, week), media_type="application/json")
+
+
+# many API calls in one round trip, dispatched in-process (see app.batch)
+@app.post("/batch", response_model=BatchResponse, response_class=ORJSONResponse)
+async def batch_requests(
+    payload: BatchRequest,
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    responses = await run_batch(request.app, request.scope, payload.requests, current_user, db, payload.parallel)
+    return ORJSONResponse({"responses": responses})
+
+
+# hit ratio and counters of this worker's cache
+@app.get("/metrics/cache")
+async def get_cache_metrics(current_user: User = Depends(get_current_user)):
+    return cache.stats()
+
 
 @app.get("/debug/routes")
 async def get_routes():
@@ -0,0 +1,95 @@
+import orjson
+from datetime import datetime, timezone
+from sqlalchemy import select, delete, func
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+from .models import Circle, CircleMember, CircleReadMark
+from .cache import cache, invalidate_on_commit
+
+# Membership writes shared by registration, invitations and imports. They go
+# straight to circle_members as one multi-row INSERT inside the caller's
+# transaction, instead of appending to Circle.members (which loads the whole
+# member list and flushes a row at a time).
+
+
+def add_memberships(db: Session, pairs):
+    """
+    Insert (user_id, circle_id) pairs, skipping ones that already exist.
+    Does not commit.
+    """
+    rows = [{"user_id": user_id, "circle_id": circle_id} for user_id, circle_id in pairs]
+    if rows:
+        db.execute(insert(CircleMember).on_conflict_do_nothing(), rows)
+        invalidate_on_commit(db, *{f"member:{row['user_id']}" for row in rows})
+
+
+def remove_membership(db: Session, user_id: int, circle_id: int):
+    """
+    Drop one circle_members row without loading the circle's member list.
+    Does not commit.
+    """
+    db.execute(
+        delete(CircleMember)
+        .where(CircleMember.user_id == user_id, CircleMember.circle_id == circle_id)
+        .execution_options(synchronize_session=False)
+    )
+    db.execute(
+        delete(CircleReadMark)
+        .where(CircleReadMark.user_id == user_id, CircleReadMark.circle_id == circle_id)
+        .execution_options(synchronize_session=False)
+    )
+    invalidate_on_commit(db, f"member:{user_id}")
+
+
+def mark_circle_seen(db: Session, user_id: int, circle_id: int, seen_at: datetime | None = None) -> datetime:
+    """
+    Move the user's read mark for a circle forward to `seen_at` (default:
+    now), in one UPSERT; it never moves back. Returns the stored mark.
+    Does not commit.
+    """
+    # post times are stored as naive UTC; naive input is taken as UTC too
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    if seen_at is None:
+        seen_at = now
+    elif seen_at.tzinfo is not None:
+        seen_at = seen_at.astimezone(timezone.utc).replace(tzinfo=None)
+    # a mark in the future would hide posts made before then
+    seen_at = min(seen_at, now)
+    stmt = insert(CircleReadMark).values(user_id=user_id, circle_id=circle_id, last_seen_at=seen_at)
+    last_seen_at = db.scalar(
+        stmt.on_conflict_do_update(
+            index_elements=["user_id", "circle_id"],
+            set_={"last_seen_at": func.max(CircleReadMark.last_seen_at, stmt.excluded.last_seen_at)}
+        ).returning(CircleReadMark.last_seen_at)
+    )
+    invalidate_on_commit(db, f"seen:{user_id}")
+    return last_seen_at
+
+
+def cached_circle_ids(db: Session, user_id: int) -> list[int]:
+    """
+    Ids of the circles a user belongs to, cached until their memberships
+    change.
+    """
+    return orjson.loads(cache.get_or_set(
+        f"circles:{user_id}", [f"member:{user_id}"],
+        lambda: orjson.dumps(db.scalars(
+            select(CircleMember.circle_id).where(CircleMember.user_id == user_id).order_by(CircleMember.circle_id)
+        ).all()),
+        db=db
+    ))
+
+
+def own_circle_ids(db: Session, user_ids) -> dict[int, int]:
+    """
+    Map each user to the first circle they created (their own circle), in
+    one query.
+    """
+    circles = {}
+    for creator_id, circle_id in db.execute(
+        select(Circle.creator_id, Circle.id)
+        .where(Circle.creator_id.in_(set(user_ids)))
+        .order_by(Circle.id)
+    ):
+        circles.setdefault(creator_id, circle_id)
+    return circles
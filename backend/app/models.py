@@ -1,9 +1,18 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import Boolean, Column, Integer, String, Date, DateTime, ForeignKey, Index, LargeBinary
 from sqlalchemy.orm import relationship
 from .database import Base
 from datetime import datetime, timezone
 
 
+def folded(column_name):
+    # column default that stores a case-folded copy of another column, so
+    # prefix searches can use a plain range scan over an index
+    def default(context):
+        value = context.get_current_parameters().get(column_name)
+        return value.casefold() if value is not None else None
+    return default
+
+
 class User(Base):
     __tablename__ = 'users'
     
@@ -12,6 +21,10 @@ class User(Base):
     email = Column(String, unique=True, nullable=False)
     hashed_password = Column(String, nullable=False)
     first_access = Column(DateTime, default=datetime.utcnow)
+    name_key = Column(String, index=True, default=folded("name"))
+    email_key = Column(String, index=True, default=folded("email"))
+    # set when the account is deleted; its rows are purged in the background
+    deleted_at = Column(DateTime, nullable=True)
     # Relationships
     # when a circle is created, the circle.creator variable is initiated as the user who created this circle
     created_circles = relationship("Circle", back_populates="creator")
@@ -37,7 +50,16 @@ class CircleMember(Base):
     
     user_id = Column(Integer, ForeignKey('users.id'), primary_key=True)
     circle_id = Column(Integer, ForeignKey('circles.id'), primary_key=True)
-    joined_at = Column(DateTime, default=datetime.now(timezone.utc))
+    joined_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+
+
+class CircleReadMark(Base):
+    __tablename__ = "circle_read_marks"
+    
+    # newest post time a member has seen in a circle; posts after it are unread
+    user_id = Column(Integer, primary_key=True)
+    circle_id = Column(Integer, primary_key=True)
+    last_seen_at = Column(DateTime, nullable=False)
 
 
 class Post(Base):
@@ -54,6 +76,12 @@ class Post(Base):
     circle = relationship("Circle", back_populates="posts")
     comments = relationship("Comment", back_populates="post")
     likes = relationship("Like", back_populates="post")
+    
+    __table_args__ = (
+        Index("ix_posts_circle_id_created_at", "circle_id", "created_at"),
+        # ids are never reused, so none can clash with an archived row
+        {"sqlite_autoincrement": True},
+    )
 
 
 class CircleInvitation(Base):
@@ -68,6 +96,10 @@ class CircleInvitation(Base):
     from_user = relationship("User", foreign_keys=[from_user_id])
     to_user = relationship("User", foreign_keys=[to_user_id])
     
+    __table_args__ = (
+        Index("ix_circle_invites_to_user_id_status", "to_user_id", "status"),
+    )
+    
     
 class Comment(Base):
     __tablename__ = "comments"
@@ -80,6 +112,11 @@ class Comment(Base):
     
     post = relationship("Post", back_populates="comments")
     author = relationship("User")
+    
+    __table_args__ = (
+        Index("ix_comments_post_id_created_at", "post_id", "created_at"),
+        {"sqlite_autoincrement": True},
+    )
 
 
 class Like(Base):
@@ -91,4 +128,160 @@ class Like(Base):
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
     
     post = relationship("Post", back_populates="likes")
-    user = relationship("User")
\ No newline at end of file
+    user = relationship("User")
+    
+    __table_args__ = (
+        Index("ix_likes_post_id_user_id", "post_id", "user_id", unique=True),
+        {"sqlite_autoincrement": True},
+    )
+
+
+class PhotoCleanup(Base):
+    __tablename__ = "photo_cleanup"
+    
+    # photos of deleted posts, waiting to be removed from storage
+    id = Column(Integer, primary_key=True)
+    photo_url = Column(String, nullable=False)
+    queued_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+
+
+class AccountPurge(Base):
+    __tablename__ = "account_purges"
+    
+    # progress of a deleted account's background purge, so it can resume
+    user_id = Column(Integer, primary_key=True)
+    step = Column(String, nullable=False)
+    deleted = Column(Integer, nullable=False, default=0)
+    requested_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    finished_at = Column(DateTime, nullable=True)
+    # set by the worker running the purge and renewed with every batch
+    claimed_at = Column(DateTime, nullable=True)
+
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+    
+    # stored response of a mutation, replayed when the client retries with
+    # the same Idempotency-Key; rows expire after IDEMPOTENCY_TTL_HOURS
+    user_id = Column(Integer, primary_key=True)
+    key = Column(String, primary_key=True)
+    fingerprint = Column(LargeBinary, nullable=False)
+    status_code = Column(Integer, nullable=False)
+    body = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime, nullable=False, index=True)
+
+
+class Notification(Base):
+    __tablename__ = "notifications"
+    
+    # one row per recipient, written with the event that caused it
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
+    actor_id = Column(Integer, ForeignKey('users.id'), nullable=False)
+    kind = Column(String, nullable=False)
+    post_id = Column(Integer, nullable=True)
+    circle_id = Column(Integer, nullable=True)
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    
+    __table_args__ = (
+        # the index carries the rowid (id), so "user's newest first" and
+        # "user's ids above the watermark" are both range scans
+        Index("ix_notifications_user_id", "user_id"),
+    )
+
+
+class NotificationCounter(Base):
+    __tablename__ = "notification_counters"
+    
+    # kept in step with notifications so the unread badge is one row read;
+    # read_up_to is the highest notification id the user has marked read
+    user_id = Column(Integer, primary_key=True)
+    unread = Column(Integer, nullable=False, default=0)
+    read_up_to = Column(Integer, nullable=False, default=0)
+
+
+class CircleDigest(Base):
+    __tablename__ = "circle_digests"
+    
+    # a circle's weekly digest, precomputed as compact JSON by app.digest
+    circle_id = Column(Integer, primary_key=True)
+    week_start = Column(Date, primary_key=True)
+    body = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime, nullable=False)
+
+
+class DigestDelivery(Base):
+    __tablename__ = "digest_deliveries"
+    
+    # who has been emailed which week's digest, so a re-run skips them
+    user_id = Column(Integer, primary_key=True)
+    week_start = Column(Date, primary_key=True)
+    sent_at = Column(DateTime, nullable=False)
+
+
+class CirclePlacement(Base):
+    __tablename__ = "circle_placements"
+    
+    # which shard holds a circle's posts, comments and likes (see app.sharding);
+    # circles without a row are in the main database. moving is set while
+    # the circle is being copied to another shard and blocks writes to it
+    circle_id = Column(Integer, primary_key=True)
+    shard = Column(String, nullable=False)
+    moving = Column(Boolean, nullable=False, default=False)
+
+
+class IdBlock(Base):
+    __tablename__ = "id_blocks"
+    
+    # next unreserved id of a sharded table; workers reserve ids in blocks
+    # so posts, comments and likes stay unique across shards
+    name = Column(String, primary_key=True)
+    next_id = Column(Integer, nullable=False)
+
+
+class ArchivedPost(Base):
+    __tablename__ = "archived_posts"
+    
+    # posts moved out of the hot tables by app.archive, same ids, with the
+    # like count frozen at archive time so feeds never aggregate their likes
+    post_id = Column(Integer, primary_key=True)
+    circle_id = Column(Integer, nullable=False)
+    author_id = Column(Integer, nullable=False)
+    content = Column(String)
+    photo_url = Column(String, nullable=True)
+    created_at = Column(DateTime)
+    like_count = Column(Integer, nullable=False, default=0)
+    archived_at = Column(DateTime, nullable=False)
+    
+    __table_args__ = (
+        Index("ix_archived_posts_circle_id_created_at", "circle_id", "created_at"),
+    )
+
+
+class ArchivedComment(Base):
+    __tablename__ = "archived_comments"
+    
+    id = Column(Integer, primary_key=True)
+    post_id = Column(Integer, nullable=False)
+    user_id = Column(Integer, nullable=False)
+    content = Column(String, nullable=False)
+    created_at = Column(DateTime)
+    
+    __table_args__ = (
+        Index("ix_archived_comments_post_id_created_at", "post_id", "created_at"),
+    )
+
+
+class ArchivedLike(Base):
+    __tablename__ = "archived_likes"
+    
+    # clustered on (post_id, user_id): one b-tree instead of a rowid table
+    # plus a unique index, and still answers "did the viewer like it"
+    post_id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, primary_key=True)
+    id = Column(Integer, nullable=False)
+    created_at = Column(DateTime)
+    
+    __table_args__ = (
+        {"sqlite_with_rowid": False},
+    )
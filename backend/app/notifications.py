@@ -0,0 +1,143 @@
+from collections import Counter
+from datetime import datetime, timezone
+from sqlalchemy import Integer, DateTime, String, delete, func, literal, select, update
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+from .models import User, CircleMember, Notification, NotificationCounter
+
+# Per-user notification inbox, fanned out on write.
+#
+# An event (a comment or like on your post, a new post in your circle, an
+# invitation sent to you or accepted) inserts one notifications row per
+# recipient in the same transaction as the event itself, with a single
+# INSERT ... SELECT however many recipients there are. A second statement
+# bumps each recipient's notification_counters row, so the unread badge is
+# a primary-key read instead of a count.
+#
+# Marking read moves the user's read_up_to watermark forward and recounts
+# what is left above it, a range scan that only touches unread rows. The
+# recount runs in the UPDATE that moves the watermark, under the write
+# lock, so a notification arriving at the same moment is either counted or
+# below the watermark, never lost. Nothing here commits.
+
+COMMENT = "comment"
+LIKE = "like"
+POST = "post"
+INVITE = "invite"
+INVITE_ACCEPTED = "invite_accepted"
+
+
+def _fan_out(db: Session, recipients, kind: str, actor_id: int, post_id: int | None, circle_id: int | None):
+    # recipients is a one-column select of user ids with a WHERE clause;
+    # columns are added to it rather than selecting from it as a subquery,
+    # since SQLite needs the WHERE to parse INSERT ... SELECT ... ON CONFLICT
+    db.execute(insert(Notification).from_select(
+        ["user_id", "actor_id", "kind", "post_id", "circle_id", "created_at"],
+        recipients.add_columns(
+            literal(actor_id, Integer),
+            literal(kind, String),
+            literal(post_id, Integer),
+            literal(circle_id, Integer),
+            literal(datetime.now(timezone.utc), DateTime),
+        )
+    ))
+    bump = insert(NotificationCounter).from_select(
+        ["user_id", "unread", "read_up_to"],
+        recipients.add_columns(literal(1, Integer), literal(0, Integer))
+    )
+    db.execute(bump.on_conflict_do_update(
+        index_elements=["user_id"],
+        set_={"unread": NotificationCounter.unread + 1}
+    ))
+
+
+def notify_users(db: Session, user_ids, kind: str, actor_id: int, post_id: int | None = None, circle_id: int | None = None):
+    """
+    Notify each of `user_ids`, a list or a select of ids (never the actor,
+    nor deleted accounts).
+    """
+    _fan_out(db, select(User.id).where(
+        User.id.in_(user_ids),
+        User.id != actor_id,
+        User.deleted_at.is_(None)
+    ), kind, actor_id, post_id, circle_id)
+
+
+def notify_each(db: Session, notices: list[dict]):
+    """
+    Many single-recipient notifications at once, each a dict of user_id,
+    actor_id, kind, post_id and circle_id: one insert for the rows and one
+    for the counters. The caller has already picked the recipients.
+    """
+    if not notices:
+        return
+    now = datetime.now(timezone.utc)
+    db.execute(insert(Notification), [{**notice, "created_at": now} for notice in notices])
+    bump = insert(NotificationCounter)
+    db.execute(bump.on_conflict_do_update(
+        index_elements=["user_id"],
+        set_={"unread": NotificationCounter.unread + bump.excluded.unread}
+    ), [{"user_id": user_id, "unread": count, "read_up_to": 0} for user_id, count in Counter(
+        notice["user_id"] for notice in notices
+    ).items()])
+
+
+def notify_members(db: Session, circle_id: int, kind: str, actor_id: int, post_id: int | None = None):
+    """
+    Notify every member of a circle except the actor.
+    """
+    _fan_out(db, select(CircleMember.user_id).where(
+        CircleMember.circle_id == circle_id,
+        CircleMember.user_id != actor_id
+    ), kind, actor_id, post_id, circle_id)
+
+
+def inbox_state(db: Session, user_id: int) -> tuple[int, int]:
+    # (unread, read_up_to); users who were never notified have no row
+    row = db.execute(
+        select(NotificationCounter.unread, NotificationCounter.read_up_to)
+        .where(NotificationCounter.user_id == user_id)
+    ).first()
+    return (row.unread, row.read_up_to) if row else (0, 0)
+
+
+def mark_read(db: Session, user_id: int, up_to: int | None = None) -> int:
+    """
+    Mark everything up to notification id `up_to` (default: all) read and
+    return the new unread count. The watermark never moves backwards, nor
+    past the user's newest notification.
+    """
+    # a watermark beyond the newest id would mark notifications read before
+    # they arrive
+    newest = db.scalar(select(func.max(Notification.id)).where(Notification.user_id == user_id)) or 0
+    up_to = newest if up_to is None else min(up_to, newest)
+
+    # the counter row may not exist yet; the UPDATE then sees the old
+    # watermark in every SET expression, so max() keeps it from going back
+    db.execute(insert(NotificationCounter).values(user_id=user_id, unread=0, read_up_to=0).on_conflict_do_nothing())
+    watermark = func.max(NotificationCounter.read_up_to, up_to)
+    unread = (
+        select(func.count())
+        .select_from(Notification)
+        .where(Notification.user_id == user_id, Notification.id > watermark)
+        .scalar_subquery()
+    )
+    return db.scalar(
+        update(NotificationCounter)
+        .where(NotificationCounter.user_id == user_id)
+        .values(read_up_to=watermark, unread=unread)
+        .returning(NotificationCounter.unread)
+    )
+
+
+def delete_inbox(db: Session, user_id: int, limit: int) -> int:
+    """
+    Remove up to `limit` of a user's notifications, and their counter once
+    none are left. For account purges.
+    """
+    ids = db.scalars(select(Notification.id).where(Notification.user_id == user_id).limit(limit)).all()
+    if len(ids) < limit:
+        db.execute(delete(NotificationCounter).where(NotificationCounter.user_id == user_id))
+    return db.execute(
+        delete(Notification).where(Notification.id.in_(ids)).execution_options(synchronize_session=False)
+    ).rowcount
@@ -0,0 +1,32 @@
+import base64
+import json
+from .exceptions import InvalidCursor
+
+# Opaque keyset cursors: the sort key of the last row on a page, serialized
+# so clients can pass it back without knowing how the listing is ordered.
+# Decoded values go straight into SQL comparisons, so only plain strings
+# and numbers SQLite can bind are accepted.
+
+SQLITE_INT = (-2**63, 2**63 - 1)
+
+
+def encode_cursor(*values) -> str:
+    raw = json.dumps(values, separators=(",", ":"), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token: str, size: int) -> list:
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, UnicodeDecodeError):
+        raise InvalidCursor()
+    if not isinstance(values, list) or len(values) != size:
+        raise InvalidCursor()
+    for value in values:
+        if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+            raise InvalidCursor()
+        if isinstance(value, int) and not SQLITE_INT[0] <= value <= SQLITE_INT[1]:
+            raise InvalidCursor()
+    return values
+
@@ -0,0 +1,188 @@
+from sqlalchemy import select, func, exists, or_, and_, union_all
+from .models import User, CircleMember, CircleReadMark, CircleInvitation, Post, Comment, Like, Notification, ArchivedPost, ArchivedComment, ArchivedLike
+
+# Column-projection queries for the list endpoints. They return plain row
+# tuples already shaped like the response schemas, so handlers never hydrate
+# ORM entities (or their joined authors) just to copy a few columns out.
+
+
+def member_circle_ids(user_id: int):
+    return select(CircleMember.circle_id).where(CircleMember.user_id == user_id)
+
+
+def _projection(model, columns: dict, fields, author_id, name_field: str):
+    # only the selected columns (all of them without a selection); the
+    # author join and any subquery are left out unless their field is picked
+    picked = [column.label(name) for name, column in columns.items() if fields is None or name in fields]
+    query = select(*picked).select_from(model)
+    if fields is None or name_field in fields:
+        query = query.join(User, User.id == author_id)
+    return query
+
+
+def post_rows(viewer_id: int, fields: tuple[str, ...] | None = None):
+    like_count = (
+        select(func.count(Like.id))
+        .where(Like.post_id == Post.post_id)
+        .correlate(Post)
+        .scalar_subquery()
+    )
+    user_liked = exists().where(Like.post_id == Post.post_id, Like.user_id == viewer_id)
+
+    return _projection(Post, {
+        "post_id": Post.post_id,
+        "circle_id": Post.circle_id,
+        "author_id": Post.author_id,
+        "content": Post.content,
+        "photo_url": Post.photo_url,
+        "created_at": Post.created_at,
+        "author_name": User.name,
+        "like_count": like_count,
+        "user_liked": user_liked,
+    }, fields, Post.author_id, "author_name")
+
+
+def comment_rows(post_id: int, fields: tuple[str, ...] | None = None):
+    return _projection(Comment, {
+        "id": Comment.id,
+        "post_id": Comment.post_id,
+        "user_id": Comment.user_id,
+        "content": Comment.content,
+        "created_at": Comment.created_at,
+        "author_name": User.name,
+    }, fields, Comment.user_id, "author_name").where(Comment.post_id == post_id)
+
+
+def like_rows(post_id: int, fields: tuple[str, ...] | None = None):
+    return _projection(Like, {
+        "id": Like.id,
+        "post_id": Like.post_id,
+        "user_id": Like.user_id,
+        "created_at": Like.created_at,
+        "user_name": User.name,
+    }, fields, Like.user_id, "user_name").where(Like.post_id == post_id)
+
+
+# the archive tier (see app.archive), shaped like the hot queries above
+
+def archived_post_rows(viewer_id: int, fields: tuple[str, ...] | None = None):
+    user_liked = exists().where(ArchivedLike.post_id == ArchivedPost.post_id, ArchivedLike.user_id == viewer_id)
+
+    return _projection(ArchivedPost, {
+        "post_id": ArchivedPost.post_id,
+        "circle_id": ArchivedPost.circle_id,
+        "author_id": ArchivedPost.author_id,
+        "content": ArchivedPost.content,
+        "photo_url": ArchivedPost.photo_url,
+        "created_at": ArchivedPost.created_at,
+        "author_name": User.name,
+        "like_count": ArchivedPost.like_count,
+        "user_liked": user_liked,
+    }, fields, ArchivedPost.author_id, "author_name")
+
+
+def archived_comment_rows(post_id: int, fields: tuple[str, ...] | None = None):
+    return _projection(ArchivedComment, {
+        "id": ArchivedComment.id,
+        "post_id": ArchivedComment.post_id,
+        "user_id": ArchivedComment.user_id,
+        "content": ArchivedComment.content,
+        "created_at": ArchivedComment.created_at,
+        "author_name": User.name,
+    }, fields, ArchivedComment.user_id, "author_name").where(ArchivedComment.post_id == post_id)
+
+
+def archived_like_rows(post_id: int, fields: tuple[str, ...] | None = None):
+    return _projection(ArchivedLike, {
+        "id": ArchivedLike.id,
+        "post_id": ArchivedLike.post_id,
+        "user_id": ArchivedLike.user_id,
+        "created_at": ArchivedLike.created_at,
+        "user_name": User.name,
+    }, fields, ArchivedLike.user_id, "user_name").where(ArchivedLike.post_id == post_id)
+
+
+def both_tiers(hot, archived, order_by: str, descending: bool = False):
+    # one statement over the hot query and its archive twin, ordered by a
+    # result column; each half still runs on its own table's index
+    rows = union_all(hot, archived).subquery()
+    key = rows.c[order_by]
+    return select(rows).order_by(key.desc() if descending else key)
+
+
+def circle_unread_rows(user_id: int):
+    # one row per circle the user belongs to; posts are joined on the
+    # (circle_id, created_at) index from the read mark (or the day they
+    # joined, before any mark), so each circle costs a range scan over its
+    # unread posts only. The user's own posts are never unread.
+    since = func.coalesce(CircleReadMark.last_seen_at, CircleMember.joined_at)
+    return select(
+        CircleMember.circle_id,
+        func.count(Post.post_id).label("unread"),
+        CircleReadMark.last_seen_at,
+    ).outerjoin(CircleReadMark, and_(
+        CircleReadMark.user_id == CircleMember.user_id,
+        CircleReadMark.circle_id == CircleMember.circle_id
+    )).outerjoin(Post, and_(
+        Post.circle_id == CircleMember.circle_id,
+        Post.created_at > since,
+        Post.author_id != user_id
+    )).where(
+        CircleMember.user_id == user_id
+    ).group_by(CircleMember.circle_id).order_by(CircleMember.circle_id)
+
+
+def received_invitation_rows(user_id: int):
+    # newest first by id: the (to_user_id, status) index carries the rowid,
+    # so SQLite walks it backwards instead of sorting
+    return select(
+        CircleInvitation.id,
+        User.name.label("from_user_name"),
+        User.email.label("from_user_email"),
+        CircleInvitation.status,
+        CircleInvitation.created_at,
+    ).join(User, User.id == CircleInvitation.from_user_id).where(
+        CircleInvitation.to_user_id == user_id,
+        CircleInvitation.status == "pending"
+    ).order_by(CircleInvitation.id.desc())
+
+
+def notification_rows(user_id: int):
+    # newest first off the user_id index; the actor may have been purged since
+    return select(
+        Notification.id,
+        Notification.kind,
+        Notification.actor_id,
+        User.name.label("actor_name"),
+        Notification.post_id,
+        Notification.circle_id,
+        Notification.created_at,
+    ).outerjoin(User, User.id == Notification.actor_id).where(
+        Notification.user_id == user_id
+    ).order_by(Notification.id.desc())
+
+
+def user_rows():
+    # public fields only, never the password hash
+    return select(User.id, User.name, User.email)
+
+
+def prefix_range(column, prefix: str):
+    # "starts with" as a half-open range so SQLite can seek the index
+    # instead of evaluating LIKE row by row
+    return (column >= prefix) & (column < prefix + "\U0010ffff")
+
+
+def user_directory_rows(search: str | None):
+    query = user_rows().add_columns(User.name_key).where(User.deleted_at.is_(None))
+    if search:
+        key = search.casefold()
+        query = query.where(or_(
+            prefix_range(User.name_key, key),
+            prefix_range(User.email_key, key)
+        ))
+    return query.order_by(User.name_key, User.id)
+
+
+def as_dicts(result) -> list[dict]:
+    return [dict(row) for row in result.mappings()]
@@ -0,0 +1,224 @@
+import asyncio
+import math
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from decouple import config
+from fastapi.responses import JSONResponse
+from jose import JWTError, jwt
+from .auth.custom_auth import SECRET_KEY, ALGORITHM
+from .schemas import ErrorDetail
+
+# Admission control, as two ASGI middlewares in front of the app.
+#
+# RateLimitMiddleware keeps a token bucket per client and route class:
+# signed-in callers are keyed by the user id in their token, everyone else
+# (and every login/registration attempt) by IP. Buckets live in a backend,
+# in-process memory by default or a small SQLite file shared by all workers
+# on the host; anything with a take(key, limit, now) method can stand in.
+#
+# ConcurrencyLimitMiddleware caps requests in flight per worker. A request
+# that can't get a slot within ADMISSION_WAIT_SECONDS is turned away with
+# 503 instead of queueing behind work that is already late.
+
+RATE_LIMIT_ENABLED = config("RATE_LIMIT_ENABLED", default="true").lower() == "true"
+RATE_LIMIT_BACKEND = config("RATE_LIMIT_BACKEND", default="memory")
+MAX_CONCURRENT_REQUESTS = int(config("MAX_CONCURRENT_REQUESTS", default="64"))
+ADMISSION_WAIT_SECONDS = float(config("ADMISSION_WAIT_SECONDS", default="0.25"))
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600}
+
+
+@dataclass(frozen=True)
+class Limit:
+    rate: float  # tokens refilled per second
+    burst: int   # bucket size
+
+    @classmethod
+    def parse(cls, spec: str) -> "Limit":
+        # "10/minute": up to 10 at once, refilling at 10 per minute
+        count, _, period = spec.partition("/")
+        return cls(rate=int(count) / PERIODS[period.strip()], burst=int(count))
+
+
+LIMITS = {
+    # argon2 verification is deliberately expensive
+    "auth": Limit.parse(config("RATE_LIMIT_AUTH", default="10/minute")),
+    # list endpoints whose cost grows with the circle
+    "feed": Limit.parse(config("RATE_LIMIT_FEED", default="30/minute")),
+    "read": Limit.parse(config("RATE_LIMIT_READ", default="120/minute")),
+    "write": Limit.parse(config("RATE_LIMIT_WRITE", default="60/minute")),
+}
+
+AUTH_PATHS = {"/login", "/token", "/register", "/set-password"}
+FEED_PATHS = {"/their-days", "/my-circle/posts", "/search"}
+# a /batch call is limited through its sub-requests, one by one
+EXEMPT_PATHS = {"/", "/docs", "/redoc", "/openapi.json", "/batch"}
+
+
+def route_class(method: str, path: str) -> str | None:
+    if method == "OPTIONS" or path in EXEMPT_PATHS:
+        return None
+    if path in AUTH_PATHS:
+        return "auth"
+    if path in FEED_PATHS or path.endswith("/export"):
+        return "feed"
+    return "read" if method in ("GET", "HEAD") else "write"
+
+
+class MemoryBackend:
+    """
+    Buckets in a dict, per process. The least recently used are dropped past
+    max_keys; a dropped bucket would have refilled anyway.
+    """
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, limit: Limit, now: float) -> float:
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (limit.burst, now))
+            tokens = min(limit.burst, tokens + (now - updated) * limit.rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+            else:
+                wait = (1 - tokens) / limit.rate
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+
+class SQLiteBackend:
+    """
+    Buckets in an SQLite file every worker on the host opens, so a client
+    can't multiply its allowance by the number of workers. Each check is a
+    single UPSERT that only takes a token when one is available.
+    """
+
+    TAKE = """
+        INSERT INTO buckets (key, tokens, updated) VALUES (:key, :burst - 1, :now)
+        ON CONFLICT(key) DO UPDATE SET
+            tokens = min(:burst, tokens + (:now - updated) * :rate) - 1,
+            updated = :now
+        WHERE min(:burst, tokens + (:now - updated) * :rate) >= 1
+        RETURNING tokens
+    """
+    PRUNE_EVERY = 10_000
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)")
+            self._local.conn = conn
+            self._local.calls = 0
+        return conn
+
+    def take(self, key: str, limit: Limit, now: float) -> float:
+        conn = self._connection()
+        self._local.calls += 1
+        if self._local.calls % self.PRUNE_EVERY == 0:
+            # idle for an hour means full again; same as having no row
+            conn.execute("DELETE FROM buckets WHERE updated < ?", (now - 3600,))
+
+        params = {"key": key, "burst": limit.burst, "rate": limit.rate, "now": now}
+        if conn.execute(self.TAKE, params).fetchone() is not None:
+            return 0.0
+        tokens, updated = conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+        tokens = min(limit.burst, tokens + (now - updated) * limit.rate)
+        return (1 - tokens) / limit.rate
+
+
+def make_backend(spec: str = RATE_LIMIT_BACKEND):
+    if spec == "memory":
+        return MemoryBackend()
+    if spec.startswith("sqlite:///"):
+        return SQLiteBackend(spec.removeprefix("sqlite:///"))
+    raise ValueError(f"Unknown RATE_LIMIT_BACKEND {spec!r}")
+
+
+def _reject(status_code: int, error_type: str, message: str, retry_after: float) -> JSONResponse:
+    error_detail = ErrorDetail(type=error_type, message=message)
+    return JSONResponse(
+        status_code=status_code,
+        content=error_detail.model_dump(mode='json'),
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+    )
+
+
+def _client_identity(scope, route: str) -> str:
+    if route != "auth":
+        for name, value in scope["headers"]:
+            if name == b"authorization" and value[:7].lower() == b"bearer ":
+                try:
+                    payload = jwt.decode(value[7:].decode(), SECRET_KEY, algorithms=[ALGORITHM])
+                except JWTError:
+                    break
+                user = payload.get("id") or payload.get("sub")
+                if user is not None:
+                    return f"user:{user}"
+                break
+    client = scope.get("client")
+    return f"ip:{client[0] if client else 'unknown'}"
+
+
+class RateLimitMiddleware:
+    def __init__(self, app, backend=None, limits: dict[str, Limit] = LIMITS, enabled: bool = RATE_LIMIT_ENABLED):
+        self.app = app
+        self.backend = backend or make_backend()
+        self.limits = limits
+        self.enabled = enabled
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.enabled:
+            return await self.app(scope, receive, send)
+
+        route = route_class(scope["method"], scope["path"])
+        if route is None:
+            return await self.app(scope, receive, send)
+
+        key = f"{route}:{_client_identity(scope, route)}"
+        # wall clock, not monotonic: buckets may be shared across processes
+        wait = self.backend.take(key, self.limits[route], time.time())
+        if wait:
+            response = _reject(429, "rate_limited", "Too many requests, please slow down", wait)
+            return await response(scope, receive, send)
+
+        await self.app(scope, receive, send)
+
+
+class ConcurrencyLimitMiddleware:
+    def __init__(self, app, max_concurrent: int = MAX_CONCURRENT_REQUESTS, max_wait: float = ADMISSION_WAIT_SECONDS):
+        self.app = app
+        self.max_wait = max_wait
+        self._slots = asyncio.Semaphore(max_concurrent)
+
+    async def __call__(self, scope, receive, send):
+        # a /batch sub-request runs in the slot its batch already holds
+        if scope["type"] != "http" or "batch" in scope:
+            return await self.app(scope, receive, send)
+
+        if self._slots.locked():
+            try:
+                await asyncio.wait_for(self._slots.acquire(), self.max_wait)
+            except asyncio.TimeoutError:
+                response = _reject(503, "overloaded", "Server is busy, please retry shortly", 1)
+                return await response(scope, receive, send)
+        else:
+            await self._slots.acquire()
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self._slots.release()
@@ -0,0 +1,101 @@
+import itertools
+import threading
+import time
+from decouple import config
+from fastapi import Depends, Request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from .database import SessionLocal, ReadSessionLocals
+from .auth.custom_auth import get_current_user
+from .models import User
+from .cache import cache
+
+# Read/write routing. Handlers that only read take their session from
+# get_read_db, which hands out a session on one of the DATABASE_REPLICAS
+# engines (round robin); everything else keeps using get_db and the primary.
+# With no replicas configured both go to the primary.
+#
+# Replicas may lag, so a user who has just written is pinned to the primary
+# for READ_YOUR_WRITES_SECONDS and sees their own post, comment or like
+# straight away. Writes are noticed on the session: get_current_user tags
+# it with the user id, any flush or INSERT/UPDATE/DELETE marks it, and the
+# commit records the time. Times are kept per worker and, when the cache
+# has a shared tier, there as well so every worker honours the pin.
+#
+# Replica sessions carry info["replica"], and the cache never stores what
+# was read through one: a lagging replica could otherwise fill a shared
+# entry with a page missing a write, which a pinned user would then be
+# served from the cache.
+
+READ_YOUR_WRITES_SECONDS = float(config("READ_YOUR_WRITES_SECONDS", default="5"))
+
+
+class WriteTracker:
+    def __init__(self, window: float, shared=None, max_users: int = 100_000):
+        self.window = window
+        self.shared = shared
+        self.max_users = max_users
+        self._last = {}
+        self._lock = threading.Lock()
+
+    def record(self, user_id: int):
+        now = time.time()
+        with self._lock:
+            self._last[user_id] = now
+            if len(self._last) > self.max_users:
+                self._last = {uid: at for uid, at in self._last.items() if at + self.window > now}
+        if self.shared is not None:
+            self.shared.set(f"wrote:{user_id}", b"1", now + self.window)
+
+    def pinned(self, user_id: int) -> bool:
+        now = time.time()
+        if self._last.get(user_id, 0) + self.window > now:
+            return True
+        return self.shared is not None and self.shared.get(f"wrote:{user_id}", now) is not None
+
+
+tracker = WriteTracker(READ_YOUR_WRITES_SECONDS, shared=cache.shared)
+_replicas = itertools.cycle(ReadSessionLocals) if ReadSessionLocals else None
+
+
+def get_read_db(request: Request, current_user: User = Depends(get_current_user)):
+    """
+    Session for a read-only handler: a replica, unless there are none or
+    the user wrote within the read-your-writes window. Sub-requests of a
+    /batch call read on the batch's session, like get_db.
+    """
+    shared = request.scope.get("batch", {}).get("session")
+    if shared is not None:
+        yield shared
+        return
+    if _replicas is None or tracker.pinned(current_user.id):
+        db = SessionLocal()
+    else:
+        db = next(_replicas)()
+        db.info["replica"] = True
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@event.listens_for(Session, "after_flush")
+def _flushed(session, flush_context):
+    session.info["wrote"] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _executed(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info["wrote"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _record_write(session):
+    if session.info.pop("wrote", False) and session.info.get("user_id") is not None:
+        tracker.record(session.info["user_id"])
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_write(session):
+    session.info.pop("wrote", None)
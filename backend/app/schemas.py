@@ -1,7 +1,16 @@
 from pydantic import BaseModel, EmailStr, field_validator, Field, ConfigDict
-from typing import Optional
+from typing import Any, Literal, Optional
 from datetime import datetime, date
 
+def check_password_strength(v):
+    if not any(c.isalpha() for c in v):
+        raise ValueError('Password must contain at least one letter')
+
+    if not any(c.isdigit() for c in v):
+        raise ValueError('Password must contain at least one number')
+    return v
+
+
 class UserCreate(BaseModel):
     name: str
     email: EmailStr
@@ -9,12 +18,36 @@ class UserCreate(BaseModel):
     
     @field_validator('password')
     def validate_password(cls, v):
-        if not any(c.isalpha() for c in v):
-            raise ValueError('Password must contain at least one letter')
+        return check_password_strength(v)
+
+
+# one row of a bulk import file; without a password the user gets a set-password token
+class UserImport(BaseModel):
+    name: str = Field(min_length=1, max_length=180)
+    email: EmailStr
+    password: Optional[str] = Field(default=None, min_length=8, max_length=50)
+    circle_owner: Optional[EmailStr] = None
+    
+    @field_validator('password', 'circle_owner', mode='before')
+    def empty_as_none(cls, v):
+        return v or None
+    
+    @field_validator('password')
+    def validate_password(cls, v):
+        return check_password_strength(v) if v is not None else v
 
-        if not any(c.isdigit() for c in v):
-            raise ValueError('Password must contain at least one number')
-        return v
+
+class AccountDeletion(BaseModel):
+    password: str
+
+
+class SetPassword(BaseModel):
+    token: str
+    password: str = Field(min_length=8, max_length=50)
+    
+    @field_validator('password')
+    def validate_password(cls, v):
+        return check_password_strength(v)
         
         
 class UserLogin(BaseModel):
@@ -67,6 +100,11 @@ class UserResponse(BaseModel):
     class Config:
         orm_mode = True
 
+class UserDirectoryResponse(BaseModel):
+    users: list[UserResponse]
+    count: int
+    next_cursor: Optional[str] = None
+
 # after joining the circle
 class MemberResponse(BaseModel):
     id: int
@@ -92,10 +130,43 @@ class InvitationResponse(BaseModel):
         orm_mode = True
 
 
+class ReceivedInvitationsResponse(BaseModel):
+    invitations: list[InvitationResponse]
+    next_cursor: Optional[str] = None
+
+
+class InvitationCount(BaseModel):
+    pending: int
+
+
 class InvitationAction(BaseModel):
     action: str
 
 
+class BulkInvite(BaseModel):
+    emails: list[EmailStr] = Field(min_length=1, max_length=100)
+
+
+class BulkInviteResult(BaseModel):
+    email: str
+    status: str  # invited, not_found, already_joined, already_invited or self
+    invitation_id: Optional[int] = None
+
+
+class InvitationReply(BaseModel):
+    invitation_id: int
+    action: str
+
+
+class BulkInvitationAction(BaseModel):
+    responses: list[InvitationReply] = Field(min_length=1, max_length=100)
+
+
+class BulkInvitationResult(BaseModel):
+    invitation_id: int
+    status: str  # accepted, declined, not_found, already_responded or invalid_action
+
+
 class MemberToRemove(BaseModel):
     email: EmailStr
 
@@ -140,4 +211,108 @@ class LikeResponse(BaseModel):
     user_name: str
     
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+
+# Search related
+class SearchResult(BaseModel):
+    kind: str  # "post" or "comment"
+    id: int
+    post_id: int
+    circle_id: int
+    author_id: int
+    author_name: str
+    created_at: datetime
+    snippet: str  # HTML-escaped, matches wrapped in <mark>
+
+
+class SearchResponse(BaseModel):
+    results: list[SearchResult]
+    next_cursor: Optional[str] = None
+
+
+class CircleUnread(BaseModel):
+    circle_id: int
+    unread: int
+    last_seen_at: Optional[datetime] = None
+
+
+class CircleUnreadResponse(BaseModel):
+    circles: list[CircleUnread]
+
+
+class CircleSeen(BaseModel):
+    seen_at: Optional[datetime] = None  # created_at of the newest post seen; now if omitted
+
+
+class NotificationResponse(BaseModel):
+    id: int
+    kind: str
+    actor_id: int
+    actor_name: Optional[str] = None  # None once the actor's account is purged
+    post_id: Optional[int] = None
+    circle_id: Optional[int] = None
+    created_at: datetime
+    read: bool
+
+
+class NotificationsResponse(BaseModel):
+    notifications: list[NotificationResponse]
+    unread: int
+    next_cursor: Optional[str] = None
+
+
+class NotificationCount(BaseModel):
+    unread: int
+
+
+class MarkNotificationsRead(BaseModel):
+    up_to: Optional[int] = Field(default=None, ge=0, le=2**63 - 1)  # newest notification id seen; all if omitted
+
+
+class DigestPost(BaseModel):
+    post_id: int
+    author_name: Optional[str] = None
+    excerpt: str
+    photo_url: Optional[str] = None
+    likes: int
+    comments: int
+
+
+class CircleDigestResponse(BaseModel):
+    circle_id: int
+    circle_name: Optional[str] = None
+    week_start: date
+    posts: int
+    photos: int
+    new_members: list[str]
+    top_posts: list[DigestPost]
+
+
+class DigestResponse(BaseModel):
+    week_start: Optional[date] = None  # None until a digest has been computed
+    circles: list[CircleDigestResponse]
+
+
+# Batch
+class BatchItem(BaseModel):
+    id: Optional[str] = None  # echoed back to match results to requests
+    method: Literal["GET", "HEAD", "POST", "PUT", "PATCH", "DELETE"]
+    path: str = Field(min_length=1, max_length=2000)  # with any query string, e.g. /users?limit=10
+    body: Optional[Any] = None  # sent as JSON
+
+
+class BatchRequest(BaseModel):
+    requests: list[BatchItem] = Field(min_length=1, max_length=50)
+    parallel: bool = False  # read runs of GETs concurrently
+
+
+class BatchItemResult(BaseModel):
+    id: Optional[str] = None
+    status: int
+    headers: dict[str, str]
+    body: Optional[Any] = None
+
+
+class BatchResponse(BaseModel):
+    responses: list[BatchItemResult]
@@ -0,0 +1,212 @@
+import html
+import re
+from sqlalchemy import DDL, event, select, text, delete, union_all, table, column
+from sqlalchemy.orm import Session
+from .database import Base
+from .models import User, Post, Comment, ArchivedPost, ArchivedComment
+
+# Full-text index over post and comment content, backed by an SQLite FTS5
+# virtual table. Posts and comments share one index: posts use even rowids
+# (post_id * 2) and comments odd ones (id * 2 + 1), so every write or delete
+# is a rowid lookup rather than a scan. circle_id and post_id are stored
+# unindexed so results can be scoped to the caller's circles without a join.
+
+SEARCH_TABLE = "search_index"
+
+# snippet markers that cannot appear in escaped user content; they are
+# swapped for <mark> tags after the snippet has been HTML-escaped
+_MARK_OPEN = "\x02"
+_MARK_CLOSE = "\x03"
+
+event.listen(
+    Base.metadata,
+    "after_create",
+    DDL(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+        "content, circle_id UNINDEXED, post_id UNINDEXED, "
+        "tokenize='porter unicode61')"
+    ).execute_if(dialect="sqlite")
+)
+event.listen(
+    Base.metadata,
+    "before_drop",
+    DDL(f"DROP TABLE IF EXISTS {SEARCH_TABLE}").execute_if(dialect="sqlite")
+)
+
+
+def post_rowid(post_id: int) -> int:
+    return post_id * 2
+
+
+def comment_rowid(comment_id: int) -> int:
+    return comment_id * 2 + 1
+
+
+def index_post(db: Session, post: Post):
+    db.execute(
+        text(f"INSERT INTO {SEARCH_TABLE}(rowid, content, circle_id, post_id) VALUES (:rowid, :content, :circle_id, :post_id)"),
+        {"rowid": post_rowid(post.post_id), "content": post.content, "circle_id": post.circle_id, "post_id": post.post_id}
+    )
+
+
+def index_comment(db: Session, comment: Comment, circle_id: int):
+    db.execute(
+        text(f"INSERT INTO {SEARCH_TABLE}(rowid, content, circle_id, post_id) VALUES (:rowid, :content, :circle_id, :post_id)"),
+        {"rowid": comment_rowid(comment.id), "content": comment.content, "circle_id": circle_id, "post_id": comment.post_id}
+    )
+
+
+def unindex(db: Session, post_ids=(), comment_ids=()):
+    rowids = [post_rowid(i) for i in post_ids] + [comment_rowid(i) for i in comment_ids]
+    if rowids:
+        db.execute(
+            text(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = :rowid"),
+            [{"rowid": rowid} for rowid in rowids]
+        )
+
+
+def unindex_posts(db: Session, post_ids):
+    """
+    Remove posts and their comments given as a subquery of post ids, in one
+    DELETE by rowid (nothing is loaded into Python). Covers both the hot and
+    the archive tables.
+    """
+    index = table(SEARCH_TABLE, column("rowid"))
+    rowids = union_all(
+        select(Post.post_id * 2).where(Post.post_id.in_(post_ids)),
+        select(Comment.id * 2 + 1).where(Comment.post_id.in_(post_ids)),
+        select(ArchivedPost.post_id * 2).where(ArchivedPost.post_id.in_(post_ids)),
+        select(ArchivedComment.id * 2 + 1).where(ArchivedComment.post_id.in_(post_ids)),
+    )
+    db.execute(delete(index).where(index.c.rowid.in_(rowids)))
+
+
+def to_match_query(raw: str) -> str | None:
+    # quote every term so user input can never be parsed as FTS5 syntax;
+    # the last term is a prefix match so results follow the user as they type
+    terms = re.findall(r"\w+", raw)
+    if not terms:
+        return None
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+def highlight(snippet: str) -> str:
+    return html.escape(snippet).replace(_MARK_OPEN, "<mark>").replace(_MARK_CLOSE, "</mark>")
+
+
+def ranked_matches(db: Session, viewer_id: int, match: str, limit: int, after: tuple[float, int] | None = None):
+    """
+    Up to `limit` matches visible to the viewer, best bm25 first, after the
+    (rank, rowid) `after`. Each is a ((rank, rowid), result) pair; result is
+    None if the post or comment went away since it was indexed.
+    """
+    keyset = ""
+    params = {"match": match, "viewer_id": viewer_id, "limit": limit}
+    if after is not None:
+        keyset = "AND (rank > :rank OR (rank = :rank AND rowid > :rowid))"
+        params.update(rank=after[0], rowid=after[1])
+
+    hits = db.execute(text(f"""
+        SELECT rowid, post_id, circle_id, rank,
+               snippet({SEARCH_TABLE}, 0, :mark_open, :mark_close, '…', 16) AS snippet
+        FROM {SEARCH_TABLE}
+        WHERE {SEARCH_TABLE} MATCH :match
+          AND circle_id IN (SELECT circle_id FROM circle_members WHERE user_id = :viewer_id)
+          {keyset}
+        ORDER BY rank, rowid
+        LIMIT :limit
+    """), {**params, "mark_open": _MARK_OPEN, "mark_close": _MARK_CLOSE}).all()
+
+    post_ids = [hit.rowid // 2 for hit in hits if hit.rowid % 2 == 0]
+    comment_ids = [hit.rowid // 2 for hit in hits if hit.rowid % 2 == 1]
+
+    # author and timestamp for the page, two IN queries regardless of page
+    # size, each over the hot and the archive table
+    posts = {}
+    if post_ids:
+        posts = {row.id: row for row in db.execute(union_all(*(
+            select(model.post_id.label("id"), model.author_id, model.created_at, User.name.label("author_name"))
+            .join(User, User.id == model.author_id)
+            .where(model.post_id.in_(post_ids))
+            for model in (Post, ArchivedPost)
+        )))}
+    comments = {}
+    if comment_ids:
+        comments = {row.id: row for row in db.execute(union_all(*(
+            select(model.id, model.user_id.label("author_id"), model.created_at, User.name.label("author_name"))
+            .join(User, User.id == model.user_id)
+            .where(model.id.in_(comment_ids))
+            for model in (Comment, ArchivedComment)
+        )))}
+
+    matches = []
+    for hit in hits:
+        kind = "post" if hit.rowid % 2 == 0 else "comment"
+        source = (posts if kind == "post" else comments).get(hit.rowid // 2)
+        result = None
+        if source is not None:
+            result = {
+                "kind": kind,
+                "id": hit.rowid // 2,
+                "post_id": hit.post_id,
+                "circle_id": hit.circle_id,
+                "author_id": source.author_id,
+                "author_name": source.author_name,
+                "created_at": source.created_at,
+                "snippet": highlight(hit.snippet),
+            }
+        matches.append(((hit.rank, hit.rowid), result))
+    return matches
+
+
+def paginate(matches, limit: int):
+    # matches are fetched one past the page to learn whether another follows
+    next_after = matches[limit - 1][0] if len(matches) > limit else None
+    return [result for _, result in matches[:limit] if result is not None], next_after
+
+
+def search(db: Session, viewer_id: int, match: str, limit: int, after: tuple[float, int] | None = None):
+    """
+    Ranked matches (best bm25 first) visible to the viewer, one page at a
+    time. `after` is the (rank, rowid) of the last row on the previous page;
+    the (rank, rowid) to continue from is returned alongside the page, or
+    None when this was the last one.
+    """
+    return paginate(ranked_matches(db, viewer_id, match, limit + 1, after), limit)
+
+
+def index_entries(db: Session, entries):
+    """
+    Write index rows given as dicts of rowid, content, circle_id and
+    post_id, replacing any already there under the same rowid.
+    """
+    entries = [entry for entry in entries if entry["content"] is not None]
+    if entries:
+        db.execute(
+            text(f"INSERT OR REPLACE INTO {SEARCH_TABLE}(rowid, content, circle_id, post_id) VALUES (:rowid, :content, :circle_id, :post_id)"),
+            entries
+        )
+
+
+def rebuild_index(db: Session) -> int:
+    """
+    Drop every entry and re-index all posts and comments, hot and archived,
+    with INSERT ... SELECT statements, then merge the FTS b-trees.
+    """
+    db.execute(text(f"DELETE FROM {SEARCH_TABLE}"))
+    for posts, comments in (("posts", "comments"), ("archived_posts", "archived_comments")):
+        db.execute(text(f"""
+            INSERT INTO {SEARCH_TABLE}(rowid, content, circle_id, post_id)
+            SELECT post_id * 2, content, circle_id, post_id FROM {posts}
+            WHERE content IS NOT NULL
+        """))
+        db.execute(text(f"""
+            INSERT INTO {SEARCH_TABLE}(rowid, content, circle_id, post_id)
+            SELECT {comments}.id * 2 + 1, {comments}.content, {posts}.circle_id, {comments}.post_id
+            FROM {comments} JOIN {posts} ON {posts}.post_id = {comments}.post_id
+        """))
+    db.execute(text(f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('optimize')"))
+    db.commit()
+    return db.execute(text(f"SELECT count(*) FROM {SEARCH_TABLE}")).scalar_one()
@@ -0,0 +1,490 @@
+import bisect
+import hashlib
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from decouple import config
+from fastapi import Depends
+from sqlalchemy import create_engine, delete, event, func, select, union_all, update
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session, sessionmaker
+from .database import Base, engine, SessionLocal, get_db
+from .models import Circle, Post, Comment, Like, ArchivedPost, ArchivedComment, ArchivedLike, CirclePlacement, IdBlock
+from .exceptions import PostNotFound, CircleMoving
+from .search import index_entries, unindex
+from .deletion import delete_posts, delete_archived_posts
+from .archive import thaw_post
+from .cache import cache
+from .routing import get_read_db
+
+# Circle data split across database files. The main database stays the
+# catalog (users, circles, memberships, invitations, notifications...);
+# posts, comments, likes (hot and archived, see app.archive) and their
+# search entries live in one of the CIRCLE_SHARDS, picked for each circle
+# by consistent hashing on its id:
+#
+#     CIRCLE_SHARDS=main,s1=sqlite:///shard1.db,s2=sqlite:///shard2.db
+#
+# "main" is the main database itself. Left out, it only keeps circles that
+# predate sharding until `python -m app.cli shards rebalance` moves them.
+# Unset, everything stays in the main database as before.
+#
+# A new circle's shard is recorded in circle_placements when it is created,
+# so adding a shard moves only the circles the ring hands to it, and only
+# when the rebalance runs. Shard connections ATTACH the catalog, so queries
+# on a shard still join users and circle_members, and a request's writes to
+# both (a post and its notifications) commit together. Ids of posts,
+# comments and likes come from blocks reserved in id_blocks, keeping them
+# unique across shards so a circle can move without renumbering.
+#
+# Feeds and search scatter: the viewer's circles are grouped by shard, each
+# shard is queried on its own thread and the pages are merged in order.
+#
+# A move copies the circle while it stays writable, then marks it moving
+# (writes get a 503 and retry), waits out in-flight requests, copies what
+# changed meanwhile, flips the placement and clears the old copy.
+
+CIRCLE_SHARDS = config("CIRCLE_SHARDS", default="")
+VIRTUAL_NODES = 64
+ID_BLOCK_SIZE = int(config("SHARD_ID_BLOCK_SIZE", default="1000"))
+MOVE_GRACE_SECONDS = float(config("SHARD_MOVE_GRACE_SECONDS", default="2"))
+SCATTER_WORKERS = int(config("SHARD_SCATTER_WORKERS", default="8"))
+MAIN = "main"
+
+SHARDED_TABLES = [
+    Post.__table__, Comment.__table__, Like.__table__,
+    ArchivedPost.__table__, ArchivedComment.__table__, ArchivedLike.__table__,
+]
+ID_COLUMNS = {
+    "posts": (Post.post_id, ArchivedPost.post_id),
+    "comments": (Comment.id, ArchivedComment.id),
+    "likes": (Like.id, ArchivedLike.id),
+}
+
+
+def parse_shards(spec: str) -> dict[str, str | None]:
+    # name=url pairs; a bare "main" is the main database
+    shards = {}
+    for item in spec.split(","):
+        name, _, url = item.strip().partition("=")
+        if name:
+            shards[name.strip()] = url.strip() or None
+    return shards
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    def __init__(self, names, vnodes: int = VIRTUAL_NODES):
+        points = sorted((_hash(f"{name}#{i}"), name) for name in names for i in range(vnodes))
+        self._points = [point for point, _ in points]
+        self._names = [name for _, name in points]
+
+    def shard_for(self, circle_id: int) -> str:
+        i = bisect.bisect(self._points, _hash(str(circle_id))) % len(self._points)
+        return self._names[i]
+
+
+def _shard_engine(url: str):
+    shard = create_engine(url)
+    catalog = engine.url.database
+
+    @event.listens_for(shard, "connect")
+    def attach_catalog(dbapi_connection, connection_record):
+        dbapi_connection.execute("ATTACH DATABASE ? AS catalog", (catalog,))
+
+    return shard
+
+
+_configured = parse_shards(CIRCLE_SHARDS)
+engines = {MAIN: engine, **{name: _shard_engine(url) for name, url in _configured.items() if name != MAIN}}
+session_factories = {name: SessionLocal if name == MAIN else sessionmaker(bind=bind) for name, bind in engines.items()}
+# None when unsharded: nothing is placed and every circle is in main
+ring = HashRing(_configured) if len(engines) > 1 else None
+_scatter_pool = ThreadPoolExecutor(max_workers=SCATTER_WORKERS, thread_name_prefix="shard-scatter")
+
+
+def init_shards() -> list[str]:
+    """
+    Create the sharded tables (and search index) in every shard file that
+    doesn't have them yet. The main database gets its schema from Alembic.
+    """
+    for name, bind in engines.items():
+        if name != MAIN:
+            Base.metadata.create_all(bind, tables=SHARDED_TABLES)
+    return [name for name in engines if name != MAIN]
+
+
+# placement
+
+def place_circles(db: Session, circle_ids):
+    """
+    Record the ring's shard for newly created circles. Does not commit.
+    """
+    if ring is None:
+        return
+    rows = [{"circle_id": circle_id, "shard": ring.shard_for(circle_id), "moving": False} for circle_id in circle_ids]
+    if rows:
+        db.execute(insert(CirclePlacement).on_conflict_do_nothing(), rows)
+
+
+def shard_of(db: Session, circle_id: int, writing: bool = False) -> str:
+    if ring is None:
+        return MAIN
+    row = db.execute(
+        select(CirclePlacement.shard, CirclePlacement.moving).where(CirclePlacement.circle_id == circle_id)
+    ).first()
+    if row is None:
+        return MAIN
+    if writing and row.moving:
+        raise CircleMoving()
+    return row.shard
+
+
+def group_by_shard(db: Session, circle_ids) -> dict[str, list[int]]:
+    circle_ids = list(circle_ids)
+    if ring is None:
+        return {MAIN: circle_ids} if circle_ids else {}
+    placed = dict(db.execute(
+        select(CirclePlacement.circle_id, CirclePlacement.shard).where(CirclePlacement.circle_id.in_(circle_ids))
+    ).all())
+    groups = defaultdict(list)
+    for circle_id in circle_ids:
+        groups[placed.get(circle_id, MAIN)].append(circle_id)
+    return dict(groups)
+
+
+def placed_on(name: str, column) -> list:
+    """
+    Criteria limiting `column` (a circle id) to circles on shard `name`;
+    none when unsharded.
+    """
+    if ring is None:
+        return []
+    if name == MAIN:
+        return [column.not_in(select(CirclePlacement.circle_id).where(CirclePlacement.shard != MAIN))]
+    return [column.in_(select(CirclePlacement.circle_id).where(CirclePlacement.shard == name))]
+
+
+# ids
+
+class IdAllocator:
+    """
+    Hands out ids from blocks reserved in id_blocks, one short catalog
+    transaction per block. Reserve before the request writes anything, so
+    the reservation never waits on the request's own lock.
+    """
+
+    def __init__(self, block_size: int = ID_BLOCK_SIZE):
+        self.block_size = block_size
+        self._blocks = {}
+        self._lock = threading.Lock()
+
+    def next(self, table: str) -> int:
+        with self._lock:
+            next_id, end = self._blocks.get(table, (0, 0))
+            if next_id >= end:
+                end = self._reserve(table)
+                next_id = end - self.block_size
+            self._blocks[table] = (next_id + 1, end)
+            return next_id
+
+    def _reserve(self, table: str) -> int:
+        with engine.begin() as conn:
+            if conn.scalar(select(IdBlock.next_id).where(IdBlock.name == table)) is None:
+                # first block: above every id already on any shard, hot or archived
+                start = _max_id(conn, table)
+                for name, bind in engines.items():
+                    if name != MAIN:
+                        with bind.connect() as shard:
+                            start = max(start, _max_id(shard, table))
+                start += 1
+                conn.execute(insert(IdBlock).values(name=table, next_id=start).on_conflict_do_nothing())
+            return conn.scalar(
+                update(IdBlock)
+                .where(IdBlock.name == table)
+                .values(next_id=IdBlock.next_id + self.block_size)
+                .returning(IdBlock.next_id)
+            )
+
+
+def _max_id(conn, table: str) -> int:
+    return max(conn.scalar(select(func.max(column))) or 0 for column in ID_COLUMNS[table])
+
+
+allocator = IdAllocator()
+
+
+def new_id(table: str) -> int | None:
+    # unsharded, SQLite numbers rows itself
+    return allocator.next(table) if ring is not None else None
+
+
+# request sessions
+
+class ShardSessions:
+    """
+    The shard sessions of one request, opened when first needed. `db` is
+    the request's main-database session and doubles as the main shard's.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+        self._sessions = {MAIN: db}
+
+    def session(self, name: str) -> Session:
+        if name not in self._sessions:
+            session = session_factories[name]()
+            session.info["user_id"] = self.db.info.get("user_id")
+            self._sessions[name] = session
+        return self._sessions[name]
+
+    def for_circle(self, circle_id: int, writing: bool = False) -> Session:
+        return self.session(shard_of(self.db, circle_id, writing))
+
+    def for_post(self, post_id: int, writing: bool = False) -> tuple[Session, int]:
+        # (session, circle_id) of the post; a primary-key probe per shard and
+        # tier. Archived posts are thawed before they are written to
+        query = union_all(
+            select(Post.circle_id, Post.post_id).where(Post.post_id == post_id),
+            select(ArchivedPost.circle_id, ArchivedPost.post_id).where(ArchivedPost.post_id == post_id),
+        )
+        found = self._probe(query)
+        if found is None:
+            raise PostNotFound()
+        return self._located(found, writing), found.circle_id
+
+    def for_comment(self, comment_id: int, writing: bool = False) -> Session | None:
+        query = union_all(
+            select(Post.circle_id, Post.post_id).join(Comment, Comment.post_id == Post.post_id).where(Comment.id == comment_id),
+            select(ArchivedPost.circle_id, ArchivedPost.post_id)
+            .join(ArchivedComment, ArchivedComment.post_id == ArchivedPost.post_id)
+            .where(ArchivedComment.id == comment_id),
+        )
+        found = self._probe(query)
+        return None if found is None else self._located(found, writing)
+
+    def _located(self, found, writing: bool) -> Session:
+        session = self.for_circle(found.circle_id, writing)
+        if writing:
+            thaw_post(session, found.post_id)
+        return session
+
+    def _probe(self, query):
+        names = engines if ring is not None else [MAIN]
+        for name in names:
+            found = self.session(name).execute(query).first()
+            if found is not None:
+                return found
+        return None
+
+    def close(self):
+        for name, session in self._sessions.items():
+            if name != MAIN:
+                session.close()
+
+
+def get_shards(db: Session = Depends(get_db)):
+    shards = ShardSessions(db)
+    try:
+        yield shards
+    finally:
+        shards.close()
+
+
+def get_read_shards(db: Session = Depends(get_read_db)):
+    shards = ShardSessions(db)
+    try:
+        yield shards
+    finally:
+        shards.close()
+
+
+def scatter(db: Session, circle_ids, query) -> list:
+    """
+    Run query(session, circle_ids) once per shard holding any of
+    `circle_ids`, with that shard's share of them, and return the results.
+    Main's share runs here on `db`; other shards run concurrently, each on
+    a session of its own.
+    """
+    groups = group_by_shard(db, circle_ids)
+
+    def on_shard(name, ids):
+        with session_factories[name]() as session:
+            return query(session, ids)
+
+    futures = [_scatter_pool.submit(on_shard, name, ids) for name, ids in groups.items() if name != MAIN]
+    results = [query(db, groups[MAIN])] if MAIN in groups else []
+    return results + [future.result() for future in futures]
+
+
+# rebalancing
+
+def _scopes(circle_id: int):
+    # (table, id column, rows of the circle) in copy order, parents first,
+    # for both tiers
+    circle_posts = select(Post.post_id).where(Post.circle_id == circle_id)
+    archived_posts = select(ArchivedPost.post_id).where(ArchivedPost.circle_id == circle_id)
+    return [
+        (Post.__table__, Post.post_id, Post.circle_id == circle_id),
+        (Comment.__table__, Comment.id, Comment.post_id.in_(circle_posts)),
+        (Like.__table__, Like.id, Like.post_id.in_(circle_posts)),
+        (ArchivedPost.__table__, ArchivedPost.post_id, ArchivedPost.circle_id == circle_id),
+        (ArchivedComment.__table__, ArchivedComment.id, ArchivedComment.post_id.in_(archived_posts)),
+        (ArchivedLike.__table__, ArchivedLike.id, ArchivedLike.post_id.in_(archived_posts)),
+    ]
+
+
+def _copy_rows(dst: Session, table, rows: list[dict], circle_id: int):
+    if not rows:
+        return
+    dst.execute(insert(table).on_conflict_do_nothing(), rows)
+    if table in (Post.__table__, ArchivedPost.__table__):
+        index_entries(dst, [
+            {"rowid": row["post_id"] * 2, "content": row["content"], "circle_id": circle_id, "post_id": row["post_id"]}
+            for row in rows
+        ])
+    elif table in (Comment.__table__, ArchivedComment.__table__):
+        index_entries(dst, [
+            {"rowid": row["id"] * 2 + 1, "content": row["content"], "circle_id": circle_id, "post_id": row["post_id"]}
+            for row in rows
+        ])
+
+
+def _copy(src: Session, dst: Session, circle_id: int, batch_size: int) -> int:
+    # keyset batches, each committed on the target; the source isn't locked
+    copied = 0
+    for table, key, scope in _scopes(circle_id):
+        last = 0
+        while True:
+            rows = src.execute(select(table).where(scope, key > last).order_by(key).limit(batch_size)).mappings().all()
+            if not rows:
+                break
+            _copy_rows(dst, table, [dict(row) for row in rows], circle_id)
+            dst.commit()
+            copied += len(rows)
+            last = rows[-1][key.key]
+    return copied
+
+
+def _catch_up(src: Session, dst: Session, circle_id: int, batch_size: int) -> int:
+    # posts, comments and likes are never edited, only added, deleted or
+    # moved between tiers, so comparing ids finds every change made since
+    # the copy. Everything gone is deleted before anything is copied: a
+    # post that changed tier keeps its search rowid
+    scopes = _scopes(circle_id)
+    diffs = []
+    for table, key, scope in scopes:
+        src_ids = set(src.scalars(select(key).where(scope)))
+        dst_ids = set(dst.scalars(select(key).where(scope)))
+        diffs.append((list(dst_ids - src_ids), sorted(src_ids - dst_ids)))
+
+    changed = 0
+    for (table, key, _), (gone, _) in zip(scopes, diffs):
+        if gone:
+            if table is Post.__table__:
+                delete_posts(dst, Post.post_id.in_(gone), queue_photos=False)
+            elif table is ArchivedPost.__table__:
+                delete_archived_posts(dst, ArchivedPost.post_id.in_(gone), queue_photos=False)
+            else:
+                if table in (Comment.__table__, ArchivedComment.__table__):
+                    unindex(dst, comment_ids=gone)
+                dst.execute(delete(table).where(key.in_(gone)).execution_options(synchronize_session=False))
+        changed += len(gone)
+    for (table, key, _), (_, missing) in zip(scopes, diffs):
+        for i in range(0, len(missing), batch_size):
+            rows = src.execute(select(table).where(key.in_(missing[i:i + batch_size]))).mappings().all()
+            _copy_rows(dst, table, [dict(row) for row in rows], circle_id)
+        changed += len(missing)
+    return changed
+
+
+def _set_placement(circle_id: int, shard: str, moving: bool):
+    with SessionLocal() as db:
+        stmt = insert(CirclePlacement).values(circle_id=circle_id, shard=shard, moving=moving)
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=["circle_id"],
+            set_={"shard": stmt.excluded.shard, "moving": stmt.excluded.moving}
+        ))
+        db.commit()
+
+
+def move_circle(circle_id: int, target: str, batch_size: int = 500, grace: float = MOVE_GRACE_SECONDS) -> int:
+    """
+    Move a circle's posts, comments, likes and search entries to shard
+    `target` while it stays readable. Writes to it are refused for about
+    `grace` seconds plus the catch-up. Returns how many rows were copied.
+    """
+    if target not in engines:
+        raise ValueError(f"Unknown shard {target!r}")
+    with SessionLocal() as db:
+        source = shard_of(db, circle_id)
+    if source == target:
+        return 0
+
+    with session_factories[source]() as src, session_factories[target]() as dst:
+        copied = _copy(src, dst, circle_id, batch_size)
+
+        # requests that read the old placement before the freeze finish
+        # within the grace period; later ones see "moving" and retry
+        _set_placement(circle_id, source, moving=True)
+        try:
+            time.sleep(grace)
+            copied += _catch_up(src, dst, circle_id, batch_size)
+            dst.commit()
+            _set_placement(circle_id, target, moving=False)
+        except Exception:
+            dst.rollback()
+            _set_placement(circle_id, source, moving=False)
+            raise
+
+        # the old copy is unreachable now; its photos belong to the new one
+        delete_posts(src, Post.circle_id == circle_id, queue_photos=False)
+        delete_archived_posts(src, ArchivedPost.circle_id == circle_id, queue_photos=False)
+        src.commit()
+    cache.invalidate(f"circle:{circle_id}")
+    return copied
+
+
+def misplaced(db: Session) -> list[tuple[int, str, str]]:
+    # (circle_id, where it is, where the ring wants it)
+    if ring is None:
+        return []
+    rows = db.execute(
+        select(Circle.id, CirclePlacement.shard)
+        .outerjoin(CirclePlacement, CirclePlacement.circle_id == Circle.id)
+        .order_by(Circle.id)
+    ).all()
+    return [
+        (circle_id, shard or MAIN, ring.shard_for(circle_id))
+        for circle_id, shard in rows
+        if (shard or MAIN) != ring.shard_for(circle_id)
+    ]
+
+
+def shard_status() -> list[dict]:
+    with SessionLocal() as db:
+        circles = defaultdict(int)
+        for circle_id, shard in db.execute(
+            select(Circle.id, CirclePlacement.shard).outerjoin(CirclePlacement, CirclePlacement.circle_id == Circle.id)
+        ):
+            circles[shard or MAIN] += 1
+        pending = defaultdict(int)
+        for _, source, _ in misplaced(db):
+            pending[source] += 1
+
+    status = []
+    for name, bind in engines.items():
+        with bind.connect() as conn:
+            posts = conn.scalar(select(func.count()).select_from(Post.__table__))
+        status.append({
+            "shard": name,
+            "on_ring": ring is not None and name in _configured,
+            "circles": circles[name],
+            "posts": posts,
+            "to_move": pending[name],
+        })
+    return status
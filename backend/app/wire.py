@@ -0,0 +1,132 @@
+import gzip
+import brotli
+import msgpack
+import orjson
+from decouple import config
+from fastapi import Request
+from fastapi.responses import Response
+from sqlalchemy.orm import Session
+from .cache import cache
+
+# Wire formats for the list endpoints (feeds, comments, likes).
+#
+# The body format follows Accept: JSON unless the client prefers MessagePack
+# (application/msgpack or application/x-msgpack). The compression follows
+# Accept-Encoding, brotli over gzip, and is skipped for small bodies where
+# the framing costs more than it saves. Bigger bodies get cheaper levels so
+# compressing never takes longer than sending the difference would.
+#
+# Every variant of a cached page is derived from its canonical JSON and
+# cached under the same tags, so a page is queried once, compressed once
+# per format and encoding, and invalidated together.
+#
+# This path is always on, not opt-in: the rows are built in the shape of
+# the route's response_model by the queries themselves and serialized with
+# orjson as they are, with no validation pass. Caching and the MessagePack
+# and compressed variants all start from those bytes, so there is no
+# slower path left to switch back to; response_model stays on each route
+# for the OpenAPI schema, and test_feeds checks the rows still match it.
+
+COMPRESS_MIN_BYTES = int(config("COMPRESS_MIN_BYTES", default="1024"))
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+MSGPACK_TYPES = (MSGPACK, "application/x-msgpack")
+
+# (body up to this many bytes, gzip level, brotli quality)
+LEVELS = (
+    (16 * 1024, 9, 9),
+    (256 * 1024, 6, 6),
+    (None, 4, 4),
+)
+
+VARY = "Accept, Accept-Encoding"
+
+
+def _qualities(header: str) -> dict[str, float]:
+    qualities = {}
+    for item in header.split(","):
+        name, *params = [part.strip() for part in item.split(";")]
+        if not name:
+            continue
+        q = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        qualities[name.lower()] = q
+    return qualities
+
+
+def negotiate_format(accept: str | None) -> str:
+    if not accept:
+        return JSON
+    qualities = _qualities(accept)
+    msgpack_q = max(qualities.get(t, 0.0) for t in MSGPACK_TYPES)
+    json_q = qualities.get(JSON, qualities.get("application/*", qualities.get("*/*", 0.0)))
+    return MSGPACK if msgpack_q > json_q else JSON
+
+
+def negotiate_encoding(accept_encoding: str | None, size: int) -> str | None:
+    if not accept_encoding or size < COMPRESS_MIN_BYTES:
+        return None
+    qualities = _qualities(accept_encoding)
+    wildcard = qualities.get("*", 0.0)
+    # highest q wins, brotli on a tie
+    best = max(("br", "gzip"), key=lambda coding: (qualities.get(coding, wildcard), coding == "br"))
+    return best if qualities.get(best, wildcard) > 0 else None
+
+
+def encode(rows, media_type: str) -> bytes:
+    if media_type == MSGPACK:
+        return msgpack.packb(rows, default=str)
+    return orjson.dumps(rows)
+
+
+def compress(body: bytes, coding: str | None) -> bytes:
+    if coding is None:
+        return body
+    for limit, gzip_level, brotli_quality in LEVELS:
+        if limit is None or len(body) <= limit:
+            break
+    if coding == "br":
+        return brotli.compress(body, quality=brotli_quality)
+    # mtime=0 keeps the output identical for identical input
+    return gzip.compress(body, compresslevel=gzip_level, mtime=0)
+
+
+def cached_list_response(request: Request, key: str, tags, produce, db: Session) -> Response:
+    """
+    Serve produce() (a list of JSON-ready dicts, read through `db`) in the
+    format and encoding the client asked for, with every variant cached
+    under `tags`.
+    """
+    def canonical() -> bytes:
+        return cache.get_or_set(key, tags, lambda: orjson.dumps(produce()), db=db)
+
+    def variant() -> bytes:
+        # fetched again rather than reused: if the tags were invalidated since
+        # the size check, this gets the fresh page, not the one we measured.
+        # A replica's page was never cached, so it would only be queried again
+        body = canonical() if cache.enabled and not db.info.get("replica") else measured
+        if media_type != JSON:
+            body = encode(orjson.loads(body), media_type)
+        return compress(body, coding)
+
+    media_type = negotiate_format(request.headers.get("accept"))
+    # decided on the JSON size so the choice is the same for every format
+    measured = canonical()
+    coding = negotiate_encoding(request.headers.get("accept-encoding"), len(measured))
+
+    if media_type == JSON and coding is None:
+        body = measured
+    else:
+        body = cache.get_or_set(f"{key}|{media_type}|{coding}", tags, variant, db=db)
+
+    headers = {"Vary": VARY}
+    if coding is not None:
+        headers["Content-Encoding"] = coding
+    return Response(content=body, media_type=media_type, headers=headers)
@@ -0,0 +1,110 @@
+"""
+Hot tier size and read latency before and after archiving. Most posts are
+backdated past the archive threshold; the feed (both tiers), the unread
+counts (hot tier only) and the newest page with its like counts are timed,
+and the hot tables' on-disk size is read from dbstat.
+
+Run from the backend directory:
+    python -m benchmarks.bench_archive
+"""
+import argparse
+import time
+from datetime import datetime
+
+from sqlalchemy import func, select, text
+
+from app.archive import archive_posts
+from app.models import Post, ArchivedPost
+from app.queries import post_rows, archived_post_rows, both_tiers, circle_unread_rows, as_dicts
+from benchmarks.fixtures import temp_engine, seed
+
+# fixtures.seed dates its posts back from this
+SEED_NOW = datetime(2025, 8, 1, 12, 0, 0)
+HOT_TABLES = ("posts", "comments", "likes", "ix_posts_circle_id_created_at", "ix_comments_post_id_created_at", "ix_likes_post_id_user_id")
+
+
+def hot_bytes(db) -> int:
+    rows = db.execute(text("SELECT name, sum(pgsize) FROM dbstat GROUP BY name")).all()
+    return sum(size for name, size in rows if name in HOT_TABLES)
+
+
+def measure(fn, repeat: int) -> float:
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def sample(SessionLocal, viewer_id: int, repeat: int) -> dict:
+    def feed():
+        with SessionLocal() as db:
+            return as_dicts(db.execute(both_tiers(
+                post_rows(viewer_id).where(Post.author_id != viewer_id),
+                archived_post_rows(viewer_id).where(ArchivedPost.author_id != viewer_id),
+                "created_at", descending=True
+            )))
+
+    def unread():
+        with SessionLocal() as db:
+            return db.execute(circle_unread_rows(viewer_id)).all()
+
+    def recent_like_counts():
+        # what every write path and the newest page touch: the hot tier
+        with SessionLocal() as db:
+            return db.execute(
+                post_rows(viewer_id).order_by(Post.created_at.desc()).limit(20)
+            ).all()
+
+    with SessionLocal() as db:
+        size = hot_bytes(db)
+        hot = db.scalar(select(func.count()).select_from(Post))
+    return {
+        "hot_posts": hot,
+        "hot_kib": size / 1024,
+        "feed_ms": measure(feed, repeat),
+        "unread_ms": measure(unread, repeat),
+        "page_ms": measure(recent_like_counts, repeat),
+        "feed_posts": len(feed()),
+    }
+
+
+def run(posts: int, old_share: float, repeat: int):
+    engine, SessionLocal = temp_engine("archive")
+    viewer_id = seed(engine, users=50, posts=posts, comments_per_post=2, likes_per_post=5, circles=4)
+
+    # the seed's newest posts are moved up to today, the rest a year back
+    shift = int((datetime.utcnow() - SEED_NOW).total_seconds())
+    old_after = int(posts * (1 - old_share))
+    with SessionLocal() as db:
+        db.execute(text("UPDATE posts SET created_at = datetime(created_at, :shift)"), {"shift": f"+{shift} seconds"})
+        db.execute(text("UPDATE posts SET created_at = datetime(created_at, '-365 days') WHERE post_id > :old_after"), {"old_after": old_after})
+        db.execute(text("UPDATE circle_members SET joined_at = datetime('now', '-2 years')"))
+        db.commit()
+
+    before = sample(SessionLocal, viewer_id, repeat)
+    start = time.perf_counter()
+    archived = archive_posts(older_than_days=90, session_factory=SessionLocal)
+    elapsed = time.perf_counter() - start
+    with SessionLocal() as db:
+        db.execute(text("ANALYZE"))
+        db.commit()
+    after = sample(SessionLocal, viewer_id, repeat)
+    assert before["feed_posts"] == after["feed_posts"]
+
+    print(f"{posts} posts, {archived} archived in {elapsed:.1f}s")
+    print(f"{'':>8} {'hot posts':>10} {'hot KiB':>9} {'feed ms':>9} {'unread ms':>10} {'page ms':>8}")
+    for label, result in (("before", before), ("after", after)):
+        print(
+            f"{label:>8} {result['hot_posts']:>10} {result['hot_kib']:>9.0f} {result['feed_ms']:>9.2f} "
+            f"{result['unread_ms']:>10.2f} {result['page_ms']:>8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--posts", type=int, default=50_000)
+    parser.add_argument("--old", type=float, default=0.9, help="share of posts older than the archive threshold")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    run(args.posts, args.old, args.repeat)
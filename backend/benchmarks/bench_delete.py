@@ -0,0 +1,55 @@
+"""
+Deleting a whole circle: wall time, statement count and peak Python memory.
+Every table is cleared with one set-based DELETE, so the statement count is
+fixed and memory stays flat however many posts the circle holds.
+
+Run from the backend directory:
+    python -m benchmarks.bench_delete
+"""
+import argparse
+import time
+import tracemalloc
+
+from sqlalchemy import event, func, select
+
+from app.deletion import delete_circle
+from app.models import Post, Comment, Like, PhotoCleanup
+from app.search import rebuild_index
+from benchmarks.fixtures import temp_engine, seed
+
+
+def run(sizes: list[int]):
+    print(f"{'posts':>8} {'deleted':>8} {'stmts':>6} {'seconds':>8} {'peak KiB':>9} {'photos queued':>14}")
+    for posts in sizes:
+        engine, SessionLocal = temp_engine(f"delete_{posts}")
+        # two circles so the delete has to leave the other one untouched
+        seed(engine, users=50, posts=posts * 2, comments_per_post=2, likes_per_post=5, circles=2)
+        with SessionLocal() as db:
+            rebuild_index(db)
+
+        statements = []
+        event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+        with SessionLocal() as db:
+            tracemalloc.start()
+            start = time.perf_counter()
+            deleted = delete_circle(db, 1)
+            db.commit()
+            elapsed = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            queued = db.scalar(select(func.count()).select_from(PhotoCleanup))
+            left = db.scalar(select(func.count()).select_from(Post))
+            assert left == posts, f"expected {posts} posts left in circle 2, found {left}"
+            assert db.scalar(select(func.count()).select_from(Comment)) == posts * 2
+            assert db.scalar(select(func.count()).select_from(Like)) == posts * 5
+
+        print(f"{posts:>8} {deleted:>8} {len(statements):>6} {elapsed:>8.2f} {peak / 1024:>9.0f} {queued:>14}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    args = parser.parse_args()
+    run(args.sizes)
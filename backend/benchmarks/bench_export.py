@@ -0,0 +1,44 @@
+"""
+Circle export throughput and peak Python memory at growing circle sizes.
+Peak memory should stay flat as the circle grows, since rows are streamed
+with yield_per and written out in fixed-size chunks.
+
+Run from the backend directory:
+    python -m benchmarks.bench_export
+"""
+import argparse
+import time
+import tracemalloc
+
+from app.export import stream_ndjson, stream_zip
+from benchmarks.fixtures import temp_engine, seed
+
+
+def drain(chunks) -> int:
+    return sum(len(chunk) for chunk in chunks)
+
+
+def run(sizes: list[int]):
+    print(f"{'posts':>8} {'format':>7} {'MB out':>8} {'seconds':>8} {'peak KiB':>9}")
+    for posts in sizes:
+        engine, SessionLocal = temp_engine(f"export_{posts}")
+        seed(engine, users=50, posts=posts, comments_per_post=2, likes_per_post=5)
+
+        for name, make in (
+            ("ndjson", lambda: stream_ndjson(1, session_factory=SessionLocal)),
+            ("zip", lambda: stream_zip(1, session_factory=SessionLocal)),
+        ):
+            tracemalloc.start()
+            start = time.perf_counter()
+            size = drain(make())
+            elapsed = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f"{posts:>8} {name:>7} {size / 2**20:>8.1f} {elapsed:>8.2f} {peak / 1024:>9.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    args = parser.parse_args()
+    run(args.sizes)
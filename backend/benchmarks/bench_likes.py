@@ -0,0 +1,91 @@
+"""
+Like throughput during a burst on one post: every like written and
+committed by its own request, against the like buffer (app.like_buffer)
+flushing each window's likes in one transaction. The buffer waits for the
+commit before acknowledging, so both sides count committed likes only.
+
+Run from the backend directory:
+    python -m benchmarks.bench_likes
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import func, select
+
+# the app's database is circle_share.db in the working directory
+os.chdir(tempfile.mkdtemp(prefix="circle_share_"))
+os.environ.setdefault("SECRET_KEY", "bench-secret")
+
+from app import notifications
+from app.database import Base, engine, SessionLocal
+from app.like_buffer import LikeBuffer
+from app.likes import set_like
+from app.models import User, Circle, CircleMember, Post, Like
+
+
+def setup(users: int) -> tuple[int, int, list[int]]:
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        members = [User(name=f"user {i}", email=f"user{i}@example.com", hashed_password="x") for i in range(users)]
+        db.add_all(members)
+        db.flush()
+        circle = Circle(name="viral", creator_id=members[0].id)
+        db.add(circle)
+        db.flush()
+        db.add_all([CircleMember(user_id=member.id, circle_id=circle.id) for member in members])
+        post = Post(circle_id=circle.id, author_id=members[0].id, content="everyone look")
+        db.add(post)
+        db.commit()
+        return post.post_id, circle.id, [member.id for member in members]
+
+
+def direct(post_id: int, circle_id: int, user_id: int):
+    # what like_post does per request without the buffer
+    with SessionLocal() as db:
+        if set_like(db, post_id, user_id):
+            author_id = select(Post.author_id).where(Post.post_id == post_id)
+            notifications.notify_users(db, author_id, notifications.LIKE, user_id, post_id=post_id, circle_id=circle_id)
+        db.commit()
+
+
+def burst(like, user_ids: list[int], threads: int) -> float:
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(like, user_ids))
+    return time.perf_counter() - start
+
+
+def count(post_id: int) -> int:
+    with SessionLocal() as db:
+        return db.scalar(select(func.count()).select_from(Like).where(Like.post_id == post_id))
+
+
+def run(users: int, threads: int, window_ms: int):
+    print(f"{users} likes from {threads} threads")
+    print(f"{'':>16} {'likes/sec':>10}")
+
+    post_id, circle_id, user_ids = setup(users)
+    elapsed = burst(lambda user_id: direct(post_id, circle_id, user_id), user_ids, threads)
+    assert count(post_id) == users
+    print(f"{'direct':>16} {users / elapsed:>10.0f}")
+
+    post_id, circle_id, user_ids = setup(users)
+    buffer = LikeBuffer(window_ms=window_ms, wait=True)
+    elapsed = burst(lambda user_id: asyncio.run(buffer.set(post_id, user_id, circle_id, True)), user_ids, threads)
+    buffer.close()
+    assert count(post_id) == users
+    print(f"{f'buffer {window_ms} ms':>16} {users / elapsed:>10.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--window-ms", type=int, default=5)
+    args = parser.parse_args()
+    run(args.users, args.threads, args.window_ms)
@@ -0,0 +1,133 @@
+"""
+Compare ORM entity hydration against the column-projection queries in
+app.queries for the list endpoints (time and peak Python memory), and the
+full feed projection against a sparse one (?fields=post_id,content).
+
+Run from the backend directory:
+    python -m benchmarks.bench_queries
+"""
+import argparse
+import time
+import tracemalloc
+
+from sqlalchemy.orm import joinedload
+
+from app.models import User, Post, Comment, Like
+from app.queries import member_circle_ids, post_rows, comment_rows, like_rows, user_rows, as_dicts
+from benchmarks.fixtures import temp_engine, seed
+
+
+def measure(fn, repeat: int):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    elapsed = (time.perf_counter() - start) / repeat * 1000
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 1024
+
+
+def report(label, orm, projection):
+    print(f"{label:<12} orm {orm[0]:8.2f} ms {orm[1]:9.0f} KiB | projection {projection[0]:8.2f} ms {projection[1]:9.0f} KiB")
+
+
+def run(SessionLocal, viewer_id: int, repeat: int):
+    post_id = 1
+
+    def feed_orm():
+        with SessionLocal() as db:
+            viewer = db.get(User, viewer_id)
+            circle_ids = [circle.id for circle in viewer.circles]
+            posts = db.query(Post).filter(
+                Post.circle_id.in_(circle_ids), Post.author_id != viewer_id
+            ).options(joinedload(Post.author)).order_by(Post.created_at.desc()).all()
+            return [
+                {
+                    "post_id": p.post_id, "circle_id": p.circle_id, "author_id": p.author_id,
+                    "content": p.content, "photo_url": p.photo_url, "created_at": p.created_at,
+                    "author_name": p.author.name,
+                    "like_count": db.query(Like).filter(Like.post_id == p.post_id).count(),
+                    "user_liked": db.query(Like).filter(Like.post_id == p.post_id, Like.user_id == viewer_id).first() is not None,
+                }
+                for p in posts
+            ]
+
+    def feed_projection():
+        with SessionLocal() as db:
+            return as_dicts(db.execute(
+                post_rows(viewer_id).where(
+                    Post.circle_id.in_(member_circle_ids(viewer_id)), Post.author_id != viewer_id
+                ).order_by(Post.created_at.desc())
+            ))
+
+    def feed_sparse():
+        with SessionLocal() as db:
+            return as_dicts(db.execute(
+                post_rows(viewer_id, ("post_id", "content", "created_at")).where(
+                    Post.circle_id.in_(member_circle_ids(viewer_id)), Post.author_id != viewer_id
+                ).order_by(Post.created_at.desc())
+            ))
+
+    def comments_orm():
+        with SessionLocal() as db:
+            comments = db.query(Comment).filter(Comment.post_id == post_id).options(
+                joinedload(Comment.author)).order_by(Comment.created_at.asc()).all()
+            return [
+                {"id": c.id, "post_id": c.post_id, "user_id": c.user_id, "content": c.content,
+                 "created_at": c.created_at, "author_name": c.author.name}
+                for c in comments
+            ]
+
+    def comments_projection():
+        with SessionLocal() as db:
+            return as_dicts(db.execute(comment_rows(post_id).order_by(Comment.created_at.asc())))
+
+    def likes_orm():
+        with SessionLocal() as db:
+            likes = db.query(Like).filter(Like.post_id == post_id).options(
+                joinedload(Like.user)).order_by(Like.created_at.desc()).all()
+            return [
+                {"id": l.id, "post_id": l.post_id, "user_id": l.user_id,
+                 "created_at": l.created_at, "user_name": l.user.name}
+                for l in likes
+            ]
+
+    def likes_projection():
+        with SessionLocal() as db:
+            return as_dicts(db.execute(like_rows(post_id).order_by(Like.created_at.desc())))
+
+    def users_orm():
+        with SessionLocal() as db:
+            return db.query(User).all()
+
+    def users_projection():
+        with SessionLocal() as db:
+            return as_dicts(db.execute(user_rows()))
+
+    assert feed_orm() == feed_projection()
+    assert comments_orm() == comments_projection()
+    assert likes_orm() == likes_projection()
+
+    report("/their-days", measure(feed_orm, repeat), measure(feed_projection, repeat))
+    report("comments", measure(comments_orm, repeat), measure(comments_projection, repeat))
+    report("likes", measure(likes_orm, repeat), measure(likes_projection, repeat))
+    report("/users", measure(users_orm, repeat), measure(users_projection, repeat))
+
+    full, sparse = measure(feed_projection, repeat), measure(feed_sparse, repeat)
+    print(f"{'fields=':<12} all {full[0]:8.2f} ms {full[1]:9.0f} KiB | post_id,content {sparse[0]:8.2f} ms {sparse[1]:9.0f} KiB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--posts", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    engine, SessionLocal = temp_engine("queries")
+    viewer_id = seed(engine, users=args.users, posts=args.posts, likes_per_post=20, comments_per_post=20)
+    run(SessionLocal, viewer_id, args.repeat)
@@ -0,0 +1,69 @@
+"""
+Full-text search latency: rebuild the FTS5 index over a large synthetic post
+table, then time ranked, circle-scoped queries (first page and a page reached
+through the cursor).
+
+Run from the backend directory (the default 1M posts takes a few minutes to seed):
+    python -m benchmarks.bench_search
+    python -m benchmarks.bench_search --posts 100000
+"""
+import argparse
+import statistics
+import time
+
+from app.search import rebuild_index, search, to_match_query
+from benchmarks.fixtures import temp_engine, seed
+
+QUERIES = ["grandma", "grandma birthday", "pup", "wedding beach concert", "homework piano"]
+
+
+def percentiles(samples: list[float]) -> tuple[float, float]:
+    samples = sorted(samples)
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    return statistics.median(samples), p95
+
+
+def run(SessionLocal, viewer_id: int, repeat: int, limit: int):
+    with SessionLocal() as db:
+        start = time.perf_counter()
+        count = rebuild_index(db)
+        print(f"rebuilt index with {count} entries in {time.perf_counter() - start:.1f}s")
+
+    print(f"{'query':<24} {'page 1 p50/p95 ms':>20} {'page 3 p50/p95 ms':>20}")
+    with SessionLocal() as db:
+        for raw in QUERIES:
+            match = to_match_query(raw)
+            first, third = [], []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                _, after = search(db, viewer_id, match, limit)
+                first.append((time.perf_counter() - start) * 1000)
+
+                if after is None:
+                    continue
+                _, after = search(db, viewer_id, match, limit, after)
+                if after is None:
+                    continue
+                start = time.perf_counter()
+                search(db, viewer_id, match, limit, after)
+                third.append((time.perf_counter() - start) * 1000)
+
+            p1 = "%8.2f /%8.2f" % percentiles(first)
+            p3 = "%8.2f /%8.2f" % percentiles(third) if third else "n/a"
+            print(f"{raw:<24} {p1:>20} {p3:>20}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--posts", type=int, default=1_000_000)
+    parser.add_argument("--circles", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    engine, SessionLocal = temp_engine("search")
+    viewer_id = seed(
+        engine, users=500, posts=args.posts, comments_per_post=0, likes_per_post=0,
+        circles=args.circles, circles_per_user=10
+    )
+    run(SessionLocal, viewer_id, args.repeat, args.limit)
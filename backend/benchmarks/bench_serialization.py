@@ -0,0 +1,98 @@
+"""
+Compare the default response_model path against the ORJSONResponse fast path
+for a 1k-post /their-days payload.
+
+Run from the backend directory:
+    python -m benchmarks.bench_serialization
+"""
+import argparse
+import json
+import time
+from datetime import datetime, timedelta
+
+import orjson
+from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
+from fastapi.testclient import TestClient
+from pydantic import TypeAdapter
+
+from app.schemas import PostResponse
+
+
+def make_rows(count: int) -> list[dict]:
+    now = datetime(2025, 8, 1, 12, 0, 0)
+    return [
+        {
+            "post_id": i,
+            "circle_id": i % 20,
+            "author_id": i % 50,
+            "content": f"Post number {i} about what happened today in the family",
+            "photo_url": None if i % 3 else f"https://res.cloudinary.com/demo/image/upload/{i}.jpg",
+            "created_at": now - timedelta(minutes=i),
+            "author_name": f"User {i % 50}",
+            "like_count": i % 7,
+            "user_liked": i % 2 == 0,
+        }
+        for i in range(count)
+    ]
+
+
+def timeit(fn, repeat: int) -> float:
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def bench_encoding(rows: list[dict], repeat: int):
+    adapter = TypeAdapter(list[PostResponse])
+
+    def validated_stdlib():
+        # what FastAPI does for response_model=list[PostResponse] + JSONResponse
+        models = adapter.validate_python(rows)
+        content = adapter.dump_python(models, mode="json")
+        json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+    def prevalidated_models():
+        models = [PostResponse(**row) for row in rows]
+        content = adapter.dump_python(models, mode="json")
+        json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+    def orjson_rows():
+        orjson.dumps(rows)
+
+    print(f"encode {len(rows)} posts (ms per payload)")
+    print(f"  response_model + stdlib json : {timeit(validated_stdlib, repeat):8.2f}")
+    print(f"  models built once + stdlib   : {timeit(prevalidated_models, repeat):8.2f}")
+    print(f"  pre-shaped rows + orjson     : {timeit(orjson_rows, repeat):8.2f}")
+
+
+def bench_endpoints(rows: list[dict], repeat: int):
+    bench_app = FastAPI()
+
+    @bench_app.get("/default", response_model=list[PostResponse])
+    async def default_path():
+        return rows
+
+    @bench_app.get("/fast", response_model=list[PostResponse], response_class=ORJSONResponse)
+    async def fast_path():
+        return ORJSONResponse(rows)
+
+    client = TestClient(bench_app)
+    assert client.get("/default").json() == client.get("/fast").json()
+
+    print("round trip through the ASGI app (ms per request)")
+    print(f"  response_model               : {timeit(lambda: client.get('/default'), repeat):8.2f}")
+    print(f"  ORJSONResponse               : {timeit(lambda: client.get('/fast'), repeat):8.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--posts", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    rows = make_rows(args.posts)
+    bench_encoding(rows, args.repeat)
+    bench_endpoints(rows, args.repeat)
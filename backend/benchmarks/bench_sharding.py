@@ -0,0 +1,129 @@
+"""
+Write throughput and feed latency with circle data on 1, 2 and 4 shards.
+Writer processes each post into their own circle (a post and its search
+entry per transaction, committed one at a time), then a member of every
+circle reads the scatter-gather feed. Each shard count runs in a fresh
+interpreter in a scratch directory, since CIRCLE_SHARDS is read at import.
+
+Run from the backend directory:
+    python -m benchmarks.bench_sharding
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = """
+import heapq, json, sys, time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from app.database import Base, engine, SessionLocal
+from app.models import User, Circle, CircleMember, Post
+from app.queries import post_rows, as_dicts
+from app.search import index_post
+from app import sharding
+
+writers, posts_per_writer, feed_runs = map(int, sys.argv[1:4])
+Base.metadata.create_all(bind=engine)
+sharding.init_shards()
+
+with SessionLocal() as db:
+    reader = User(name="reader", email="reader@example.com", hashed_password="x")
+    db.add(reader)
+    db.flush()
+    circle_ids = []
+    for i in range(writers):
+        owner = User(name=f"writer {i}", email=f"writer{i}@example.com", hashed_password="x")
+        db.add(owner)
+        db.flush()
+        circle = Circle(name=f"circle {i}", creator_id=owner.id)
+        db.add(circle)
+        db.flush()
+        db.add_all([CircleMember(user_id=owner.id, circle_id=circle.id), CircleMember(user_id=reader.id, circle_id=circle.id)])
+        circle_ids.append((owner.id, circle.id))
+    sharding.place_circles(db, [circle_id for _, circle_id in circle_ids])
+    db.commit()
+    reader_id = reader.id
+
+def write(owner_circle):
+    owner_id, circle_id = owner_circle
+    for n in range(posts_per_writer):
+        with SessionLocal() as db:
+            shards = sharding.ShardSessions(db)
+            session = shards.for_circle(circle_id, writing=True)
+            post = Post(post_id=sharding.new_id("posts"), circle_id=circle_id, author_id=owner_id,
+                        content=f"post {n} from circle {circle_id}", created_at=datetime.now(timezone.utc))
+            session.add(post)
+            session.flush()
+            index_post(session, post)
+            session.commit()
+            shards.close()
+
+# processes, not threads, so the GIL doesn't hide the SQLite write lock
+with ProcessPoolExecutor(max_workers=writers) as pool:
+    list(pool.map(time.sleep, [0] * writers))
+    start = time.perf_counter()
+    list(pool.map(write, circle_ids))
+    written = time.perf_counter() - start
+
+def shard_posts(session, ids):
+    return as_dicts(session.execute(
+        post_rows(reader_id).where(Post.circle_id.in_(ids)).order_by(Post.created_at.desc())
+    ))
+
+ids = [circle_id for _, circle_id in circle_ids]
+start = time.perf_counter()
+for _ in range(feed_runs):
+    with SessionLocal() as db:
+        feed = list(heapq.merge(*sharding.scatter(db, ids, shard_posts), key=lambda post: post["created_at"], reverse=True))
+feed_seconds = (time.perf_counter() - start) / feed_runs
+assert len(feed) == writers * posts_per_writer
+
+print(json.dumps({"posts_per_sec": writers * posts_per_writer / written, "feed_ms": feed_seconds * 1000, "feed_posts": len(feed)}))
+"""
+
+
+def shards_spec(count: int) -> str:
+    if count == 1:
+        return ""
+    return ",".join(["main"] + [f"s{i}=sqlite:///shard{i}.db" for i in range(1, count)])
+
+
+def sample(count: int, writers: int, posts: int, feed_runs: int) -> dict:
+    env = {
+        **os.environ,
+        "PYTHONPATH": BACKEND,
+        "SECRET_KEY": os.environ.get("SECRET_KEY", "bench-secret"),
+        "CIRCLE_SHARDS": shards_spec(count),
+        "CACHE_ENABLED": "false",
+    }
+    with tempfile.TemporaryDirectory() as workdir:
+        result = subprocess.run(
+            [sys.executable, "-c", CHILD, str(writers), str(posts), str(feed_runs)],
+            cwd=workdir, env=env, capture_output=True, text=True
+        )
+    if result.returncode:
+        raise SystemExit(result.stderr)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def run(shard_counts: list[int], writers: int, posts: int, feed_runs: int):
+    print(f"{writers} writers x {posts} posts, feed of {writers * posts} posts")
+    print(f"{'shards':>6} {'posts/sec':>10} {'feed ms':>9}")
+    for count in shard_counts:
+        result = sample(count, writers, posts, feed_runs)
+        print(f"{count:>6} {result['posts_per_sec']:>10.0f} {result['feed_ms']:>9.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--posts", type=int, default=200)
+    parser.add_argument("--feed-runs", type=int, default=20)
+    args = parser.parse_args()
+    run(args.shards, args.writers, args.posts, args.feed_runs)
@@ -0,0 +1,99 @@
+"""
+Worker startup: time to import the app, run its lifespan startup, and serve
+the first authenticated feed request. Each sample is a fresh interpreter in a
+scratch directory holding a migrated, seeded circle_share.db, so nothing is
+warm from a previous run.
+
+Run from the backend directory:
+    python -m benchmarks.bench_startup
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+
+from alembic import command
+from alembic.config import Config
+
+from benchmarks.fixtures import temp_engine, seed
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = """
+import json, time
+start = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+
+from datetime import timedelta
+from fastapi.testclient import TestClient
+from app.auth.custom_auth import create_user_token
+token = create_user_token({"sub": "user1@example.com", "id": 1}, timedelta(minutes=5))
+
+client = TestClient(app.main.app)
+before_startup = time.perf_counter()
+client.__enter__()
+started = time.perf_counter()
+response = client.get("/their-days", headers={"Authorization": f"Bearer {token}"})
+served = time.perf_counter()
+assert response.status_code == 200, response.text
+client.__exit__(None, None, None)
+print(json.dumps({
+    "import": imported - start,
+    "startup": started - before_startup,
+    "first request": served - started,
+}))
+"""
+
+
+def prepare(posts: int) -> str:
+    engine, _ = temp_engine("circle_share")
+    seed(engine, users=20, posts=posts, comments_per_post=1, likes_per_post=2)
+    path = engine.url.database
+    engine.dispose()
+
+    # the app refuses to run purges on an unmigrated database
+    alembic_cfg = Config(os.path.join(BACKEND, "alembic.ini"))
+    alembic_cfg.set_main_option("script_location", os.path.join(BACKEND, "alembic"))
+    alembic_cfg.set_main_option("sqlalchemy.url", f"sqlite:///{path}")
+    command.stamp(alembic_cfg, "head")
+    return os.path.dirname(path)
+
+
+def sample(workdir: str) -> dict:
+    env = {
+        **os.environ,
+        "PYTHONPATH": BACKEND,
+        "SECRET_KEY": os.environ.get("SECRET_KEY", "bench-secret"),
+        "RATE_LIMIT_ENABLED": "false",
+    }
+    result = subprocess.run([sys.executable, "-c", CHILD], cwd=workdir, env=env, capture_output=True, text=True)
+    if result.returncode:
+        raise SystemExit(result.stderr)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def run(runs: int, posts: int):
+    workdir = prepare(posts)
+    try:
+        samples = [sample(workdir) for _ in range(runs)]
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"{'phase':<14} {'median ms':>10} {'min ms':>8} {'max ms':>8}")
+    for phase in samples[0]:
+        values = [s[phase] * 1000 for s in samples]
+        print(f"{phase:<14} {statistics.median(values):>10.0f} {min(values):>8.0f} {max(values):>8.0f}")
+    total = [sum(s.values()) * 1000 for s in samples]
+    print(f"{'total':<14} {statistics.median(total):>10.0f} {min(total):>8.0f} {max(total):>8.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--posts", type=int, default=1000)
+    args = parser.parse_args()
+    run(args.runs, args.posts)
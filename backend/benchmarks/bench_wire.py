@@ -0,0 +1,55 @@
+"""
+Bytes on the wire and encode CPU for feed payloads in each format and
+encoding /their-days can negotiate, normalised per 100 posts. "cached"
+is what a repeat request costs once the variant is in the response cache.
+
+Run from the backend directory:
+    python -m benchmarks.bench_wire
+"""
+import argparse
+
+import orjson
+
+from app.wire import JSON, MSGPACK, compress, encode
+from app.cache import Cache
+from benchmarks.bench_serialization import make_rows, timeit
+
+
+VARIANTS = [
+    (JSON, None),
+    (JSON, "gzip"),
+    (JSON, "br"),
+    (MSGPACK, None),
+    (MSGPACK, "gzip"),
+    (MSGPACK, "br"),
+]
+
+
+def run(sizes: list[int], repeat: int):
+    print(f"{'posts':>6} {'format':<20} {'coding':<6} {'bytes':>9} {'B/100 posts':>12} {'ms/100 posts':>13} {'cached ms':>10}")
+    for count in sizes:
+        # what the endpoint starts from: rows as they come back out of the JSON cache
+        rows = orjson.loads(orjson.dumps(make_rows(count)))
+        for media_type, coding in VARIANTS:
+            def produce():
+                return compress(encode(rows, media_type), coding)
+
+            body = produce()
+            ms = timeit(produce, repeat)
+
+            cache = Cache(enabled=True)
+            cache.get_or_set("their-days:1", ["circle:1"], produce)
+            cached_ms = timeit(lambda: cache.get_or_set("their-days:1", ["circle:1"], produce), repeat * 10)
+
+            print(
+                f"{count:>6} {media_type:<20} {coding or '-':<6} {len(body):>9} "
+                f"{len(body) * 100 / count:>12.0f} {ms * 100 / count:>13.3f} {cached_ms:>10.4f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10_000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    run(args.sizes, args.repeat)
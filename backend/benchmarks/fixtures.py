@@ -0,0 +1,93 @@
+"""
+Synthetic data for the benchmarks: a temporary SQLite database filled with
+Core executemany inserts so even large seeds stay fast.
+"""
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models import User, Circle, CircleMember, Post, Comment, Like
+
+WORDS = (
+    "grandma birthday cake garden picnic school soccer recital trip beach "
+    "dinner holiday puppy kitten graduation wedding baby hike snow rain "
+    "pancakes museum concert camping fishing bike piano homework movie"
+).split()
+
+BATCH = 10_000
+
+
+def temp_engine(name: str = "bench"):
+    path = os.path.join(tempfile.mkdtemp(prefix="circle_share_"), f"{name}.db")
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    return engine, sessionmaker(bind=engine)
+
+
+def sentence(rng: random.Random, length: int = 12) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(length))
+
+
+def _insert_batches(conn, table, rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH:
+            conn.execute(insert(table), batch)
+            batch = []
+    if batch:
+        conn.execute(insert(table), batch)
+
+
+def seed(engine, users=50, posts=1000, comments_per_post=2, likes_per_post=5, circles=1, circles_per_user=None, seed_value=42):
+    """
+    Every user is a member of every circle, or of `circles_per_user` of them
+    when given; posts are spread evenly over the circles and authors.
+    Returns the id of the first user, who is the viewer.
+    """
+    rng = random.Random(seed_value)
+    start = time.perf_counter()
+    now = datetime(2025, 8, 1, 12, 0, 0)
+
+    with engine.begin() as conn:
+        _insert_batches(conn, User.__table__, (
+            {"id": i, "name": f"User {i}", "email": f"user{i}@example.com", "hashed_password": "x", "first_access": now}
+            for i in range(1, users + 1)
+        ))
+        _insert_batches(conn, Circle.__table__, (
+            {"id": c, "name": f"Circle {c}", "creator_id": (c - 1) % users + 1}
+            for c in range(1, circles + 1)
+        ))
+        per_user = min(circles_per_user or circles, circles)
+        _insert_batches(conn, CircleMember.__table__, (
+            {"user_id": u, "circle_id": (u + k) % circles + 1, "joined_at": now}
+            for u in range(1, users + 1) for k in range(per_user)
+        ))
+        _insert_batches(conn, Post.__table__, (
+            {
+                "post_id": p,
+                "circle_id": (p - 1) % circles + 1,
+                "author_id": (p - 1) % users + 1,
+                "content": sentence(rng),
+                "photo_url": None if p % 3 else f"https://res.cloudinary.com/demo/image/upload/{p}.jpg",
+                "created_at": now - timedelta(minutes=p),
+            }
+            for p in range(1, posts + 1)
+        ))
+        _insert_batches(conn, Comment.__table__, (
+            {"post_id": p, "user_id": (p + k) % users + 1, "content": sentence(rng, 6), "created_at": now - timedelta(minutes=p) + timedelta(seconds=k + 1)}
+            for p in range(1, posts + 1) for k in range(comments_per_post)
+        ))
+        _insert_batches(conn, Like.__table__, (
+            {"post_id": p, "user_id": (p + k) % users + 1, "created_at": now - timedelta(minutes=p) + timedelta(seconds=k + 1)}
+            for p in range(1, posts + 1) for k in range(min(likes_per_post, users))
+        ))
+
+    print(f"seeded {users} users, {posts} posts in {time.perf_counter() - start:.1f}s")
+    return 1
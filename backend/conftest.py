@@ -0,0 +1,107 @@
+import os
+
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ.setdefault("CACHE_ENABLED", "false")
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+from datetime import timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import database, routing
+from app.cache import LocalLRU, cache as app_cache
+from app.auth.custom_auth import create_user_token
+from app.database import Base
+from app.main import app
+from app.models import User, Circle, CircleMember
+
+
+def memory_engine():
+    # one in-memory database shared by every session and thread of a test
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+
+def add_member(session, name: str, circle: Circle | None = None) -> User:
+    """
+    A user in `circle`, or in a circle of their own when none is given.
+    Flushed, not committed.
+    """
+    user = User(name=name, email=f"{name.lower()}@test.com", hashed_password="x")
+    session.add(user)
+    session.flush()
+    if circle is None:
+        circle = Circle(name=f"{name}'s circle", creator_id=user.id)
+        session.add(circle)
+        session.flush()
+    session.add(CircleMember(user_id=user.id, circle_id=circle.id))
+    session.flush()
+    return user
+
+
+@pytest.fixture
+def engine():
+    return memory_engine()
+
+
+@pytest.fixture
+def Session(engine):
+    return sessionmaker(bind=engine)
+
+
+@pytest.fixture
+def session(Session):
+    with Session() as session:
+        yield session
+
+
+@pytest.fixture
+def alice(session) -> User:
+    # a user and the circle they created, committed
+    user = add_member(session, "Alice")
+    session.commit()
+    return user
+
+
+@pytest.fixture
+def bob(session, alice) -> User:
+    # a member of Alice's circle, with a circle of their own
+    user = add_member(session, "Bob")
+    session.add(CircleMember(user_id=user.id, circle_id=alice.circles[0].id))
+    session.commit()
+    return user
+
+
+@pytest.fixture
+def client(monkeypatch, Session):
+    # the whole app on the test database; no lifespan, so no background work
+    monkeypatch.setattr(database, "SessionLocal", Session)
+    monkeypatch.setattr(routing, "SessionLocal", Session)
+    return TestClient(app)
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    # the app's cache, switched on and empty for one test
+    monkeypatch.setattr(app_cache, "enabled", True)
+    monkeypatch.setattr(app_cache, "local", LocalLRU(app_cache.local.max_entries))
+    monkeypatch.setattr(app_cache, "_generations", {})
+    return app_cache
+
+
+@pytest.fixture
+def auth():
+    # auth(user): headers signing a request in as `user`
+    def headers(user: User) -> dict:
+        token = create_user_token({"sub": user.email}, timedelta(minutes=5))
+        return {"Authorization": f"Bearer {token}"}
+    return headers
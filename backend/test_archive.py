@@ -0,0 +1,65 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, select
+
+from app.models import Post, Comment, Like, ArchivedComment, ArchivedLike
+from app.schemas import CommentCreate
+from app.archive import archive_posts, thaw_post
+from app.search import index_post, index_comment, unindex
+from app.sharding import ShardSessions
+from app.main import create_comment
+
+
+def add_posts(session, user, count):
+    # posts 1..count, each with one comment; post 1 is old enough to archive
+    circle = user.circles[0]
+    now = datetime.now(timezone.utc)
+    for n in range(count):
+        post = Post(circle_id=circle.id, author_id=user.id, content=f"post {n}",
+                    created_at=now - timedelta(days=365 if n == 0 else 0))
+        session.add(post)
+        session.flush()
+        index_post(session, post)
+        comment = Comment(post_id=post.post_id, user_id=user.id, content=f"comment {n}")
+        session.add(comment)
+        session.flush()
+        index_comment(session, comment, circle.id)
+    session.commit()
+
+
+def test_deleted_newest_comment_id_is_not_reused(Session, session, alice):
+    add_posts(session, alice, 2)
+
+    assert archive_posts(older_than_days=90, session_factory=Session) == 1
+    # the newest comment goes; its id must not come back
+    unindex(session, comment_ids=[2])
+    session.execute(delete(Comment).where(Comment.id == 2))
+    session.commit()
+
+    created = asyncio.run(create_comment(
+        2, CommentCreate(content="still here"), idempotency_key=None,
+        current_user=alice, shards=ShardSessions(session)
+    ))
+
+    assert created.id == 3
+    assert session.get(ArchivedComment, 1) is not None
+    print("archive: a new comment gets a fresh id, not an archived one")
+
+
+def test_thaw_keeps_archived_likes(Session, session, alice):
+    add_posts(session, alice, 2)
+    session.add(Like(post_id=1, user_id=alice.id))
+    session.commit()
+
+    archive_posts(older_than_days=90, session_factory=Session)
+    assert session.get(ArchivedLike, (1, alice.id)) is not None
+    # a like on another post takes the next id, never the archived one's
+    session.add(Like(post_id=2, user_id=alice.id))
+    session.commit()
+
+    assert thaw_post(session, 1)
+    session.commit()
+    assert sorted(session.scalars(select(Like.post_id))) == [1, 2]
+    print("archive: thawing brings every archived like back")
+
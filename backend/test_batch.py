@@ -0,0 +1,129 @@
+import pytest
+from sqlalchemy import create_engine, event
+
+from app import database, routing
+from app.database import Base
+from app.models import Post
+
+
+@pytest.fixture
+def engine(tmp_path):
+    # a file, so parallel reads get connections of their own
+    engine = create_engine(f"sqlite:///{tmp_path / 'batch.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+
+@pytest.fixture
+def post(session, alice, bob) -> int:
+    post = Post(circle_id=alice.circles[0].id, author_id=alice.id, content="hello")
+    session.add(post)
+    session.commit()
+    return post.post_id
+
+
+@pytest.fixture
+def opened(monkeypatch, Session) -> list:
+    # every session the app opens, batch or sub-request
+    sessions = []
+
+    def factory():
+        sessions.append(Session())
+        return sessions[-1]
+    monkeypatch.setattr(database, "SessionLocal", factory)
+    monkeypatch.setattr(routing, "SessionLocal", factory)
+    return sessions
+
+
+def batch(client, auth, user, *requests, parallel=False) -> list[dict]:
+    response = client.post("/batch", json={"requests": list(requests), "parallel": parallel}, headers=auth(user))
+    assert response.status_code == 200
+    return response.json()["responses"]
+
+
+def test_each_result_has_its_status_and_body(client, auth, post, bob):
+    results = batch(
+        client, auth, bob,
+        {"id": "add", "method": "POST", "path": f"/posts/{post}/comments", "body": {"content": "nice"}},
+        {"id": "list", "method": "GET", "path": f"/posts/{post}/comments"},
+        {"id": "empty", "method": "POST", "path": f"/posts/{post}/comments", "body": {"content": ""}},
+    )
+
+    assert [(result["id"], result["status"]) for result in results] == [("add", 200), ("list", 200), ("empty", 422)]
+    assert results[0]["body"]["content"] == "nice"
+    assert [comment["content"] for comment in results[1]["body"]] == ["nice"]
+    assert results[2]["body"]["detail"][0]["loc"] == ["body", "content"]
+    print("batch: every call comes back with its own status and body, in order")
+
+
+def test_failed_call_is_rolled_back_alone(client, auth, engine, post, bob):
+    # the second comment's notification fails, after the comment is written
+    notified = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("INSERT INTO notifications "):
+            notified.append(statement)
+            if len(notified) == 2:
+                raise RuntimeError("injected failure writing notifications")
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+
+    results = batch(
+        client, auth, bob,
+        {"method": "POST", "path": f"/posts/{post}/comments", "body": {"content": "kept"}},
+        {"method": "POST", "path": f"/posts/{post}/comments", "body": {"content": "lost"}},
+        {"method": "GET", "path": f"/posts/{post}/comments"},
+    )
+
+    assert [result["status"] for result in results] == [200, 500, 200]
+    assert [comment["content"] for comment in results[2]["body"]] == ["kept"]
+    print("batch: a failed call is rolled back, the ones before it stay")
+
+
+def test_sequential_reads_share_the_batch_session(client, auth, opened, post, bob):
+    results = batch(
+        client, auth, bob,
+        {"method": "GET", "path": f"/posts/{post}/comments"},
+        {"method": "GET", "path": f"/posts/{post}/likes"},
+        {"method": "GET", "path": "/their-days"},
+        {"method": "GET", "path": "/circles/joined"},
+    )
+
+    assert [result["status"] for result in results] == [200] * 4
+    assert len(opened) == 1
+    print("batch: reads in order run on the batch's one session")
+
+
+def test_parallel_reads_are_isolated(client, auth, opened, post, bob):
+    results = batch(
+        client, auth, bob,
+        {"method": "GET", "path": f"/posts/{post}/comments"},
+        {"method": "GET", "path": f"/posts/{post + 1}/comments"},
+        {"method": "GET", "path": "/circles/joined"},
+        parallel=True,
+    )
+
+    assert [result["status"] for result in results] == [200, 404, 200]
+    assert results[0]["body"] == []
+    assert [circle["name"] for circle in results[2]["body"]["member_circles"]] == ["Alice's circle"]
+    # the batch's session, then each read's own: get_db's for the user and
+    # get_read_db's for the query, as for a request sent on its own
+    assert len(opened) == 1 + 2 * 3
+    print("batch: parallel reads each get a session, and one failing doesn't spill over")
+
+
+def test_unknown_paths_get_an_error_per_item(client, auth, bob):
+    results = batch(
+        client, auth, bob,
+        {"id": "missing", "method": "GET", "path": "/no-such-endpoint"},
+        {"id": "relative", "method": "GET", "path": "circles/joined"},
+        {"id": "nested", "method": "POST", "path": "/batch", "body": {"requests": []}},
+        {"id": "fine", "method": "GET", "path": "/circles/joined"},
+    )
+
+    assert [(result["id"], result["status"], result["body"]) for result in results[:3]] == [
+        ("missing", 404, {"detail": "Not Found"}),
+        ("relative", 400, {"detail": "Invalid batch path"}),
+        ("nested", 400, {"detail": "Invalid batch path"}),
+    ]
+    assert results[3]["status"] == 200
+    print("batch: a bad path fails its own item only")
@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+
+from app import like_buffer as buffer_module
+from app.like_buffer import LikeBuffer
+from app.models import Post, Like
+from app.sharding import MAIN
+
+
+@pytest.fixture
+def buffer(Session):
+    return LikeBuffer(window_ms=5, wait=True, factories={MAIN: Session})
+
+
+@pytest.fixture
+def ids(session, alice):
+    # (post_id, user_id, circle_id) of a post to like
+    post = Post(circle_id=alice.circles[0].id, author_id=alice.id, content="look")
+    session.add(post)
+    session.commit()
+    return post.post_id, alice.id, post.circle_id
+
+
+def like(buffer, post_id, user_id, circle_id):
+    # wait=True: returns once the like is committed
+    asyncio.run(asyncio.wait_for(buffer.set(post_id, user_id, circle_id, True), timeout=10))
+
+
+def likes_of(Session, post_id):
+    with Session() as session:
+        return session.scalars(select(Like.user_id).where(Like.post_id == post_id)).all()
+
+
+def failing_once(fn, error):
+    calls = []
+
+    def wrapper(*args, **kwargs):
+        calls.append(1)
+        if len(calls) == 1:
+            raise error
+        return fn(*args, **kwargs)
+    return wrapper, calls
+
+
+def test_failed_write_is_retried(Session, buffer, ids):
+    post_id, user_id, circle_id = ids
+    busy = OperationalError("INSERT INTO likes", {}, Exception("database is locked"))
+    buffer._write, calls = failing_once(buffer._write, busy)
+
+    like(buffer, post_id, user_id, circle_id)
+    buffer.close()
+
+    assert len(calls) == 2
+    assert likes_of(Session, post_id) == [user_id]
+    print("like buffer: a write that fails is put back and retried")
+
+
+def test_flush_thread_survives_errors(Session, buffer, ids):
+    post_id, user_id, circle_id = ids
+    original = buffer_module.shard_of
+    buffer_module.shard_of, calls = failing_once(original, RuntimeError("catalog unavailable"))
+    try:
+        like(buffer, post_id, user_id, circle_id)
+    finally:
+        buffer_module.shard_of = original
+
+    thread = buffer._thread
+    assert len(calls) == 2
+    assert thread.is_alive()
+    assert likes_of(Session, post_id) == [user_id]
+    buffer.close()
+    print("like buffer: the flush thread keeps going after an error")
+
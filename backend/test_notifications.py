@@ -0,0 +1,33 @@
+from app import notifications
+
+
+def notify(session, recipient, actor):
+    notifications.notify_users(session, [recipient.id], notifications.COMMENT, actor.id)
+    session.commit()
+
+
+def test_watermark_stops_at_newest_notification(client, auth, session, alice, bob):
+    notify(session, alice, bob)
+    # far past anything the inbox holds
+    assert notifications.mark_read(session, alice.id, 10**6) == 0
+    session.commit()
+    assert notifications.inbox_state(session, alice.id) == (0, 1)
+
+    notify(session, alice, bob)
+    assert notifications.inbox_state(session, alice.id) == (1, 1)
+    inbox = client.get("/notifications", headers=auth(alice)).json()
+    assert inbox["unread"] == 1
+    assert [row["read"] for row in inbox["notifications"]] == [False, True]
+    print("notifications: marking past the newest one doesn't hide later ones")
+
+
+def test_oversized_watermark_is_rejected(client, auth, session, alice, bob):
+    notify(session, alice, bob)
+
+    response = client.post("/notifications/read", json={"up_to": 2**70}, headers=auth(alice))
+    assert response.status_code == 422
+    # callers inside the app get the clamp instead of an overflow
+    assert notifications.mark_read(session, alice.id, 2**70) == 0
+    session.commit()
+    assert notifications.inbox_state(session, alice.id) == (0, 1)
+    print("notifications: an up_to beyond SQLite's integers is a 422, not a 500")
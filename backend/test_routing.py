@@ -0,0 +1,68 @@
+import itertools
+import time
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import routing
+from app.models import Post
+
+
+@pytest.fixture
+def post(session, alice, bob) -> int:
+    post = Post(circle_id=alice.circles[0].id, author_id=alice.id, content="hello")
+    session.add(post)
+    session.commit()
+    return post.post_id
+
+
+@pytest.fixture
+def replica(monkeypatch, engine, post):
+    # a replica that has stopped applying the primary's changes: a copy of
+    # it taken now, after Alice, Bob and the post
+    copy = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    source, target = engine.raw_connection(), copy.raw_connection()
+    source.driver_connection.backup(target.driver_connection)
+    source.close()
+    target.close()
+    monkeypatch.setattr(routing, "_replicas", itertools.cycle([sessionmaker(bind=copy)]))
+    monkeypatch.setattr(routing, "tracker", routing.WriteTracker(routing.READ_YOUR_WRITES_SECONDS))
+    return copy
+
+
+def comments(client, auth, user, post_id) -> list[str]:
+    response = client.get(f"/posts/{post_id}/comments", headers=auth(user))
+    assert response.status_code == 200
+    return [comment["content"] for comment in response.json()]
+
+
+def comment(client, auth, user, post_id, content):
+    response = client.post(f"/posts/{post_id}/comments", json={"content": content}, headers=auth(user))
+    assert response.status_code == 200
+
+
+def test_writer_reads_primary_within_window_then_replica(client, auth, post, replica, alice, bob):
+    routing.tracker.window = 0.2
+    comment(client, auth, alice, post, "first!")
+
+    assert comments(client, auth, alice, post) == ["first!"]
+    # Bob hasn't written, so Bob reads the lagging replica
+    assert comments(client, auth, bob, post) == []
+
+    time.sleep(0.3)
+    assert comments(client, auth, alice, post) == []
+    print("routing: a writer reads the primary for the window, then a replica")
+
+
+def test_replica_reads_never_fill_the_cache(client, auth, cache, post, replica, alice, bob):
+    comment(client, auth, alice, post, "first!")
+
+    # the lagging replica's page, served to Bob but not cached
+    assert comments(client, auth, bob, post) == []
+    # Alice is pinned, and the shared entry must not hide her comment
+    assert comments(client, auth, alice, post) == ["first!"]
+    # filled from the primary, so Bob's next read is a hit with the comment
+    assert comments(client, auth, bob, post) == ["first!"]
+    print("routing: a pinned user sees their write through a cached listing")
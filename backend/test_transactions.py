@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+from sqlalchemy import event, select, func
+
+from app.models import User, Circle, CircleMember, CircleInvitation
+from app.schemas import UserCreate, InvitationAction
+from app.main import register, respond_to_invites
+
+
+def count_commits(session):
+    commits = []
+    event.listen(session, "after_commit", lambda s: commits.append(s))
+    return commits
+
+
+def fail_on(engine, table):
+    # make the next INSERT into `table` blow up, like a crash mid-flow
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith(f"INSERT INTO {table}"):
+            raise RuntimeError(f"injected failure writing {table}")
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def new_user(name):
+    return UserCreate(name=name, email=f"{name.lower()}@test.com", password="password123")
+
+
+def test_register_commits_once(session):
+    commits = count_commits(session)
+
+    result = asyncio.run(register(new_user("Alice"), db=session))
+
+    assert len(commits) == 1
+    assert session.get(CircleMember, (result["user_id"], result["circle_id"])) is not None
+    print("register: 1 commit for user, circle and membership")
+
+
+def test_register_is_atomic(engine, session):
+    fail_on(engine, "circle_members")
+
+    try:
+        asyncio.run(register(new_user("Alice"), db=session))
+        assert False, "register should have failed"
+    except RuntimeError:
+        pass
+
+    assert session.scalar(select(func.count()).select_from(User)) == 0
+    assert session.scalar(select(func.count()).select_from(Circle)) == 0
+    print("register: failure leaves no user or circle behind")
+
+
+@pytest.fixture
+def invite(session):
+    # a pending invitation from Alice to Bob: (alice, bob, invitation id)
+    alice = asyncio.run(register(new_user("Alice"), db=session))
+    bob = asyncio.run(register(new_user("Bob"), db=session))
+
+    invite = CircleInvitation(from_user_id=alice["user_id"], to_user_id=bob["user_id"], status="pending")
+    session.add(invite)
+    session.commit()
+    return alice, bob, invite.id
+
+
+def test_accept_commits_once(session, invite):
+    alice, bob, invite_id = invite
+    commits = count_commits(session)
+
+    bob_user = session.get(User, bob["user_id"])
+    asyncio.run(respond_to_invites(invite_id, InvitationAction(action="accept"), current_user=bob_user, db=session))
+
+    assert len(commits) == 1
+    assert session.get(CircleMember, (bob["user_id"], alice["circle_id"])) is not None
+    assert session.get(CircleMember, (alice["user_id"], bob["circle_id"])) is not None
+    assert session.get(CircleInvitation, invite_id) is None
+    print("accept: 1 commit for both memberships and the invite")
+
+
+def test_accept_is_atomic(engine, session, invite):
+    alice, bob, invite_id = invite
+    fail_on(engine, "circle_members")
+
+    bob_user = session.get(User, bob["user_id"])
+    try:
+        asyncio.run(respond_to_invites(invite_id, InvitationAction(action="accept"), current_user=bob_user, db=session))
+        assert False, "accepting should have failed"
+    except RuntimeError:
+        pass
+
+    assert session.get(CircleInvitation, invite_id).status == "pending"
+    assert session.get(CircleMember, (bob["user_id"], alice["circle_id"])) is None
+    print("accept: failure leaves the invite pending and no memberships")
+
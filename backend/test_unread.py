@@ -0,0 +1,80 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import update
+
+from app.models import CircleMember, Post
+
+
+def minutes_ago(minutes):
+    # post times are stored as naive UTC
+    return datetime.utcnow() - timedelta(minutes=minutes)
+
+
+def add_post(session, author, circle_id, at):
+    session.add(Post(circle_id=circle_id, author_id=author.id, content="news", created_at=at))
+    session.commit()
+
+
+def member_since(session, user, at):
+    # joined before the posts the test makes
+    session.execute(update(CircleMember).where(CircleMember.user_id == user.id).values(joined_at=at))
+    session.commit()
+
+
+def unread(client, auth, user) -> dict[int, int]:
+    response = client.get("/circles/unread", headers=auth(user))
+    assert response.status_code == 200
+    return {row["circle_id"]: row["unread"] for row in response.json()["circles"]}
+
+
+def seen(client, auth, user, circle_id, at):
+    response = client.put(f"/circles/{circle_id}/seen", json={"seen_at": at.isoformat()}, headers=auth(user))
+    assert response.status_code == 200
+    return datetime.fromisoformat(response.json()["last_seen_at"])
+
+
+def test_counts_are_grouped_by_circle_from_the_read_mark(client, auth, session, alice, bob):
+    theirs, own = alice.circles[0].id, bob.created_circles[0].id
+    session.add(CircleMember(user_id=alice.id, circle_id=own))
+    member_since(session, bob, minutes_ago(60))
+    posted = [minutes_ago(minutes) for minutes in (50, 40, 30)]
+    for at in posted:
+        add_post(session, alice, theirs, at)
+    add_post(session, alice, own, posted[0])
+    # your own posts are never unread
+    add_post(session, bob, own, posted[1])
+
+    assert unread(client, auth, bob) == {theirs: 3, own: 1}
+    seen(client, auth, bob, theirs, posted[1])
+    assert unread(client, auth, bob) == {theirs: 1, own: 1}
+    print("unread: one count per circle, from the read mark or the join date")
+
+
+def test_read_mark_never_moves_back(client, auth, session, alice, bob):
+    circle_id = alice.circles[0].id
+    member_since(session, bob, minutes_ago(60))
+    posted = [minutes_ago(minutes) for minutes in (50, 40, 30)]
+    for at in posted:
+        add_post(session, alice, circle_id, at)
+
+    assert seen(client, auth, bob, circle_id, posted[1]) == posted[1]
+    # an older mark, e.g. from a device that was behind
+    assert seen(client, auth, bob, circle_id, posted[0]) == posted[1]
+    assert unread(client, auth, bob) == {circle_id: 1, bob.created_circles[0].id: 0}
+    print("unread: an older read mark doesn't bring read posts back")
+
+
+def test_new_post_invalidates_cached_counts(client, auth, cache, session, alice, bob):
+    circle_id = alice.circles[0].id
+    member_since(session, bob, minutes_ago(60))
+    add_post(session, alice, circle_id, minutes_ago(30))
+
+    assert unread(client, auth, bob)[circle_id] == 1
+    hits = cache.counters["local_hits"]
+    assert unread(client, auth, bob)[circle_id] == 1
+    assert cache.counters["local_hits"] > hits
+
+    response = client.post("/posts/", data={"content": "one more"}, headers=auth(alice))
+    assert response.status_code == 200
+    assert unread(client, auth, bob)[circle_id] == 2
+    print("unread: a new post in the circle refreshes the cached count")
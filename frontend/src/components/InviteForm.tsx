@@ -1,5 +1,6 @@
-import { useState } from "react";
-import { sendInvitation } from "../services/api";
+import { useEffect, useState } from "react";
+import { searchUsers, sendInvitation } from "../services/api";
+import type { UserSummary } from "../types";
 
 interface InviteFormProps {
     onClose: () => void;
@@ -10,6 +11,35 @@ export function InviteForm({ onClose, onInviteSuccess }: InviteFormProps) {
     const [email, setEmail] = useState<string>("");
     const [loading, setLoading] = useState<boolean>(false);
     const [error, setError] = useState<string | null>(null);
+    const [suggestions, setSuggestions] = useState<UserSummary[]>([]);
+
+    // ask the directory for matches once the user pauses typing
+    useEffect(() => {
+        const query = email.trim();
+        if (query.length < 2) {
+            setSuggestions([]);
+            return;
+        }
+
+        let cancelled = false;
+        const timer = setTimeout(async () => {
+            try {
+                const directory = await searchUsers(query);
+                if (!cancelled) {
+                    setSuggestions(directory.users);
+                }
+            } catch {
+                if (!cancelled) {
+                    setSuggestions([]);
+                }
+            }
+        }, 250);
+
+        return () => {
+            cancelled = true;
+            clearTimeout(timer);
+        };
+    }, [email]);
 
     const handleSubmit = async (e: React.FormEvent) => {
         e.preventDefault();
@@ -57,9 +87,18 @@ export function InviteForm({ onClose, onInviteSuccess }: InviteFormProps) {
                     disabled={loading}
                     autoFocus
                     required
+                    list="invite-suggestions"
+                    autoComplete="off"
                     className="w-full p-2 border border-gray-300 rounded-lg focus:outline-none focus:ring-2 focus:ring-blue-500 focus:border-transparent"
                     style={{ minHeight: '28px' }}
                 />
+                <datalist id="invite-suggestions">
+                    {suggestions.map((user) => (
+                        <option key={user.id} value={user.email}>
+                            {user.name}
+                        </option>
+                    ))}
+                </datalist>
             </div>
 
             {error && (
@@ -1,4 +1,4 @@
-import type { CircleMember, Invitation, LoginResponse, Post, Comment, CommentCreate } from "../types";
+import type { CircleMember, Invitation, LoginResponse, Post, Comment, CommentCreate, UserDirectory, ReceivedInvitations, BatchRequestItem, BatchResponseItem } from "../types";
 
 export async function registerUser(
   name: string,
@@ -277,26 +277,61 @@ export async function sendInvitation(
     }
 }
 
-export async function fetchInvitation(): Promise<Invitation[]> {
+export async function searchUsers(
+    query: string,
+    limit: number = 8,
+): Promise<UserDirectory> {
     const token = getStoredToken();
     if (!token) {
       throw new Error("No auth token found");
     }
 
-    const res = await fetch("http://localhost:8000/invitations/received", {
+    const params = new URLSearchParams({ q: query, limit: String(limit) });
+    const res = await fetch(`http://localhost:8000/users?${params}`, {
         headers: {
             'Authorization': `Bearer ${token}`
         },
     });
 
     if (!res.ok) {
-        throw new Error("No invitation found")
+        throw new Error("Failed to search users")
     }
 
-    const data: Invitation[] = await res.json()
+    const data: UserDirectory = await res.json()
     return data
 }
 
+export async function fetchInvitation(): Promise<Invitation[]> {
+    const token = getStoredToken();
+    if (!token) {
+      throw new Error("No auth token found");
+    }
+
+    // the listing is cursor-paginated; follow next_cursor to the last page
+    const invitations: Invitation[] = [];
+    let cursor: string | null = null;
+    do {
+        const url: string = cursor
+            ? `http://localhost:8000/invitations/received?cursor=${encodeURIComponent(cursor)}`
+            : "http://localhost:8000/invitations/received";
+        const res = await fetch(url, {
+            headers: {
+                'Authorization': `Bearer ${token}`
+            },
+        });
+
+        if (!res.ok) {
+            throw new Error("No invitation found")
+        }
+
+        const data: ReceivedInvitations = await res.json()
+        invitations.push(...data.invitations)
+        cursor = data.next_cursor
+    } while (cursor);
+
+    return invitations
+}
+
 export async function respondInvitation(
     invitationID: number,
     action: string,
@@ -405,4 +440,45 @@ export async function toggleLike(postId: number): Promise<{message: string, like
   }
 
   return res.json();
-}
\ No newline at end of file
+}
+// Batch API functions: several calls in one round trip
+export async function batchRequests(
+  requests: BatchRequestItem[],
+  parallel = false
+): Promise<BatchResponseItem[]> {
+  const token = getStoredToken();
+  if (!token) {
+    throw new Error("No auth token found");
+  }
+
+  const res = await fetch("http://localhost:8000/batch", {
+    method: "POST",
+    headers: {
+      'Authorization': `Bearer ${token}`,
+      'Content-Type': 'application/json',
+    },
+    body: JSON.stringify({ requests, parallel }),
+  });
+
+  if (!res.ok) {
+    throw new Error("Failed to send batch");
+  }
+
+  const data = await res.json();
+  return data.responses;
+}
+
+export async function fetchCommentsForPosts(postIds: number[]): Promise<Record<number, Comment[]>> {
+  const responses = await batchRequests(
+    postIds.map((postId) => ({ id: String(postId), method: "GET", path: `/posts/${postId}/comments` })),
+    true
+  );
+
+  const comments: Record<number, Comment[]> = {};
+  for (const item of responses) {
+    if (item.status === 200) {
+      comments[Number(item.id)] = item.body as Comment[];
+    }
+  }
+  return comments;
+}
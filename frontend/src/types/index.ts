@@ -30,6 +30,18 @@ export interface User {
   first_access: string;
 }
 
+export interface UserSummary {
+  id: number;
+  name: string;
+  email: string;
+}
+
+export interface UserDirectory {
+  users: UserSummary[];
+  count: number;
+  next_cursor: string | null;
+}
+
 export interface CircleMember {
   id: number;
   name: string;
@@ -45,6 +57,11 @@ export interface Invitation {
     created_at: string
 }
 
+export interface ReceivedInvitations {
+    invitations: Invitation[];
+    next_cursor: string | null;
+}
+
 export interface InvitationAction{
     action: string
 }
@@ -61,4 +78,18 @@ export interface Comment {
 
 export interface CommentCreate {
     content: string;
-}
\ No newline at end of file
+}
+// Batch types
+export interface BatchRequestItem {
+    id?: string;
+    method: "GET" | "HEAD" | "POST" | "PUT" | "PATCH" | "DELETE";
+    path: string;
+    body?: unknown;
+}
+
+export interface BatchResponseItem {
+    id: string | null;
+    status: number;
+    headers: Record<string, string>;
+    body: unknown;
+}